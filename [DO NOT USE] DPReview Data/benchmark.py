@@ -0,0 +1,411 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from operator import attrgetter
+
+import numpy as np
+
+import catalogCache
+import catalogDb
+import compactRecords
+import dbCleaning2
+import facetIndex
+import featureStore
+import keyMatrix
+import mountRegistry
+import rangeIndex
+import recommender
+import similarIndex
+import skyline
+import specNormalizer
+import syntheticCorpus
+import teleconverterIndex
+
+'''
+Offline benchmark for the cleaning pipeline, run on a synthetic corpus (see syntheticCorpus.py).
+
+Every stage is timed on its own and then re-run under tracemalloc for its peak memory, so the
+throughput numbers are not slowed down by allocation tracing. Stages that read the catalog run on
+the corpus records split into category files in a data dir of the run; what a stage reads but does
+not build (that data dir, the key matrix, ...) is prepared once, untimed, by its SETUP function.
+
+Every run is compared against BASELINE_FILE: a stage whose throughput drops by more than
+REGRESSION_TOLERANCE exits with status 1 so CI can flag it. Throughput depends on the machine, so
+the baseline is only a relative reference: the committed one (1000 pages) shows how the stages
+compare with each other, and a comparison only means something against a baseline re-recorded
+(--save-baseline) on the machine that runs it.
+'''
+
+SIZES = (1000, 10000, 100000)
+BASELINE_FILE = os.path.join(syntheticCorpus.DATA_DIR, "benchmark_baseline.json")
+REGRESSION_TOLERANCE = 0.20
+MIN_SECONDS = 0.5  # fast stages are repeated until they have run this long, to keep timings stable
+READ_FIELDS = 5  # fields per record the read_fields stages read, like a scoring loop
+# The teleconverter_search query: converter combinations reaching 600mm that still autofocus
+REACH = {"focal_max_mm": (600, None), "aperture_tele": (None, teleconverterIndex.AF_APERTURE_LIMIT)}
+
+
+def _extract_stage(backend, prefilter):
+    def run(corpus):
+        return [dbCleaning2.extract_specs(filepath, backend, prefilter=prefilter) for filepath in corpus["filepaths"]]
+    return run
+
+
+def _categorize_stage(corpus):
+    return [dbCleaning2.categorize_item(item) for item in corpus["records"]]
+
+
+def _classify_batch_stage(corpus):
+    return dbCleaning2.classify_batch(corpus["records"])
+
+
+def _key_matrix(corpus):
+    if "key_matrix" not in corpus:
+        corpus["key_matrix"] = keyMatrix.build_key_matrix(corpus["records"])
+    return corpus["key_matrix"]
+
+
+def _build_key_matrix_stage(corpus):
+    return keyMatrix.build_key_matrix(corpus["records"])
+
+
+def _categorize_matrix_stage(corpus):
+    return keyMatrix.categorize_matrix(_key_matrix(corpus))
+
+
+def _key_cooccurrence_stage(corpus):
+    return keyMatrix.key_cooccurrence(_key_matrix(corpus))
+
+
+def _categories(corpus):
+    """{category: records} of the corpus, as the cleaning pipeline splits them."""
+    if "categories" not in corpus:
+        categories = {category: [] for category in catalogCache.CATEGORY_FILES}
+        for record, category in zip(corpus["records"], dbCleaning2.classify_batch(corpus["records"])[0]):
+            categories[category].append(record)
+        corpus["categories"] = categories
+    return corpus["categories"]
+
+
+def _data_dir(corpus):
+    """Data dir of the run with the corpus records written to the category files."""
+    data_dir = os.path.join(corpus["work_dir"], "data")
+    if not os.path.isdir(data_dir):
+        os.makedirs(data_dir)
+        for category, records in _categories(corpus).items():
+            dbCleaning2.save_json(records, catalogCache.category_path(category, data_dir))
+    return data_dir
+
+
+def _build_catalog_stage(corpus):
+    return catalogDb.build_catalog(os.path.join(corpus["work_dir"], "catalog.db"), _data_dir(corpus))
+
+
+def _feature_dir(corpus):
+    """Feature dir of the run with a store for every category specNormalizer types."""
+    feature_dir = os.path.join(corpus["work_dir"], "features")
+    if not os.path.isdir(feature_dir):
+        for category in specNormalizer.FIELDS:
+            featureStore.build_store(category, _data_dir(corpus), feature_dir)
+    return feature_dir
+
+
+def _recommender(corpus):
+    if "recommender" not in corpus:
+        corpus["recommender"] = recommender.Recommender.from_store(data_dir=_data_dir(corpus), feature_dir=_feature_dir(corpus))
+    return corpus["recommender"]
+
+
+def _recommend_stage(corpus):
+    ranker = _recommender(corpus)
+    return [ranker.rank(profile["weights"], profile.get("constraints")) for profile in recommender.PROFILES.values()]
+
+
+def _similar_index(corpus):
+    if "similar_index" not in corpus:
+        feature_dir = _feature_dir(corpus)
+        corpus["similar_index"] = similarIndex.load_index(
+            os.path.join(feature_dir, "camera_body_similar.npz"), data_dir=_data_dir(corpus), feature_dir=feature_dir)
+    return corpus["similar_index"]
+
+
+def _similar_stage(same_mount):
+    def run(corpus):
+        index = _similar_index(corpus)
+        return [index.similar(row, same_mount=same_mount) for row in range(len(index.z))]
+    return run
+
+
+def _mount_index(corpus):
+    if "mount_index" not in corpus:
+        feature_dir = _feature_dir(corpus)
+        corpus["mount_index"] = mountRegistry.load_index(
+            os.path.join(feature_dir, "mount_index.npz"), data_dir=_data_dir(corpus), feature_dir=feature_dir)
+    return corpus["mount_index"]
+
+
+def _lenses_for_body_stage(corpus):
+    index = _mount_index(corpus)
+    return [index.lenses_for_body(body) for body in range(len(index.store("camera_body")))]
+
+
+def _teleconverter_index(corpus):
+    if "teleconverter_index" not in corpus:
+        feature_dir = _feature_dir(corpus)
+        corpus["teleconverter_index"] = teleconverterIndex.load_index(
+            os.path.join(feature_dir, "teleconverter_pairs.npz"), os.path.join(feature_dir, "mount_index.npz"),
+            _data_dir(corpus), feature_dir)
+    return corpus["teleconverter_index"]
+
+
+def _teleconverter_search_stage(corpus):
+    index = _teleconverter_index(corpus)
+    return [index.search(REACH, index.pairs_for_lens(lens)) for lens in range(len(index.store("lens")))]
+
+
+def _build_facets_stage(corpus):
+    return facetIndex.load_facets("camera_body", _data_dir(corpus))
+
+
+def _facets(corpus):
+    if "facets" not in corpus:
+        corpus["facets"] = _build_facets_stage(corpus)
+    return corpus["facets"]
+
+
+def _facet_counts_stage(corpus):
+    # Multi-select counts with each of the three most common values of every facet as the filter
+    index = _facets(corpus)
+    return [index.facet_counts({facet: value}) for facet in index.bitmaps for value in index.values(facet)[:3]]
+
+
+def _range_index(corpus):
+    if "range_index" not in corpus:
+        feature_dir = _feature_dir(corpus)
+        corpus["range_index"] = rangeIndex.load_ranges("camera_body", _data_dir(corpus), feature_dir, os.path.join(feature_dir, "ranges"))
+    return corpus["range_index"]
+
+
+def _range_rows_stage(corpus):
+    # Every numeric column from its median up, then all of them at once
+    index = _range_index(corpus)
+    constraints = {column: (float(np.median(index.sorted[column])), None) for column in index.columns if len(index.sorted[column])}
+    return [index.rows({column: bounds}) for column, bounds in constraints.items()] + [index.rows(constraints)]
+
+
+def _stores(corpus):
+    if "stores" not in corpus:
+        feature_dir = _feature_dir(corpus)
+        corpus["stores"] = {category: featureStore.open_store(category, feature_dir) for category in specNormalizer.FIELDS}
+    return corpus["stores"]
+
+
+def _skyline_stage(corpus):
+    stores = _stores(corpus)
+    return [skyline.skyline(stores[category], dimensions) for category, dimensions in skyline.DEFAULT_DIMENSIONS.items()]
+
+
+def _load_json_stage(corpus):
+    data_dir = _data_dir(corpus)
+    return {category: catalogCache.load_json(catalogCache.category_path(category, data_dir)) for category in catalogCache.CATEGORY_FILES}
+
+
+def _load_catalog_stage(corpus):
+    return catalogCache.load_catalog(_data_dir(corpus))
+
+
+def _compact(corpus):
+    if "compact" not in corpus:
+        corpus["compact"] = _compact_records_stage(corpus)
+    return corpus["compact"]
+
+
+def _compact_records_stage(corpus):
+    categories = _categories(corpus)
+    return {category: compactRecords.compact_records(categories[category], category) for category in compactRecords.RECORD_TYPES}
+
+
+def _read_dict_fields_stage(corpus):
+    categories = _categories(corpus)
+    values = []
+    for category, record_type in compactRecords.RECORD_TYPES.items():
+        keys = record_type.KEYS[1:READ_FIELDS + 1]
+        values.extend([record.get(key) for key in keys] for record in categories[category])
+    return values
+
+
+def _read_compact_fields_stage(corpus):
+    values = []
+    for category, records in _compact(corpus).items():
+        read_fields = attrgetter(*compactRecords.RECORD_TYPES[category].ATTRIBUTES[1:READ_FIELDS + 1])
+        values.extend(map(read_fields, records))
+    return values
+
+
+def _save_json_stage(corpus):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dbCleaning2.save_json(corpus["records"], os.path.join(tmp_dir, "all_specs.json"))
+
+
+# name -> function(corpus); each stage processes every page or record of the corpus once
+STAGES = {
+    "extract_specs[bs4]": _extract_stage("bs4", False),
+    "extract_specs[lxml]": _extract_stage("lxml", False),
+    "extract_specs[bs4+prefilter]": _extract_stage("bs4", True),
+    "extract_specs[lxml+prefilter]": _extract_stage("lxml", True),
+    "categorize_item": _categorize_stage,
+    "classify_batch": _classify_batch_stage,
+    "build_key_matrix": _build_key_matrix_stage,
+    "categorize_matrix": _categorize_matrix_stage,
+    "key_cooccurrence": _key_cooccurrence_stage,
+    "save_json": _save_json_stage,
+    "build_catalog": _build_catalog_stage,
+    "compact_records": _compact_records_stage,
+    "load_json": _load_json_stage,
+    "load_catalog[snapshot]": _load_catalog_stage,
+    "read_fields[dict]": _read_dict_fields_stage,
+    "read_fields[compact]": _read_compact_fields_stage,
+    "recommend": _recommend_stage,
+    "similar": _similar_stage(False),
+    "similar[same_mount]": _similar_stage(True),
+    "lenses_for_body": _lenses_for_body_stage,
+    "teleconverter_search": _teleconverter_search_stage,
+    "build_facets": _build_facets_stage,
+    "facet_counts": _facet_counts_stage,
+    "range_rows": _range_rows_stage,
+    "skyline": _skyline_stage,
+}
+
+# name -> function(corpus) run once before the stage is timed, for what it reads but does not build
+SETUP = {
+    "categorize_matrix": _key_matrix,
+    "key_cooccurrence": _key_matrix,
+    # One build first, so the timed ones read the normalized columns from their cache as a rebuild does
+    "build_catalog": _build_catalog_stage,
+    "compact_records": _categories,
+    "load_json": _data_dir,
+    # Writes the snapshots, so the timed loads read them
+    "load_catalog[snapshot]": _load_catalog_stage,
+    "read_fields[dict]": _categories,
+    "read_fields[compact]": _compact,
+    "recommend": _recommender,
+    "similar": _similar_index,
+    "similar[same_mount]": _similar_index,
+    "lenses_for_body": _mount_index,
+    "teleconverter_search": _teleconverter_index,
+    # Writes the camera_body snapshot the builds read
+    "build_facets": _build_facets_stage,
+    "facet_counts": _facets,
+    "range_rows": _range_index,
+    "skyline": _stores,
+}
+
+
+def measure(stage, corpus, count, measure_memory=True):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        stage(corpus)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            break
+    seconds = elapsed / runs
+
+    result = {"seconds": round(seconds, 6), "runs": runs, "items_per_sec": round(count / seconds, 1) if seconds else None}
+    if measure_memory:
+        tracemalloc.start()
+        stage(corpus)
+        result["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+    return result
+
+
+def run_benchmark(size, corpus_dir=None, stages=None, seed=0, measure_memory=True):
+    """Benchmark the selected stages on a synthetic corpus of size pages."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = corpus_dir or os.path.join(tmp_dir, "corpus")
+        start = time.perf_counter()
+        filepaths = syntheticCorpus.generate_corpus(corpus_dir, size, seed)
+        generate_seconds = time.perf_counter() - start
+
+        corpus = {
+            "dir": corpus_dir,
+            "filepaths": filepaths,
+            "records": [dbCleaning2.extract_specs(filepath, "lxml") for filepath in filepaths],
+            "work_dir": tmp_dir,
+        }
+
+        results = {}
+        for name in stages or STAGES:
+            if name in SETUP:
+                SETUP[name](corpus)
+            results[name] = measure(STAGES[name], corpus, size, measure_memory)
+            print(f"  {name:<32} {results[name]['seconds']:>10.4f}s {results[name]['items_per_sec'] or 0:>12.1f} items/sec"
+                  + (f" {results[name]['peak_kb']:>12.1f} KB peak" if measure_memory else ""))
+
+    return {"size": size, "seed": seed, "generate_seconds": round(generate_seconds, 2), "stages": results}
+
+
+def load_baseline(filename=BASELINE_FILE):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def find_regressions(result, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Return a message for each stage that is slower than its baseline by more than tolerance."""
+    previous = baseline.get(str(result["size"]), {}).get("stages", {})
+    regressions = []
+    for name, stats in result["stages"].items():
+        if name not in previous or not previous[name]["items_per_sec"] or not stats["items_per_sec"]:
+            continue
+        ratio = stats["items_per_sec"] / previous[name]["items_per_sec"]
+        if ratio < 1 - tolerance:
+            regressions.append(f"{name} at {result['size']} pages: {ratio:.0%} of baseline throughput")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DPReview cleaning pipeline on a synthetic corpus.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[SIZES[0]], help=f"corpus sizes (e.g. {' '.join(map(str, SIZES))})")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), help="stages to run (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    results = {}
+    regressions = []
+    for size in args.sizes:
+        print(f"{size} pages:")
+        result = run_benchmark(size, stages=args.stages, seed=args.seed, measure_memory=not args.no_memory)
+        results[str(size)] = result
+        regressions += find_regressions(result, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    for message in regressions:
+        print(f"REGRESSION: {message}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import marshal
+import hashlib
+from functools import partial
+
+import jsonStream
+
+'''
+Fast-start loading of the category files for read-only consumers.
+
+Each category file gets a snapshot next to it (lens.json -> lens.json.snapshot): a one-line JSON
+header with the size, mtime and hash of the source, then the records as one marshal blob (read
+with a single marshal.loads, which decodes about twice as fast as json). load_records()
+uses the snapshot when the size and mtime still match; when only the mtime changed (a touch, a
+copy, a checkout) the source hash decides, and the snapshot is re-stamped rather than rebuilt.
+Otherwise the JSON is parsed again and the snapshot rewritten. marshal is tied to the Python
+version, which is part of the header, so another interpreter just rebuilds it.
+
+Arrays are read by the streaming jsonStream reader, which reports syntax faults with their line
+and column and can repair trivial ones (recover=True); "python catalogCache.py validate" checks
+every category file that way.
+
+This module only uses the standard library and jsonStream. It does not import dbCleaning2 (and
+through it BeautifulSoup and lxml), so scripts that only read the catalog start in a few
+milliseconds.
+CATEGORY_FILES and the JSON readers live here; dbCleaning2 imports CATEGORY_FILES from this module.
+'''
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT_VERSION = 2
+
+CATEGORY_FILES = {
+    "camera_body": "camera_body.json",
+    "lens": "lens.json",
+    "printer": "printer.json",
+    "fixed_lens": "fixed_lens.json",
+    "mobile_device": "mobile_device.json",
+    "teleconverter": "teleconverter.json",
+    "misc": "misc.json"
+}
+
+
+def iter_json_records(filename, recover=False, faults=None):
+    """Yield the records of a JSON array file or a JSONL file, detected from the content.
+
+    Arrays are streamed by jsonStream; recover and faults are passed on to it.
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+
+        if first == "[":
+            reader = jsonStream.JsonArrayReader(f, filename, recover)
+            yield from reader
+            if faults is not None:
+                faults.extend(reader.faults)
+            return
+
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_json(filename, recover=False):
+    """Load a category file written in either output format."""
+    return list(iter_json_records(filename, recover))
+
+
+def file_hash(filepath):
+    digest = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for block in iter(partial(f.read, 1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_filename(filepath):
+    return filepath + SNAPSHOT_SUFFIX
+
+
+def _header(stat, source_hash, faults):
+    return {
+        "version": SNAPSHOT_VERSION,
+        "python": list(sys.version_info[:2]),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": source_hash,
+        "faults": faults,
+    }
+
+
+def read_snapshot(filepath, recover=False):
+    """Records from the snapshot of filepath if it is still valid for the source, else None.
+
+    A snapshot of a file that needed repairs is only valid for recover=True, so strict loads
+    still report the fault.
+    """
+    snapshot = snapshot_filename(filepath)
+    try:
+        with open(snapshot, 'rb') as f:
+            header = json.loads(f.readline())
+            stat = os.stat(filepath)
+            if header.get("version") != SNAPSHOT_VERSION or header.get("python") != list(sys.version_info[:2]):
+                return None
+            if header["faults"] and not recover:
+                return None
+            if header["size"] != stat.st_size:
+                return None
+            if header["mtime_ns"] == stat.st_mtime_ns:
+                return marshal.loads(f.read())
+            if header["hash"] != file_hash(filepath):
+                return None
+            records = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+    # Same content under a new mtime: re-stamp so the next load skips the hash again
+    write_snapshot(filepath, records, header["hash"], header["faults"])
+    return records
+
+
+def write_snapshot(filepath, records, source_hash=None, faults=()):
+    """Write the snapshot of filepath; a read-only data folder only costs the speedup."""
+    snapshot = snapshot_filename(filepath)
+    tmp_snapshot = snapshot + ".tmp"
+    try:
+        stat = os.stat(filepath)
+        with open(tmp_snapshot, 'wb') as f:
+            header = _header(stat, source_hash or file_hash(filepath), [list(fault) for fault in faults])
+            f.write(json.dumps(header).encode() + b"\n")
+            f.write(marshal.dumps(records))
+        os.replace(tmp_snapshot, snapshot)
+    except OSError as e:
+        print(f"Could not write {snapshot}: {e}", file=sys.stderr)
+
+
+def load_records(filepath, recover=False):
+    """The records of a JSON/JSONL file, through its snapshot when that is still valid.
+
+    With recover=True trivial syntax faults (see jsonStream) are repaired, with a warning when
+    the file is parsed; otherwise they raise jsonStream.JsonSyntaxError (a ValueError).
+    """
+    records = read_snapshot(filepath, recover)
+    if records is None:
+        faults = []
+        records = list(iter_json_records(filepath, recover, faults))
+        for line, column, message in faults:
+            print(f"Warning: {filepath}:{line}:{column}: {message} (repaired)", file=sys.stderr)
+        write_snapshot(filepath, records, faults=faults)
+    return records
+
+
+def category_path(category, data_dir=DATA_DIR):
+    return os.path.join(data_dir, CATEGORY_FILES[category])
+
+
+def load_category(category, data_dir=DATA_DIR, recover=False):
+    return load_records(category_path(category, data_dir), recover)
+
+
+def load_catalog(data_dir=DATA_DIR, categories=None, recover=False):
+    """{category: records} for every category file that exists."""
+    return {
+        category: load_category(category, data_dir, recover)
+        for category in categories or CATEGORY_FILES
+        if os.path.exists(category_path(category, data_dir))
+    }
+
+
+def validate(filepaths):
+    """Check every file in one streaming pass each; prints the faults and returns how many files had any."""
+    failed = 0
+    for filepath in filepaths:
+        count, faults = jsonStream.validate_file(filepath)
+        for line, column, message in faults:
+            print(f"{filepath}:{line}:{column}: {message}")
+        print(f"{os.path.basename(filepath)}: {count} records, {'OK' if not faults else f'{len(faults)} fault(s)'}")
+        failed += bool(faults)
+    return failed
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["validate"]:
+        # python catalogCache.py validate [FILE ...] -- check the category files (default: all that exist)
+        filepaths = sys.argv[2:] or [category_path(c) for c in CATEGORY_FILES if os.path.exists(category_path(c))]
+        sys.exit(1 if validate(filepaths) else 0)
+
+    # python catalogCache.py [CATEGORY ...] -- build stale snapshots (benchmark.py times loading them against json)
+    for category in sys.argv[1:] or CATEGORY_FILES:
+        filepath = category_path(category)
+        if not os.path.exists(filepath):
+            continue
+        try:
+            records = load_category(category)
+        except ValueError as e:
+            print(f"Skipping {category}: {e}", file=sys.stderr)
+            continue
+        print(f"{category}: {len(records)} records, snapshot {os.path.basename(snapshot_filename(filepath))}")
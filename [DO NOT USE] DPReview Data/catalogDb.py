@@ -0,0 +1,216 @@
+import os
+import sys
+import sqlite3
+
+import numpy as np
+
+import catalogCache
+import specNormalizer
+
+'''
+Builds one SQLite database from the category files, so consumers can query the catalog through
+indexes instead of loading and scanning every JSON file.
+
+Each category gets a table with its typed columns from specNormalizer.load_normalized (REAL, NULL
+when the value is missing) plus the raw title, lens mount and sensor size. Every other spec field
+goes to the key/value side table specs, and so does the raw string behind a yes/no column
+("Sensor-shift" next to stabilized = 1), which the flag alone does not keep. A lens lists all the mounts it is
+made for in one string, so item_mounts holds one row per (item, mount) for mount lookups.
+title_search is an FTS5 index over every title.
+
+B-tree indexes cover lens mount, sensor size, weight and price wherever a category has them, so
+a query like lens_query(conn, mount="Sony E", max_weight_g=500) is a couple of index lookups.
+The database is rebuilt from scratch by build_catalog and swapped in atomically.
+'''
+
+CATALOG_DB = os.path.join(specNormalizer.DATA_DIR, "catalog.db")
+
+# Raw text columns kept on every category table: column -> source keys, first one present wins
+TEXT_COLUMNS = {
+    "title": ("Title",),
+    "lens_mount": ("Lens mount",),
+    "sensor_size": ("Sensor size", "Max Format size"),
+}
+INDEXED_COLUMNS = ("lens_mount", "sensor_size", "weight_g", "msrp_usd")
+
+
+def first_present(record, keys):
+    for key in keys:
+        if key in record:
+            return record[key]
+    return None
+
+
+def split_mounts(value):
+    """"Canon EF, Nikon F (FX)" -> ["Canon EF", "Nikon F (FX)"]"""
+    return [mount.strip() for mount in value.split(",") if mount.strip()] if value else []
+
+
+def create_category_table(conn, category, typed_columns):
+    columns = [f'"{name}" TEXT' for name in TEXT_COLUMNS] + [f'"{name}" REAL' for name in typed_columns]
+    conn.execute(f'CREATE TABLE "{category}" (id INTEGER PRIMARY KEY, {", ".join(columns)})')
+
+
+def create_indexes(conn, category, typed_columns):
+    existing = set(TEXT_COLUMNS) | set(typed_columns)
+    for column in INDEXED_COLUMNS:
+        if column in existing:
+            conn.execute(f'CREATE INDEX "{category}_{column}" ON "{category}" ("{column}")')
+
+
+def insert_category(conn, category, records, typed):
+    """Insert records of category and their specNormalizer columns into its table and the shared side tables.
+
+    Returns the row count.
+    """
+    typed = {name: column for name, column in typed.items() if name != "title"}
+    typed_columns = list(typed)
+    create_category_table(conn, category, typed_columns)
+
+    # Source keys promoted to a column do not go to the key/value table as well, unless the
+    # column is a flag that drops the text (the kind of stabilization, of viewfinder, ...)
+    promoted = {key for keys in TEXT_COLUMNS.values() for key in keys}
+    promoted.update(key for key, parser, _ in specNormalizer.FIELDS.get(category, ())
+                    if parser not in specNormalizer.FLAG_PARSERS)
+
+    # NaN -> NULL: an object array lets one tolist() hand sqlite plain floats and Nones
+    matrix = np.column_stack([typed[name] for name in typed_columns]).astype(object) if typed_columns else None
+    if matrix is not None:
+        matrix[np.isnan(matrix.astype(float))] = None
+    typed_rows = matrix.tolist() if matrix is not None else [[] for _ in records]
+
+    rows, specs, mounts, titles = [], [], [], []
+    for item_id, (record, typed_values) in enumerate(zip(records, typed_rows), start=1):
+        text_values = [first_present(record, keys) for keys in TEXT_COLUMNS.values()]
+        rows.append([item_id] + text_values + typed_values)
+        specs.extend((category, item_id, key, value) for key, value in record.items() if key not in promoted)
+        mounts.extend((category, item_id, mount) for mount in split_mounts(record.get("Lens mount")))
+        titles.append((record.get("Title", ""), category, item_id))
+
+    placeholders = ", ".join("?" * (1 + len(TEXT_COLUMNS) + len(typed_columns)))
+    conn.executemany(f'INSERT INTO "{category}" VALUES ({placeholders})', rows)
+    conn.executemany("INSERT INTO specs VALUES (?, ?, ?, ?)", specs)
+    conn.executemany("INSERT INTO item_mounts VALUES (?, ?, ?)", mounts)
+    conn.executemany("INSERT INTO title_search VALUES (?, ?, ?)", titles)
+    create_indexes(conn, category, typed_columns)
+    return len(rows)
+
+
+def build_catalog(db_file=CATALOG_DB, data_dir=specNormalizer.DATA_DIR):
+    """Write every readable category file into a fresh database; returns {category: rows}."""
+    tmp_file = db_file + ".tmp"
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+
+    counts = {}
+    conn = sqlite3.connect(tmp_file)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        with conn:
+            conn.execute("CREATE TABLE specs (category TEXT, item_id INTEGER, key TEXT, value TEXT)")
+            conn.execute("CREATE TABLE item_mounts (category TEXT, item_id INTEGER, mount TEXT)")
+            conn.execute("CREATE VIRTUAL TABLE title_search USING fts5(title, category UNINDEXED, item_id UNINDEXED)")
+
+            for category, filename in catalogCache.CATEGORY_FILES.items():
+                filepath = os.path.join(data_dir, filename)
+                if not os.path.exists(filepath):
+                    continue
+                try:
+                    records = catalogCache.load_records(filepath, recover=True)
+                    typed = specNormalizer.load_normalized(category, data_dir)
+                except ValueError as e:
+                    print(f"Skipping {filename}: {e}", file=sys.stderr)
+                    continue
+                counts[category] = insert_category(conn, category, records, typed)
+
+            conn.execute("CREATE INDEX specs_item ON specs (category, item_id)")
+            conn.execute("CREATE INDEX specs_key ON specs (key, value)")
+            conn.execute("CREATE INDEX item_mounts_mount ON item_mounts (mount, category)")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp_file, db_file)
+    return counts
+
+
+def connect(db_file=CATALOG_DB):
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def search_titles(conn, text, limit=20):
+    """Full-text title search (FTS5 query syntax), best matches first: [(category, item_id, title)]."""
+    rows = conn.execute(
+        "SELECT category, item_id, title FROM title_search WHERE title_search MATCH ? ORDER BY rank LIMIT ?",
+        (text, limit),
+    )
+    return [tuple(row) for row in rows]
+
+
+def table_columns(conn, category):
+    """Column names of a category table; ValueError for a category without one."""
+    columns = [row[1] for row in conn.execute("SELECT * FROM pragma_table_info(?)", (category,))]
+    if not columns:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT IN ('specs', 'item_mounts') "
+            "AND name NOT LIKE 'title_search%' ORDER BY name")]
+        raise ValueError(f"Unknown category: {category!r} (expected one of {tables})")
+    return columns
+
+
+def find_items(conn, category, mount=None, sensor_size=None, max_weight_g=None, max_price=None, order_by="id",
+               limit=None):
+    """Rows of a category table matching every given filter.
+
+    mount matches one of the item's mounts exactly ("Sony E"); sensor_size matches the raw sensor
+    or format string; max_weight_g and max_price compare the typed columns (items missing that
+    value are left out). order_by must be a column of the table.
+    """
+    # Both end up in the SQL text, so only names of existing tables and columns get through
+    columns = table_columns(conn, category)
+    if order_by and order_by not in columns:
+        raise ValueError(f"Cannot order {category} by {order_by!r} (expected one of {columns})")
+
+    where, params = [], []
+    if mount is not None:
+        where.append("id IN (SELECT item_id FROM item_mounts WHERE mount = ? AND category = ?)")
+        params += [mount, category]
+    if sensor_size is not None:
+        where.append("sensor_size = ?")
+        params.append(sensor_size)
+    if max_weight_g is not None:
+        where.append("weight_g <= ?")
+        params.append(max_weight_g)
+    if max_price is not None:
+        where.append("msrp_usd <= ?")
+        params.append(max_price)
+
+    sql = f'SELECT * FROM "{category}"'
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if order_by:
+        sql += f' ORDER BY "{order_by}"'
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return [dict(row) for row in conn.execute(sql, params)]
+
+
+def lens_query(conn, **filters):
+    return find_items(conn, "lens", **filters)
+
+
+def get_specs(conn, category, item_id):
+    """The long-tail spec fields of one item, as {key: value}."""
+    rows = conn.execute("SELECT key, value FROM specs WHERE category = ? AND item_id = ?", (category, item_id))
+    return dict(tuple(row) for row in rows)
+
+
+if __name__ == "__main__":
+    # python catalogDb.py [DB_FILE] -- rebuild the catalog database
+    db_file = sys.argv[1] if len(sys.argv) > 1 else CATALOG_DB
+    for category, count in build_catalog(db_file).items():
+        print(f"{category}: {count} rows")
+    print(f"Catalog written to {db_file}")
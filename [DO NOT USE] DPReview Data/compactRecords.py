@@ -0,0 +1,231 @@
+import os
+import re
+import sys
+import tracemalloc
+
+import catalogCache
+
+'''
+Compact in-memory records: one __slots__ class per category instead of a 30-60 key dict per product.
+
+The keys most records of a category have are slots, named after the key ("Weight (inc.
+batteries)" -> weight_inc_batteries); any other key goes to a per-record overflow dict that
+stays None for most records. String values are interned, so the thousands of "Yes", "No",
+"Unknown", "Canon EF" or "35mm FF" values share one object each.
+
+Records read like the dicts they replace (record["Lens mount"], record.get(key), key in
+record, items()) and like objects (record.lens_mount, None when the record lacks the key), and
+to_dict() rebuilds a plain dict (slot keys first, then overflow keys). Run this module for a
+memory comparison with the dict representation; benchmark.py times building the records and
+reading fields from them against the dicts.
+'''
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Keys present in roughly a third or more of each category's records; rarer keys go to the overflow dict
+CAMERA_BODY_KEYS = (
+    "Title", "Sensor type", "Image stabilization", "Lens mount", "Viewfinder type", "Aperture priority",
+    "Shutter priority", "Dimensions", "Body type", "Effective pixels", "Sensor size", "Battery",
+    "Max resolution", "Built-in flash", "Self-timer", "HDMI", "Uncompressed format", "Touch screen",
+    "Weight (inc. batteries)", "Live view", "Minimum shutter speed", "Exposure compensation", "Screen size",
+    "Image ratio w:h", "External flash", "Storage types", "Autofocus", "Continuous drive", "Remote control",
+    "Maximum shutter speed", "ISO", "Custom white balance", "Manual focus", "USB", "Environmentally sealed",
+    "Focal length multiplier", "Screen dots", "White balance presets", "Articulated LCD", "Orientation sensor",
+    "Microphone", "Sensor photo detectors", "Battery description", "JPEG quality levels", "GPS",
+    "Number of focus points", "Metering modes", "Manual exposure mode", "Flash modes", "Viewfinder coverage",
+    "Timelapse recording", "Viewfinder magnification", "Subject / scene modes", "Speaker", "Format",
+    "Screen type", "Other resolutions", "Processor", "Battery Life (CIPA)", "AE Bracketing", "WB Bracketing",
+    "Digital zoom", "Wireless", "MSRP", "Flash range", "Boosted ISO (maximum)", "Microphone port",
+    "Headphone port", "Wireless notes", "Resolutions", "Boosted ISO (minimum)", "Storage included",
+    "Viewfinder resolution",
+)
+LENS_KEYS = (
+    "Title", "Lens mount", "Maximum aperture", "Max Format size", "Focal length", "Lens type", "Autofocus",
+    "Minimum focus", "Elements", "Groups", "Minimum aperture", "Length", "Diameter", "Weight",
+    "Full time manual", "Image stabilization", "Aperture ring", "Distance scale", "Filter thread", "DoF scale",
+    "Number of diaphragm blades", "Hood supplied", "Maximum magnification", "Focus method", "Motor type",
+    "Special elements / coatings", "Tripod collar", "Colour", "Sealing", "Zoom method", "Materials",
+    "Hood product code", "Aperture notes",
+)
+TELECONVERTER_KEYS = (
+    "Title", "Lens type", "Max Format size", "Lens mount", "Elements", "Groups", "Full time manual", "Weight",
+    "Length", "Diameter", "Colour", "Sealing", "Notes",
+)
+MOBILE_DEVICE_KEYS = (
+    "Title", "OS", "Rear camera effective pixels (Primary)", "LCD size", "LCD dots", "Camera image stabilization",
+    "Display touch screen type", "Bluetooth", "Camera sensor type", "Wi-Fi", "Battery type", "Dimensions",
+    "OS Version", "Built in memory", "Display type", "Weight", "External memory card support", "GPS", "NFC",
+    "Camera HDR", "Ports", "Speaker", "Headphone jack", "Microphone", "Camera digital zoom", "Camera geotagging",
+    "Camera white balance", "Front camera effective pixels", "Video camera recording format",
+    "Camera exposure compensation", "LCD DPI", "Camera physical shutter release", "Available colors",
+    "Display protection", "Video camera image stabilization", "Rear camera resolution", "Processor",
+    "Rear camera aperture (Primary)", "Sound playback formats", "Camera focus mechanism",
+    "Battery user replaceable", "Video camera lighting", "Camera file formats", "Video playback formats",
+)
+PRINTER_KEYS = (
+    "Title", "Printer type", "Color technology", "Max color resolution", "Inks", "Max document size",
+    "Supported media", "Auto duplex / double sided printing", "Borderless printing", "Ethernet", "Wi-Fi",
+    "Bluetooth", "Weight", "Dimensions", "Fixed paper size", "Number of trays", "Memory card support",
+    "Display - touchscreen", "Batteries", "USB", "Direct printing", "Voice enabled", "Operating system",
+    "Max B/W resolution", "Color management", "Feeder capacity", "Ink type", "Supported media - notes", "Display",
+    "Photo print speed", "Color technology - notes", "Transparency adapter", "Scan to memory", "Scanner type",
+    "Max optical resolution", "Max scanner document size", "Display - size", "Color print speed (ISO, ESAT)",
+    "B/W print speed (ISO, ESAT)", "Tray capacity", "Scanner color depth", "Droplet size", "Editing / processing",
+    "Ink type - notes",
+)
+
+
+def attribute_name(key):
+    """"Weight (inc. batteries)" -> "weight_inc_batteries\""""
+    name = re.sub(r"\W+", "_", key.lower()).strip("_")
+    return "_" + name if name[:1].isdigit() else name
+
+
+class CompactRecord:
+    """Base class of the generated record types; KEYS are the slot keys of a subclass."""
+
+    __slots__ = ("_overflow",)
+    KEYS = ()
+    ATTRIBUTES = ()
+    _ATTRIBUTE_OF = {}
+    _SLOT_NAMES = frozenset()
+
+    @classmethod
+    def from_dict(cls, specs):
+        record = cls.__new__(cls)
+        attribute_of = cls._ATTRIBUTE_OF
+        intern = sys.intern
+        overflow = None
+        for key, value in specs.items():
+            if isinstance(value, str):
+                value = intern(value)
+            attribute = attribute_of.get(key)
+            if attribute is not None:
+                setattr(record, attribute, value)
+            else:
+                if overflow is None:
+                    overflow = {}
+                overflow[intern(key)] = value
+        record._overflow = overflow
+        return record
+
+    def __getattr__(self, name):
+        # Only reached for unset slots (keys this record does not have) and unknown names
+        if name in self._SLOT_NAMES:
+            return None
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def get(self, key, default=None):
+        attribute = self._ATTRIBUTE_OF.get(key)
+        if attribute is not None:
+            value = getattr(self, attribute)
+            return default if value is None else value
+        overflow = self._overflow
+        return overflow.get(key, default) if overflow else default
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def items(self):
+        for key, attribute in zip(self.KEYS, self.ATTRIBUTES):
+            value = getattr(self, attribute)
+            if value is not None:
+                yield key, value
+        if self._overflow:
+            yield from self._overflow.items()
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return sum(1 for _ in self.items())
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def make_record_type(name, keys):
+    """Create a CompactRecord subclass with one slot per key."""
+    attributes = tuple(attribute_name(key) for key in keys)
+    if len(set(attributes)) != len(attributes):
+        raise ValueError(f"{name}: keys map to duplicate attribute names")
+    return type(name, (CompactRecord,), {
+        "__slots__": attributes,
+        "__module__": __name__,
+        "KEYS": tuple(keys),
+        "ATTRIBUTES": attributes,
+        "_ATTRIBUTE_OF": dict(zip(keys, attributes)),
+        "_SLOT_NAMES": frozenset(attributes),
+    })
+
+
+# Module-level names so the records can be pickled
+CameraBodyRecord = make_record_type("CameraBodyRecord", CAMERA_BODY_KEYS)
+LensRecord = make_record_type("LensRecord", LENS_KEYS)
+TeleconverterRecord = make_record_type("TeleconverterRecord", TELECONVERTER_KEYS)
+MobileDeviceRecord = make_record_type("MobileDeviceRecord", MOBILE_DEVICE_KEYS)
+PrinterRecord = make_record_type("PrinterRecord", PRINTER_KEYS)
+
+RECORD_TYPES = {
+    "camera_body": CameraBodyRecord,
+    "lens": LensRecord,
+    "teleconverter": TeleconverterRecord,
+    "mobile_device": MobileDeviceRecord,
+    "printer": PrinterRecord,
+}
+
+
+def compact_records(records, category):
+    return list(map(RECORD_TYPES[category].from_dict, records))
+
+
+def load_compact(category, data_dir=DATA_DIR):
+    return compact_records(catalogCache.load_category(category, data_dir, recover=True), category)
+
+
+def _retained_kb(build):
+    """KB still allocated after build() returns its result (the result is kept alive until then)."""
+    tracemalloc.start()
+    result = build()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return current / 1024
+
+
+def compare_with_dicts(category, data_dir=DATA_DIR):
+    """Retained memory of dicts vs compact records for one category file."""
+    filepath = catalogCache.category_path(category, data_dir)
+    records = len(catalogCache.load_json(filepath, recover=True))
+    dict_kb = _retained_kb(lambda: catalogCache.load_json(filepath, recover=True))
+    compact_kb = _retained_kb(lambda: compact_records(catalogCache.load_json(filepath, recover=True), category))
+    return {
+        "records": records,
+        "dict_kb": round(dict_kb, 1),
+        "compact_kb": round(compact_kb, 1),
+        "memory_ratio": round(dict_kb / compact_kb, 2) if compact_kb else None,
+    }
+
+
+if __name__ == "__main__":
+    # python compactRecords.py [CATEGORY ...] -- compare memory with plain dicts
+    for category in sys.argv[1:] or RECORD_TYPES:
+        try:
+            result = compare_with_dicts(category)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {category}: {e}", file=sys.stderr)
+            continue
+        print(f"{category}: {result['records']} records, {result['dict_kb']} KB as dicts, "
+              f"{result['compact_kb']} KB compact ({result['memory_ratio']}x)")
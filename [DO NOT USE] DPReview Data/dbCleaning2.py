@@ -1,11 +1,61 @@
+import io
 import os
+import re
+import sys
 import json
+import time
+import hashlib
+import tarfile
+import zipfile
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain, islice
 from bs4 import BeautifulSoup
+from lxml import etree
 
-# Folders
+from catalogCache import CATEGORY_FILES, file_hash
+from pipelineStats import PipelineStats, timer
+
+# Folders (HTML_FOLDER may also be a .zip or .tar/.tar.gz archive of the dump; members are read in memory)
 HTML_FOLDER = "/Users/darinhall/IdeaProjects/CRS_Database/dpreview-data-specs/dpreview-data-specs/"
 ALL_SPECS_FILE = "all_specs.json"
 
+# Parallel extraction (WORKERS = 1 keeps the serial loop, None uses every core)
+WORKERS = 1
+CHUNK_SIZE = 32  # files handed to a worker process per task
+MAX_PENDING = 2  # chunks in flight per worker; caps how far reading runs ahead of the output
+
+# Spec extractor: "bs4" (BeautifulSoup tree search) or "lxml" (compiled XPath, same output)
+EXTRACTOR_BACKEND = "bs4"
+
+# Prefilter: slice the <title> and the spec-table region out of the raw bytes and parse only that
+# fragment; pages where the markers are missing or ambiguous fall back to a full parse
+PREFILTER = True
+
+# Incremental extraction: only new or changed files are parsed, the rest are read back from the
+# previous run's records. Opt-in; a run with another backend or prefilter setting parses everything.
+INCREMENTAL = False
+MANIFEST_FILE = "extract_manifest.json"  # relative to the working directory, like the output files
+MANIFEST_VERSION = 2
+
+# Output format: "json" (indented arrays, written at the end) or "jsonl" (one record per line,
+# written as soon as it is categorized so memory stays flat). Both go to the CATEGORY_FILES names,
+# so catalogCache and everything loading through it read either; the format is told from the content.
+OUTPUT_FORMAT = "json"
+
+# Kaggle release of the dump (one JSON record per line). Records carry the page HTML in one
+# of KAGGLE_HTML_FIELDS, or an already extracted label/value dict in one of KAGGLE_SPECS_FIELDS.
+KAGGLE_JSONL_FILE = "dpreview.jsonl"
+KAGGLE_HTML_FIELDS = ("html", "content", "page", "raw_html")
+KAGGLE_SPECS_FIELDS = ("specs", "specifications")
+KAGGLE_TITLE_FIELDS = ("title", "name")
+
+# Instrumentation: per-stage timings, rows per page, pages per category and the slowest files
+INSTRUMENT = False
+REPORT_FILE = "pipeline_report.json"
+
 '''
 Category explanation:
 __camera_body__: cameras with interchangable lenses
@@ -14,27 +64,145 @@ __printer__: just printers lol, has "Printer type" in the specs
 __fixed_lens__: fixed-lens cameras are cameras with a non-interchangeable lenses, when comparing to camera_body they have focal length and aperture in the specs
 __mobile_device__: mobile devices, has "OS" in the specs
 __teleconverter__: magnifiers that attach to other lenses to increase focal length
-'''
 
-CATEGORY_FILES = {
-    "camera_body": "camera_body.json",
-    "lens": "lens.json",
-    "printer": "printer.json",
-    "fixed_lens": "fixed_lens.json",
-    "mobile_device": "mobile_device.json",
-    "teleconverter": "teleconverter.json",
-    "misc": "misc.json"
-}
+CATEGORY_FILES (the output file of each category) lives in catalogCache.py with the JSON readers.
+'''
 
-def extract_specs(filepath):
-    """Extract label-value pairs from an HTML file."""
+def read_html(filepath):
     with open(filepath, 'r', encoding='utf-8') as file:
-        soup = BeautifulSoup(file, 'lxml')
+        return file.read()
+
+
+def decode_html(data):
+    """Decode raw page bytes exactly as read_html would (UTF-8, universal newlines)."""
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8').read()
+
+
+def read_html_bytes(filepath):
+    with open(filepath, 'rb') as file:
+        return file.read()
+
+
+_TITLE_OPEN = re.compile(rb"<title[\s>]")
+_LABEL_TH = re.compile(rb"<th\b[^>]*label")
+_VALUE_TD = re.compile(rb"<td\b[^>]*value")
+_TABLE_TAG = re.compile(rb"<(/?)(table|tr|td|th)[\s/>]")
+
+# Elements whose content is not parsed as ordinary body markup; a slice must not start inside one
+_RAW_CONTEXTS = (
+    (b"<!--", b"-->"), (b"<script", b"</script"), (b"<style", b"</style"), (b"<textarea", b"</textarea"),
+    (b"<template", b"</template"), (b"<select", b"</select"), (b"<svg", b"</svg"), (b"<math", b"</math"),
+    (b"<noscript", b"</noscript"),
+)
+
+
+def _plain_context(lowered, end):
+    """True if position end of the page is outside any table, comment, script or similar element."""
+    head = lowered[:end]
+    depth = dict.fromkeys((b"table", b"tr", b"td", b"th"), 0)
+    for tag in _TABLE_TAG.finditer(head):
+        # Stray end tags are ignored by the parser, so depth never drops below zero
+        depth[tag[2]] = depth[tag[2]] - 1 if tag[1] else depth[tag[2]] + 1
+        depth[tag[2]] = max(depth[tag[2]], 0)
+    if any(depth.values()):
+        return False
+    for opener, closer in _RAW_CONTEXTS:
+        opened = head.rfind(opener)
+        if opened != -1 and head.rfind(closer) < opened:
+            return False
+    return True
+
+
+def prefilter_html(data):
+    """Return the <title> element plus the span of tables holding the spec rows, or None.
+
+    The span runs from the <table> that opens before the first th.label to the </table> after
+    the last td.value, so it contains every row extract_specs can return. None means the markers
+    are missing or in a context where a slice could parse differently, and the whole page is needed.
+    """
+    lowered = data.lower()
+
+    labels = _LABEL_TH.search(lowered)
+    values = None
+    for values in _VALUE_TD.finditer(lowered):
+        pass
+    if labels is None or values is None:
+        return None
+
+    start = lowered.rfind(b"<table", 0, labels.start())
+    end = lowered.find(b"</table", values.end())
+    end = lowered.find(b">", end) + 1 if end != -1 else 0
+    if start == -1 or end <= 0 or not _plain_context(lowered, start):
+        return None
+
+    title = b""
+    title_open = _TITLE_OPEN.search(lowered, 0, start)
+    if title_open:
+        title_close = lowered.find(b"</title", title_open.end(), start)
+        title_end = lowered.find(b">", title_close, start) + 1 if title_close != -1 else 0
+        if title_end <= 0 or not _plain_context(lowered, title_open.start()):
+            return None
+        title = data[title_open.start():title_end]
+    elif b"<title" in lowered:
+        return None
+
+    return title + data[start:end]
+
+
+def extract_specs(source, backend=None, timings=None, prefilter=None):
+    """Extract label-value pairs from an HTML file path or the raw bytes of a page.
+
+    If a timings dict is given, the seconds spent reading, prefiltering, parsing and extracting
+    rows are stored in it under "read", "prefilter", "parse" and "rows".
+    """
+    build_tree, extract_rows = get_extractor(backend)
+    prefilter = PREFILTER if prefilter is None else prefilter
+
+    start = time.perf_counter()
+    data = source if isinstance(source, bytes) else read_html_bytes(source)
+    read_done = time.perf_counter()
+    fragment = prefilter_html(data) if prefilter else None
+    markup = decode_html(data if fragment is None else fragment)
+    prefilter_done = time.perf_counter()
+    tree = build_tree(markup)
+    parse_done = time.perf_counter()
+    specs = extract_rows(tree)
+
+    if timings is not None:
+        timings["read"] = read_done - start
+        timings["prefilter"] = prefilter_done - read_done
+        timings["parse"] = parse_done - prefilter_done
+        timings["rows"] = time.perf_counter() - parse_done
+    return specs
+
+
+def get_extractor(backend=None):
+    """Return the (build_tree, extract_rows) pair of an extractor backend."""
+    backend = backend or EXTRACTOR_BACKEND
+    if backend not in EXTRACTORS:
+        raise ValueError(f"Unknown extractor backend: {backend!r} (expected one of {sorted(EXTRACTORS)})")
+    return EXTRACTORS[backend]
+
+
+def parse_specs(markup, backend=None):
+    """Extract label-value pairs from HTML markup with the chosen backend."""
+    build_tree, extract_rows = get_extractor(backend)
+    return extract_rows(build_tree(markup))
+
+
+def clean_title(text):
+    return text.rstrip(" Specs: Digital Photography Review")
+
+
+def _bs4_tree(markup):
+    return BeautifulSoup(markup, 'lxml')
+
 
+def _bs4_rows(soup):
     specs = {}
     title_tag = soup.find("title")
     if title_tag:
-        item_title = title_tag.get_text(strip=True).rstrip(" Specs: Digital Photography Review")
+        item_title = clean_title(title_tag.get_text(strip=True))
         specs["Title"] = item_title
 
     for row in soup.find_all("tr"):
@@ -49,26 +217,422 @@ def extract_specs(filepath):
     return specs
 
 
+# XPath equivalents of soup.find("title") and row.find(tag, class_=...): the first
+# matching descendant in document order, with class matched as a whitespace-separated token
+_FIRST_TITLE = etree.XPath("(//title)[1]")
+_ALL_ROWS = etree.XPath("//tr")
+_FIRST_LABEL = etree.XPath("(.//th[contains(concat(' ', normalize-space(@class), ' '), ' label ')])[1]")
+_FIRST_VALUE = etree.XPath("(.//td[contains(concat(' ', normalize-space(@class), ' '), ' value ')])[1]")
+
+# BeautifulSoup keeps the text of these tags out of get_text()
+_HIDDEN_TEXT_TAGS = {"script", "style", "template", "rt", "rp"}
+
+
+def _lxml_text(element):
+    """Same result as BeautifulSoup's get_text(strip=True) for an lxml element."""
+    parts = []
+    if element.text:
+        parts.append(element.text.strip())
+    for child in element:
+        # Comments and processing instructions have a non-string tag; only their tail is text
+        if isinstance(child.tag, str) and child.tag not in _HIDDEN_TEXT_TAGS:
+            parts.append(_lxml_text(child))
+        if child.tail:
+            parts.append(child.tail.strip())
+    return "".join(parts)
+
+
+# lxml is given UTF-8 bytes: it rejects str markup that starts with an XML encoding declaration,
+# and the parser encoding overrides whatever charset the page declares
+_LXML_PARSER = etree.HTMLParser(encoding="utf-8")
+
+
+def _lxml_tree(markup):
+    root = etree.HTML(markup.encode('utf-8'), _LXML_PARSER)
+    # A page without a single element (empty, or only a doctype or comment) parses to None
+    return root if root is not None else etree.Element("html")
+
+
+def _lxml_rows(root):
+    specs = {}
+    title_tag = _FIRST_TITLE(root)
+    if title_tag:
+        specs["Title"] = clean_title(_lxml_text(title_tag[0]))
+
+    for row in _ALL_ROWS(root):
+        label_tag = _FIRST_LABEL(row)
+        value_tag = _FIRST_VALUE(row)
+
+        if label_tag and value_tag:
+            specs[_lxml_text(label_tag[0])] = _lxml_text(value_tag[0])
+
+    return specs
+
+
+# backend -> (build_tree, extract_rows); parsing and row extraction are split so they can be timed separately
+EXTRACTORS = {
+    "bs4": (_bs4_tree, _bs4_rows),
+    "lxml": (_lxml_tree, _lxml_rows),
+}
+
+
+def iter_sources(location=None):
+    """Yield (name, size, mtime_ns, source) for every page in a folder or archive.
+
+    source is the filepath for a folder and the member bytes for a .zip or tar archive,
+    so archives are read member by member without being unpacked to disk. extract_all only
+    reads as far as its window, so at most WORKERS * MAX_PENDING * CHUNK_SIZE members are in memory.
+    """
+    location = location or HTML_FOLDER
+
+    if os.path.isdir(location):
+        for filename in os.listdir(location):
+            filepath = os.path.join(location, filename)
+            stat = os.stat(filepath)
+            yield filename, stat.st_size, stat.st_mtime_ns, filepath
+
+    elif zipfile.is_zipfile(location):
+        with zipfile.ZipFile(location) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                mtime_ns = int(time.mktime(info.date_time + (0, 0, -1))) * 10**9
+                yield info.filename, info.file_size, mtime_ns, archive.read(info)
+
+    elif tarfile.is_tarfile(location):
+        # Stream mode ("r|*") decompresses a .tar.gz in one sequential pass with no seeking
+        with tarfile.open(location, 'r|*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                data = archive.extractfile(member).read()
+                yield member.name, member.size, int(member.mtime * 10**9), data
+
+    else:
+        raise ValueError(f"Not a folder or a .zip/.tar archive: {location!r}")
+
+
+def extract_specs_timed(source, backend=None, extractor=extract_specs, prefilter=None):
+    """Return (specs, timings) so per-stage timings survive the trip back from a worker process."""
+    timings = {}
+    specs = extractor(source, backend, timings=timings, prefilter=prefilter)
+    return specs, timings
+
+
+def _record_pages(results, stats):
+    for specs, timings in results:
+        stats.add_page(specs, timings)
+        yield specs
+
+
+def unnamed(named_sources, stats=None):
+    """Drop the names of (name, source) pairs, handing them to stats for its per-file report."""
+    if stats is not None:
+        return stats.track(named_sources)
+    return (source for _, source in named_sources)
+
+
+def extract_all(sources, workers=WORKERS, chunksize=CHUNK_SIZE, backend=None, extractor=extract_specs, stats=None,
+                prefilter=None):
+    """Yield the specs of each source (filepath or page bytes), in the same order as sources.
+
+    With stats, every page is timed and recorded; pass the sources through unnamed(..., stats)
+    so the report can name the slowest files.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # Bound explicitly: spawned workers re-import this module and would not see a changed
+    # EXTRACTOR_BACKEND or PREFILTER
+    backend = backend or EXTRACTOR_BACKEND
+    prefilter = PREFILTER if prefilter is None else prefilter
+    if stats is None:
+        extract = partial(extractor, backend=backend, prefilter=prefilter)
+    else:
+        extract = partial(extract_specs_timed, backend=backend, extractor=extractor, prefilter=prefilter)
+
+    if workers <= 1:
+        results = map(extract, sources)
+        yield from (results if stats is None else _record_pages(results, stats))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = _bounded_map(pool, extract, sources, workers * MAX_PENDING, chunksize)
+        yield from (results if stats is None else _record_pages(results, stats))
+
+
+def _extract_chunk(extract, chunk):
+    return [extract(source) for source in chunk]
+
+
+def _bounded_map(pool, extract, sources, window, chunksize):
+    """pool.map(extract, sources) that keeps at most window chunks of chunksize sources in flight.
+
+    Executor.map submits every task before returning its first result, which reads a whole
+    folder, archive or dpreview.jsonl into memory; here the next chunk is only read once the
+    oldest one is done. Chunks are yielded in submission order, so the output matches a serial run.
+    """
+    sources = iter(sources)
+    pending = deque()
+    while True:
+        chunk = list(islice(sources, chunksize))
+        if chunk:
+            pending.append(pool.submit(_extract_chunk, extract, chunk))
+        if not pending:
+            return
+        if len(pending) >= window or not chunk:
+            yield from pending.popleft().result()
+
+
+def iter_kaggle_lines(filename=KAGGLE_JSONL_FILE):
+    """Yield the non-empty lines of dpreview.jsonl one at a time."""
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def extract_kaggle_record(line, backend=None, timings=None, prefilter=None):
+    """Extract the same label-value dict as extract_specs from one dpreview.jsonl line."""
+    start = time.perf_counter()
+    record = json.loads(line)
+    if timings is not None:
+        timings["read"] = time.perf_counter() - start
+
+    for field in KAGGLE_HTML_FIELDS:
+        if isinstance(record.get(field), str):
+            # Go through bytes so newlines are normalized exactly as for the HTML files
+            page_timings = {} if timings is not None else None
+            specs = extract_specs(record[field].encode('utf-8'), backend, page_timings, prefilter)
+            if timings is not None:
+                timings["read"] += page_timings.pop("read")
+                timings.update(page_timings)
+            return specs
+
+    for field in KAGGLE_SPECS_FIELDS:
+        if isinstance(record.get(field), dict):
+            specs = {}
+            for title_field in KAGGLE_TITLE_FIELDS:
+                if isinstance(record.get(title_field), str):
+                    specs["Title"] = clean_title(record[title_field].strip())
+                    break
+            specs.update(record[field])
+            return specs
+
+    raise ValueError(f"Record has none of the fields {KAGGLE_HTML_FIELDS + KAGGLE_SPECS_FIELDS}: {sorted(record)}")
+
+
+def source_hash(source):
+    if isinstance(source, bytes):
+        return hashlib.sha1(source).hexdigest()
+    return file_hash(source)
+
+
+def extraction_settings(backend=None, prefilter=None):
+    """The settings a cached record depends on; a manifest written with other settings is not reused."""
+    return {"backend": backend or EXTRACTOR_BACKEND, "prefilter": PREFILTER if prefilter is None else prefilter}
+
+
+def manifest_records_filename(filename=MANIFEST_FILE):
+    """The JSONL file the manifest entries point into (extract_manifest.records.jsonl)."""
+    return os.path.splitext(filename)[0] + ".records.jsonl"
+
+
+def load_manifest(filename=MANIFEST_FILE, settings=None):
+    """Return the pages of the extraction manifest: {filename: {size, mtime_ns, sha1, offset, length}}.
+
+    offset and length locate the page's record in the records file. A manifest of another
+    MANIFEST_VERSION or other extraction settings, or one without its records file, counts as
+    empty, so every page is parsed again.
+    """
+    if not os.path.exists(filename) or not os.path.exists(manifest_records_filename(filename)):
+        return {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("settings") != (settings or extraction_settings()):
+        return {}
+    return manifest["pages"]
+
+
+def save_manifest(pages, settings=None, filename=MANIFEST_FILE):
+    # Write to a temporary file first so an interrupted run never leaves a truncated manifest
+    manifest = {"version": MANIFEST_VERSION, "settings": settings or extraction_settings(), "pages": pages}
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_filename, filename)
+
+
+def read_record(records, entry):
+    """The record a manifest entry points to, from the open (binary) records file."""
+    records.seek(entry["offset"])
+    return json.loads(records.read(entry["length"]))
+
+
+def write_record(records, specs):
+    """Append specs to the open (binary) records file; returns its {offset, length}."""
+    line = json.dumps(specs).encode('utf-8') + b"\n"
+    offset = records.tell()
+    records.write(line)
+    return {"offset": offset, "length": len(line)}
+
+
+def replace_records(pages, settings, filename=MANIFEST_FILE):
+    """Move the records written to the .tmp records file into place and save the manifest for them."""
+    # Without a manifest the next run parses everything, so a crash in between never mixes
+    # old offsets with new records
+    if os.path.exists(filename):
+        os.remove(filename)
+    records_filename = manifest_records_filename(filename)
+    os.replace(records_filename + ".tmp", records_filename)
+    save_manifest(pages, settings, filename)
+
+
+def extract_incremental(sources, manifest_file=MANIFEST_FILE, workers=WORKERS, chunksize=CHUNK_SIZE, backend=None,
+                        stats=None, prefilter=None):
+    """Yield the specs of sources in order, parsing only new or changed pages; the manifest is updated at the end.
+
+    sources are (name, size, mtime_ns, source) tuples from iter_sources. A page is reused
+    when its size and mtime match the manifest, or when they differ but its content hash
+    does not. The manifest keeps hashes and record offsets only; each record is written to the
+    new records file as it is yielded, so pages no longer present drop out. Like extract_all
+    this streams: pages to parse go through extract_all's window and cached records are read
+    back by offset when their turn comes, so only their names queue up in between.
+    """
+    settings = extraction_settings(backend, prefilter)
+    manifest = load_manifest(manifest_file, settings)
+    records_filename = manifest_records_filename(manifest_file)
+    new_manifest = {}
+    queued = deque()  # (name, parsed) of the pages read from sources and not yielded yet
+
+    def pages_to_parse():
+        for name, size, mtime_ns, source in sources:
+            entry = manifest.get(name)
+            if entry and entry["size"] == size and entry["mtime_ns"] == mtime_ns:
+                new_manifest[name] = entry
+                queued.append((name, False))
+                continue
+
+            sha1 = source_hash(source)
+            if entry and entry["sha1"] == sha1:
+                new_manifest[name] = dict(entry, size=size, mtime_ns=mtime_ns)
+                queued.append((name, False))
+            else:
+                new_manifest[name] = {"size": size, "mtime_ns": mtime_ns, "sha1": sha1}
+                queued.append((name, True))
+                yield name, source
+
+    parsed = extract_all(unnamed(pages_to_parse(), stats), workers, chunksize, settings["backend"], stats=stats,
+                         prefilter=settings["prefilter"])
+    total = parsed_count = 0
+    with ExitStack() as stack:
+        old_records = stack.enter_context(open(records_filename, 'rb')) if manifest else None
+        new_records = stack.enter_context(open(records_filename + ".tmp", 'wb'))
+        # Each parsed page is preceded by the cached pages queued before it; the final None
+        # flushes the cached pages after the last parsed one
+        for specs in chain(parsed, [None]):
+            while queued:
+                name, is_parsed = queued.popleft()
+                entry = new_manifest[name]
+                record = specs if is_parsed else read_record(old_records, entry)
+                entry.update(write_record(new_records, record))
+                total += 1
+                yield record
+                if is_parsed:
+                    parsed_count += 1
+                    break
+    replace_records(new_manifest, settings, manifest_file)
+
+    removed = len(manifest.keys() - new_manifest.keys())
+    if stats is not None:
+        stats.count("pages_cached", total - parsed_count)
+        stats.count("pages_removed", removed)
+    print(f"Incremental: {parsed_count} parsed, {total - parsed_count} cached, {removed} removed")
+
+
+# Pseudo-key for rules: present when the item's Lens type is "teleconverter"
+TELECONVERTER_KEY = "Lens type=teleconverter"
+
+# Category decision table, checked top to bottom; the first rule whose required keys are all
+# present and whose forbidden keys are all absent wins, otherwise the item is misc.
+# (rule, category, required keys, forbidden keys)
+CATEGORY_RULES = (
+    ("printer_type", "printer", ("Printer type",), ()),
+    ("os", "mobile_device", ("OS",), ()),
+    ("fixed_lens", "fixed_lens", ("Focal length", "Body type"), ("Lens mount",)),
+    ("viewfinder_coverage", "camera_body", ("Viewfinder coverage",), ()),
+    ("timelapse_gps", "camera_body", ("Timelapse recording", "GPS"), ()),
+    ("teleconverter", "teleconverter", (TELECONVERTER_KEY,), ()),
+    ("focal_length", "lens", ("Focal length",), ("Body type",)),
+    # Primes listed without a "Focal length" row (it is only in the title) are still lenses
+    ("lens_mount_type", "lens", ("Lens mount", "Lens type"), ("Body type",)),
+    ("exposure_compensation", "camera_body", ("Exposure compensation",), ()),
+)
+FALLBACK_RULE = ("fallback", "misc")
+
+
+def compile_rules(rules=CATEGORY_RULES):
+    """Compile rules into ((key, bit) pairs, table of (category, rule) indexed by key bitmask).
+
+    The table has an entry for every combination of the keys the rules mention, so classifying
+    an item is one membership check per key and one list lookup.
+    """
+    keys = sorted({key for _, _, required, forbidden in rules for key in required + forbidden})
+    bits = {key: 1 << i for i, key in enumerate(keys)}
+
+    table = []
+    for mask in range(1 << len(keys)):
+        for rule, category, required, forbidden in rules:
+            need = sum(bits[key] for key in required)
+            ban = sum(bits[key] for key in forbidden)
+            if mask & need == need and not mask & ban:
+                table.append((category, rule))
+                break
+        else:
+            table.append((FALLBACK_RULE[1], FALLBACK_RULE[0]))
+
+    key_bits = tuple((key, bits[key]) for key in keys if key != TELECONVERTER_KEY)
+    return key_bits, bits.get(TELECONVERTER_KEY, 0), table
+
+
+_KEY_BITS, _TELECONVERTER_BIT, _RULE_TABLE = compile_rules()
+
+
+def rule_mask(item):
+    """Bitmask of the rule keys present in item (plus the teleconverter Lens type)."""
+    mask = 0
+    for key, bit in _KEY_BITS:
+        if key in item:
+            mask |= bit
+    if "Lens type" in item and item["Lens type"].strip().lower() == "teleconverter":
+        mask |= _TELECONVERTER_BIT
+    return mask
+
+
+def classify_item(item):
+    """Return (category, rule that fired) for a single item."""
+    return _RULE_TABLE[rule_mask(item)]
+
+
 def categorize_item(item):
     """Categorize a single item based on its specs."""
-    lens_type = item.get("Lens type", "").strip().lower()
-
-    if "Printer type" in item:
-        return "printer"
-    elif "OS" in item:
-        return "mobile_device"
-    elif "Focal length" and "Body type" in item and "Lens mount" not in item:
-        return "fixed_lens"
-    elif "Viewfinder coverage" in item or ("Timelapse Recording" in item and "GPS" in item):
-        return "camera_body"
-    elif "Focal length" in item and "Body type" not in item:
-        return "lens"
-    elif lens_type == "teleconverter":
-        return "teleconverter"
-    else:
-        return "misc"
-    
+    return _RULE_TABLE[rule_mask(item)][0]
+
+
+def classify_batch(items):
+    """Classify many items at once; returns (categories, rules fired, {rule: count})."""
+    results = [_RULE_TABLE[rule_mask(item)] for item in items]
+    rule_counts = {}
+    for _, rule in results:
+        rule_counts[rule] = rule_counts.get(rule, 0) + 1
+    return [category for category, _ in results], [rule for _, rule in results], rule_counts
+
+
 def reclassify_misc(categories):
+    """Move misc items with Exposure compensation to camera_body.
+
+    categorize_item already applies this rule; this is only needed for category lists built
+    some other way, e.g. loaded from category files written before the rule table.
+    """
     still_misc = []
     for item in categories["misc"]:
         if ("Exposure compensation" in item):
@@ -83,28 +647,124 @@ def save_json(data, filename):
     with open(filename, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=4)
 
-def main():
+
+def write_json_outputs(extracted, stats=None):
+    """Collect every record and write indented JSON arrays once extraction is done."""
     data = [] # List of extracted specs (no separation)
     categories = {key: [] for key in CATEGORY_FILES}
 
-    for filename in os.listdir(HTML_FOLDER):
-        filepath = os.path.join(HTML_FOLDER, filename)
-        extracted_data = extract_specs(filepath)
+    for extracted_data in extracted:
         data.append(extracted_data)
 
-        category = categorize_item(extracted_data)
+        with timer(stats, "categorize"):
+            category = categorize_item(extracted_data)
         categories[category].append(extracted_data)
-    
-    reclassify_misc(categories)
 
-    save_json(data, ALL_SPECS_FILE)
+    with timer(stats, "write"):
+        save_json(data, ALL_SPECS_FILE)
+
+        for cat, items in categories.items():
+            save_json(items, CATEGORY_FILES[cat])
+
+    return len(data), {cat: len(items) for cat, items in categories.items()}
+
+
+def write_jsonl_outputs(extracted, stats=None):
+    """Write each record as one JSONL line to its category file as soon as it is categorized.
+
+    The files keep their CATEGORY_FILES names (lens.json holds JSONL then), so a rebuild in this
+    format replaces the arrays the catalog loaders read instead of sitting next to them.
+    """
+    total = 0
+    counts = {key: 0 for key in CATEGORY_FILES}
+
+    with ExitStack() as stack:
+        all_file = stack.enter_context(open(ALL_SPECS_FILE, 'w', encoding='utf-8'))
+        category_files = {
+            cat: stack.enter_context(open(filename, 'w', encoding='utf-8'))
+            for cat, filename in CATEGORY_FILES.items()
+        }
 
-    for cat, items in categories.items():
-        save_json(items, CATEGORY_FILES[cat])
+        for extracted_data in extracted:
+            with timer(stats, "categorize"):
+                category = categorize_item(extracted_data)
+
+            with timer(stats, "write"):
+                line = json.dumps(extracted_data) + "\n"
+                all_file.write(line)
+                category_files[category].write(line)
+            total += 1
+            counts[category] += 1
+
+    return total, counts
+
+
+OUTPUT_WRITERS = {
+    "json": write_json_outputs,
+    "jsonl": write_jsonl_outputs,
+}
+
+def print_summary(total, counts, elapsed, workers):
+    print(f"Extracted {total} total data points.")
+    rate = total / elapsed if elapsed else 0.0
+    print(f"Extraction: {elapsed:.2f}s, {rate:.1f} files/sec ({workers or os.cpu_count()} worker(s))")
+    for cat, count in counts.items():
+        print(f"{cat}: {count}")
+
+
+def finish_report(stats, total, counts, filename=REPORT_FILE):
+    stats.count("pages_total", total)
+    stats.pages_per_category = counts
+    stats.save(filename)
+    print(f"Pipeline report written to {filename}")
+
+
+def main(workers=WORKERS, chunksize=CHUNK_SIZE, backend=None, incremental=INCREMENTAL, output_format=OUTPUT_FORMAT,
+         instrument=INSTRUMENT, manifest_file=MANIFEST_FILE):
+    if output_format not in OUTPUT_WRITERS:
+        raise ValueError(f"Unknown output format: {output_format!r} (expected one of {sorted(OUTPUT_WRITERS)})")
+
+    stats = PipelineStats() if instrument else None
+    sources = iter_sources(HTML_FOLDER)
+
+    start = time.perf_counter()
+    if incremental:
+        extracted = extract_incremental(sources, manifest_file, workers, chunksize, backend, stats)
+    else:
+        named_sources = ((name, source) for name, _, _, source in sources)
+        extracted = extract_all(unnamed(named_sources, stats), workers, chunksize, backend, stats=stats)
+
+    total, counts = OUTPUT_WRITERS[output_format](extracted, stats)
+    print_summary(total, counts, time.perf_counter() - start, workers)
+    if stats is not None:
+        finish_report(stats, total, counts)
+
+
+def main_kaggle(filename=KAGGLE_JSONL_FILE, workers=WORKERS, chunksize=CHUNK_SIZE, backend=None, output_format="jsonl",
+                instrument=INSTRUMENT):
+    """One-pass rebuild from the Kaggle dpreview.jsonl release, streamed line by line.
+
+    The default JSONL output goes to the CATEGORY_FILES names like a JSON rebuild, so the catalog
+    loaders (catalogCache, featureStore, catalogDb) read the result directly.
+    """
+    if output_format not in OUTPUT_WRITERS:
+        raise ValueError(f"Unknown output format: {output_format!r} (expected one of {sorted(OUTPUT_WRITERS)})")
+
+    stats = PipelineStats() if instrument else None
+    named_lines = ((f"{filename}#{n}", line) for n, line in enumerate(iter_kaggle_lines(filename), 1))
+
+    start = time.perf_counter()
+    extracted = extract_all(unnamed(named_lines, stats), workers, chunksize, backend,
+                            extractor=extract_kaggle_record, stats=stats)
+    total, counts = OUTPUT_WRITERS[output_format](extracted, stats)
+    print_summary(total, counts, time.perf_counter() - start, workers)
+    if stats is not None:
+        finish_report(stats, total, counts)
 
-    print(f"Extracted {len(data)} total data points.")
-    for cat, items in categories.items():
-        print(f"{cat}: {len(items)}")
 
 if __name__ == "__main__":
-    main()
+    # python dbCleaning2.py [dpreview.jsonl] -- rebuild from the Kaggle release instead of HTML_FOLDER
+    if len(sys.argv) > 1 and sys.argv[1].endswith(".jsonl"):
+        main_kaggle(sys.argv[1])
+    else:
+        main()
@@ -0,0 +1,205 @@
+import re
+import sys
+
+import numpy as np
+
+import catalogCache
+import mountRegistry
+
+'''
+Bitmap facet engine for the yes/no and categorical specs people browse by.
+
+For every facet of a category (FACETS) and every value it takes, the rows having that value are
+one bitmap, a Python int with bit i set for row i. A filter {facet: value or [values]} is an OR
+of the value bitmaps inside a facet and an AND across facets; counts are int.bit_count() of a
+value bitmap ANDed with the selection. facet_counts() gives the usual multi-select counts: each
+facet is counted against the selection of every *other* facet, so the choices of a facet that
+already has a filter still show how many rows they would add.
+
+Values are cleaned once while building: "Yes(Water and dust resistant)" counts as "Yes"
+(head), the sensor class is kept without its dimensions, and lens mounts are canonical mounts
+(mountRegistry), one bit per listed mount. Rows missing a spec are in no value bitmap of it.
+Building takes a few milliseconds from the catalog snapshots (build_facets in benchmark.py), so
+the index is not persisted.
+'''
+
+_PARENTHESIS = re.compile(r"\s*\(.*$", re.DOTALL)
+
+
+def exact(value):
+    return [value.strip()]
+
+
+def head(value):
+    """"Yes(Water and dust resistant)" -> "Yes", "APS-C (23.5 x 15.6 mm)" -> "APS-C\""""
+    text = _PARENTHESIS.sub("", value).strip()
+    return [text.capitalize() if text.lower() in ("yes", "no") else text]
+
+
+def mounts(value):
+    """All canonical mounts of a lens mount string."""
+    return list(dict.fromkeys(mountRegistry.canonical_mount(v) for v in mountRegistry.split_variants(value)))
+
+
+# category -> facet -> (source key, value function returning the facet values of one raw string)
+FACETS = {
+    "camera_body": {
+        "lens_mount": ("Lens mount", mounts),
+        "body_type": ("Body type", exact),
+        "sensor_type": ("Sensor type", exact),
+        "sensor_size": ("Sensor size", head),
+        "image_stabilization": ("Image stabilization", head),
+        "sealed": ("Environmentally sealed", head),
+        "touch_screen": ("Touch screen", head),
+        "articulated_lcd": ("Articulated LCD", exact),
+        "viewfinder": ("Viewfinder type", exact),
+        "built_in_flash": ("Built-in flash", head),
+        "gps": ("GPS", exact),
+    },
+    "lens": {
+        "lens_mount": ("Lens mount", mounts),
+        "lens_type": ("Lens type", exact),
+        "format": ("Max Format size", exact),
+        "image_stabilization": ("Image stabilization", head),
+        "sealing": ("Sealing", head),
+        "autofocus": ("Autofocus", head),
+        "motor_type": ("Motor type", exact),
+        "aperture_ring": ("Aperture ring", head),
+        "focus_method": ("Focus method", exact),
+        "zoom_method": ("Zoom method", exact),
+    },
+    "teleconverter": {
+        "lens_mount": ("Lens mount", mounts),
+        "format": ("Max Format size", exact),
+    },
+    "printer": {
+        "printer_type": ("Printer type", exact),
+        "color_technology": ("Color technology", exact),
+        "ink_type": ("Ink type", exact),
+        "wi_fi": ("Wi-Fi", head),
+        "ethernet": ("Ethernet", head),
+        "duplex": ("Auto duplex / double sided printing", head),
+        "borderless": ("Borderless printing", head),
+    },
+    "mobile_device": {
+        "os": ("OS", exact),
+        "image_stabilization": ("Camera image stabilization", head),
+        "nfc": ("NFC", head),
+        "headphone_jack": ("Headphone jack", head),
+        "replaceable_battery": ("Battery user replaceable", head),
+    },
+}
+
+
+def to_bitmap(rows, count):
+    """Python int with the bits of rows set."""
+    bits = np.zeros(count, dtype=bool)
+    bits[rows] = True
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+def bitmap_rows(bitmap, count):
+    """Sorted row indexes of the set bits of bitmap."""
+    data = np.frombuffer(bitmap.to_bytes((count + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(data, bitorder="little")[:count])
+
+
+class FacetIndex:
+    def __init__(self, records, facets):
+        """records: the category's records in row order; facets: {facet: (source key, value function)}."""
+        self.count = len(records)
+        self.all = (1 << self.count) - 1
+        self.titles = [record.get("Title") for record in records]
+        self.bitmaps = {}
+        for facet, (key, values_of) in facets.items():
+            rows_of = {}
+            parsed = {}  # value function results per distinct raw string
+            for row, record in enumerate(records):
+                raw = record.get(key)
+                if raw is None:
+                    continue
+                if raw not in parsed:
+                    parsed[raw] = values_of(raw)
+                for value in parsed[raw]:
+                    rows_of.setdefault(value, []).append(row)
+            self.bitmaps[facet] = {
+                value: to_bitmap(rows, self.count)
+                for value, rows in sorted(rows_of.items(), key=lambda item: -len(item[1]))
+            }
+
+    @classmethod
+    def from_catalog(cls, category, data_dir=catalogCache.DATA_DIR):
+        return cls(catalogCache.load_category(category, data_dir, recover=True), FACETS[category])
+
+    def __len__(self):
+        return self.count
+
+    def values(self, facet):
+        return list(self.bitmaps[facet])
+
+    def facet_bitmap(self, facet, wanted):
+        """Rows having any of the wanted values (a value or an iterable of values) of one facet."""
+        if isinstance(wanted, str):
+            wanted = (wanted,)
+        bitmaps = self.bitmaps[facet]
+        bitmap = 0
+        for value in wanted:
+            bitmap |= bitmaps.get(value, 0)
+        return bitmap
+
+    def select(self, filters=None, exclude=None):
+        """Bitmap of the rows passing every filter facet, with none of the excluded values."""
+        bitmap = self.all
+        for facet, wanted in (filters or {}).items():
+            bitmap &= self.facet_bitmap(facet, wanted)
+        for facet, unwanted in (exclude or {}).items():
+            bitmap &= ~self.facet_bitmap(facet, unwanted)
+        return bitmap
+
+    def counts(self, bitmap, facets=None):
+        """{facet: {value: rows of bitmap having it}} for values with at least one row."""
+        result = {}
+        for facet in facets or self.bitmaps:
+            counts = {}
+            for value, value_bitmap in self.bitmaps[facet].items():
+                count = (value_bitmap & bitmap).bit_count()
+                if count:
+                    counts[value] = count
+            result[facet] = counts
+        return result
+
+    def facet_counts(self, filters=None, exclude=None, facets=None):
+        """Multi-select counts: each facet counted over the selection of all the other filters."""
+        filters = filters or {}
+        base = self.select(exclude=exclude)
+        selected = {facet: self.facet_bitmap(facet, wanted) for facet, wanted in filters.items()}
+        result = {}
+        for facet in facets or self.bitmaps:
+            bitmap = base
+            for other, other_bitmap in selected.items():
+                if other != facet:
+                    bitmap &= other_bitmap
+            result.update(self.counts(bitmap, (facet,)))
+        return result
+
+    def rows(self, bitmap):
+        return bitmap_rows(bitmap, self.count)
+
+
+def load_facets(category, data_dir=catalogCache.DATA_DIR):
+    return FacetIndex.from_catalog(category, data_dir)
+
+
+if __name__ == "__main__":
+    # python facetIndex.py [CATEGORY] [FACET=VALUE[|VALUE] ...] -- facet counts of a filtered selection
+    category = sys.argv[1] if len(sys.argv) > 1 else "camera_body"
+    filters = {}
+    for arg in sys.argv[2:]:
+        facet, _, values = arg.partition("=")
+        filters[facet] = values.split("|")
+
+    index = load_facets(category)
+    selection = index.select(filters)
+    print(f"{category}: {selection.bit_count()} of {len(index)} rows match")
+    for facet, counts in index.facet_counts(filters).items():
+        print(f"    {facet}: " + ", ".join(f"{value} ({count})" for value, count in counts.items()))
@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import shutil
+
+import numpy as np
+
+import catalogCache
+import catalogDb
+import specNormalizer
+
+'''
+Memory-mapped feature store: the typed columns of each category exported once, so consumers
+never load the JSON files to read a few numeric fields.
+
+FEATURE_DIR/<category>/ holds one .npy file per column, a schema.json naming the columns and
+dtypes, and for text columns (title, lens mount, sensor size) an int32 code column plus a
+<column>.strings.json dictionary (code -1 = missing). open_store() only reads schema.json; every
+column is opened with np.load(mmap_mode='r') on first use and dictionaries are loaded the same
+way, so startup does not grow with the catalog and all worker processes reading a store share
+the same pages in the OS cache.
+
+Stores are rebuilt when the source file hash or specNormalizer.NORMALIZER_VERSION changes; the
+typed columns come from specNormalizer.load_normalized, so a rebuild only parses a changed file.
+'''
+
+FEATURE_DIR = os.path.join(specNormalizer.DATA_DIR, "features")
+SCHEMA_FILE = "schema.json"
+STORE_VERSION = 1
+
+
+def encode_strings(values):
+    """(int32 codes, dictionary) for a list of strings, None encoded as -1."""
+    code_of = {}
+    codes = np.fromiter(
+        (-1 if value is None else code_of.setdefault(value, len(code_of)) for value in values),
+        dtype=np.int32, count=len(values),
+    )
+    return codes, list(code_of)
+
+
+def export_category(category, records, columns, signature, feature_dir=FEATURE_DIR):
+    """Write the store of one category (records plus their specNormalizer columns) and swap it in place of the old one."""
+    store_dir = os.path.join(feature_dir, category)
+    tmp_dir = store_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = {name: column for name, column in columns.items() if name != "title"}
+    schema = {
+        "version": STORE_VERSION,
+        "signature": signature,
+        "count": len(records),
+        "columns": {},
+        "strings": {},
+    }
+    for name, keys in catalogDb.TEXT_COLUMNS.items():
+        codes, dictionary = encode_strings([catalogDb.first_present(record, keys) for record in records])
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), codes)
+        with open(os.path.join(tmp_dir, f"{name}.strings.json"), 'w', encoding='utf-8') as f:
+            json.dump(dictionary, f, ensure_ascii=False)
+        schema["columns"][name] = "int32"
+        schema["strings"][name] = f"{name}.strings.json"
+    for name, column in columns.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(column, dtype=np.float64))
+        schema["columns"][name] = "float64"
+
+    with open(os.path.join(tmp_dir, SCHEMA_FILE), 'w', encoding='utf-8') as f:
+        json.dump(schema, f, indent=4)
+
+    # Readers that still have the old files mapped keep them until they close; new readers see the new store
+    old_dir = store_dir + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(store_dir):
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return schema
+
+
+def read_schema(category, feature_dir=FEATURE_DIR):
+    filename = os.path.join(feature_dir, category, SCHEMA_FILE)
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_store(category, data_dir=specNormalizer.DATA_DIR, feature_dir=FEATURE_DIR, force=False):
+    """Export category unless its store is already up to date; returns True if it was rebuilt."""
+    filepath = os.path.join(data_dir, catalogCache.CATEGORY_FILES[category])
+    signature = specNormalizer.source_signature(filepath)
+    schema = read_schema(category, feature_dir)
+    if not force and schema and schema["version"] == STORE_VERSION and schema["signature"] == signature:
+        return False
+    records = catalogCache.load_records(filepath, recover=True)
+    export_category(category, records, specNormalizer.load_normalized(category, data_dir), signature, feature_dir)
+    return True
+
+
+class FeatureStore:
+    """Read-only view of one category's store; columns and dictionaries load lazily."""
+
+    def __init__(self, category, feature_dir=FEATURE_DIR):
+        self.category = category
+        self.path = os.path.join(feature_dir, category)
+        self.schema = read_schema(category, feature_dir)
+        if self.schema is None:
+            raise FileNotFoundError(f"No feature store for {category} in {feature_dir}")
+        self._columns = {}
+        self._dictionaries = {}
+
+    def __len__(self):
+        return self.schema["count"]
+
+    @property
+    def columns(self):
+        return list(self.schema["columns"])
+
+    def __getitem__(self, name):
+        """The column as a read-only memory-mapped array (codes for text columns)."""
+        if name not in self._columns:
+            if name not in self.schema["columns"]:
+                raise KeyError(name)
+            self._columns[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+        return self._columns[name]
+
+    def dictionary(self, name):
+        if name not in self._dictionaries:
+            with open(os.path.join(self.path, self.schema["strings"][name]), 'r', encoding='utf-8') as f:
+                self._dictionaries[name] = json.load(f)
+        return self._dictionaries[name]
+
+    def code_of(self, name, value):
+        """Code of value in a text column, or -1 if no row has it."""
+        try:
+            return self.dictionary(name).index(value)
+        except ValueError:
+            return -1
+
+    def strings(self, name, rows=None):
+        """Decoded values of a text column (for all rows or the given row indexes); None when missing."""
+        dictionary = self.dictionary(name)
+        codes = self[name] if rows is None else self[name][rows]
+        return [dictionary[code] if code >= 0 else None for code in codes.tolist()]
+
+    def find_row(self, title):
+        """Row whose title matches exactly (case-insensitive), else the first containing it."""
+        wanted = title.lower()
+        lowered = [t.lower() if t else "" for t in self.strings("title")]
+        if wanted in lowered:
+            return lowered.index(wanted)
+        for row, candidate in enumerate(lowered):
+            if wanted in candidate:
+                return row
+        raise KeyError(title)
+
+
+def open_store(category, feature_dir=FEATURE_DIR):
+    return FeatureStore(category, feature_dir)
+
+
+if __name__ == "__main__":
+    # python featureStore.py [CATEGORY ...] -- export stale stores
+    for category in sys.argv[1:] or specNormalizer.FIELDS:
+        if not os.path.exists(os.path.join(specNormalizer.DATA_DIR, catalogCache.CATEGORY_FILES[category])):
+            continue
+        try:
+            rebuilt = build_store(category)
+        except ValueError as e:
+            print(f"Skipping {category}: {e}", file=sys.stderr)
+            continue
+        store = open_store(category)
+        print(f"{category}: {len(store)} rows, {len(store.columns)} columns ({'rebuilt' if rebuilt else 'up to date'})")
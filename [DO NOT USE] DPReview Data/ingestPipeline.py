@@ -0,0 +1,249 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import dbCleaning2
+from pipelineStats import PipelineStats
+
+'''
+Staged ingestion: reader threads -> bounded queue -> parse processes -> bounded queue -> one
+categorize/write stage (the dbCleaning2 output writers).
+
+Reading (disk or archive I/O) overlaps with parsing, and parsing overlaps with categorizing and
+writing. At most MAX_IN_FLIGHT pages sit between the readers and the writer, so when writes fall
+behind the readers block instead of piling pages up in memory. Every queue records its depth and
+how long its producers (put) and consumers (get) waited, which shows the stage to resize on a
+given machine: a long put stall on read_queue means parsing is the bottleneck, a long get stall
+on parse_queue means the writer is starved, and a long reader window stall means the writer
+itself is the bottleneck. Stall times are summed over the threads of a stage.
+
+The reader threads share one iter_sources generator behind a lock. For a folder, next() only
+lists and stats the file and the read itself happens outside the lock, in parallel. For a .zip
+or tar archive, iter_sources reads (and decompresses) each member inside next(), so archive reads
+are serialized under the lock and extra read workers do not speed them up. A tar stream can
+only be read in order anyway; for archives, READ_WORKERS = 1 gives the same throughput.
+
+Output order and contents match dbCleaning2.main for the same sources.
+'''
+
+READ_WORKERS = 4
+PARSE_WORKERS = None  # None uses every core
+QUEUE_SIZE = 32
+MAX_IN_FLIGHT = 128
+
+_DONE = object()
+_POLL_SECONDS = 0.1  # blocked threads wake up this often to check for shutdown
+
+
+class MonitoredQueue(queue.Queue):
+    """Bounded queue that records its depth and how long producers and consumers waited on it."""
+
+    def __init__(self, name, maxsize):
+        super().__init__(maxsize)
+        self.name = name
+        self.put_stall = 0.0
+        self.get_stall = 0.0
+        self.max_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+
+    def put(self, item, block=True, timeout=None):
+        start = time.perf_counter()
+        try:
+            super().put(item, block, timeout)
+        finally:
+            self.put_stall += time.perf_counter() - start
+        depth = self.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_total += depth
+        self._depth_samples += 1
+
+    def get(self, block=True, timeout=None):
+        start = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            self.get_stall += time.perf_counter() - start
+
+    def report(self):
+        return {
+            "maxsize": self.maxsize,
+            "max_depth": self.max_depth,
+            "mean_depth": round(self._depth_total / self._depth_samples, 2) if self._depth_samples else 0,
+            "put_stall_seconds": round(self.put_stall, 4),
+            "get_stall_seconds": round(self.get_stall, 4),
+        }
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+class IngestPipeline:
+    def __init__(self, read_workers=READ_WORKERS, parse_workers=PARSE_WORKERS, queue_size=QUEUE_SIZE,
+                 max_in_flight=MAX_IN_FLIGHT, backend=None, prefilter=None, stats=None):
+        self.read_workers = read_workers
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.max_in_flight = max(max_in_flight, 1)
+        self.read_queue = MonitoredQueue("read_queue", queue_size)
+        self.parse_queue = MonitoredQueue("parse_queue", queue_size)
+        self.window_stall = 0.0
+        self.result_wait = 0.0
+        self.reorder_max = 0
+        self.stats = stats
+        self.extract = partial(
+            dbCleaning2.extract_specs_timed,
+            backend=backend or dbCleaning2.EXTRACTOR_BACKEND,
+            prefilter=dbCleaning2.PREFILTER if prefilter is None else prefilter,
+        )
+        self._window = threading.Semaphore(self.max_in_flight)
+        self._window_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _acquire_window(self):
+        start = time.perf_counter()
+        while not self._window.acquire(timeout=_POLL_SECONDS):
+            if self._stop.is_set():
+                return False
+        with self._window_lock:
+            self.window_stall += time.perf_counter() - start
+        return True
+
+    def _reader(self, numbered_sources, sources_lock):
+        while self._acquire_window():
+            # Archive members are read inside next(), so for archives this lock serializes the reads
+            with sources_lock:
+                try:
+                    index, (name, _, _, source) = next(numbered_sources)
+                except StopIteration:
+                    self._window.release()
+                    break
+                except Exception as error:
+                    _put(self.read_queue, (None, None, None, error), self._stop)
+                    break
+            try:
+                data = source if isinstance(source, bytes) else dbCleaning2.read_html_bytes(source)
+                item = (index, name, data, None)
+            except Exception as error:
+                item = (index, name, None, error)
+            if not _put(self.read_queue, item, self._stop):
+                break
+        _put(self.read_queue, _DONE, self._stop)
+
+    def _dispatcher(self, pool):
+        finished_readers = 0
+        while finished_readers < self.read_workers:
+            item = _get(self.read_queue, self._stop)
+            if item is _DONE:
+                finished_readers += 1
+                continue
+            index, name, data, error = item
+            future = pool.submit(self.extract, data) if error is None else None
+            if not _put(self.parse_queue, (index, name, future, error), self._stop):
+                return
+        _put(self.parse_queue, _DONE, self._stop)
+
+    def run(self, sources):
+        """Yield the specs of (name, size, mtime_ns, source) tuples from iter_sources, in order."""
+        numbered_sources = enumerate(sources)
+        sources_lock = threading.Lock()
+        pending = {}
+        next_index = 0
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+            threads = [
+                threading.Thread(target=self._reader, args=(numbered_sources, sources_lock), daemon=True)
+                for _ in range(self.read_workers)
+            ]
+            threads.append(threading.Thread(target=self._dispatcher, args=(pool,), daemon=True))
+            for thread in threads:
+                thread.start()
+
+            try:
+                while True:
+                    item = _get(self.parse_queue, self._stop)
+                    if item is _DONE:
+                        break
+                    index, name, future, error = item
+                    if error is not None:
+                        raise error
+                    pending[index] = (name, future)
+                    self.reorder_max = max(self.reorder_max, len(pending))
+
+                    # Readers finish out of order; hold results back until the next page in source order is ready
+                    while next_index in pending:
+                        name, future = pending.pop(next_index)
+                        start = time.perf_counter()
+                        specs, timings = future.result()
+                        self.result_wait += time.perf_counter() - start
+                        self._window.release()
+                        next_index += 1
+                        if self.stats is not None:
+                            self.stats.add_page(specs, timings, name)
+                        yield specs
+            finally:
+                self._stop.set()
+                for _, future in pending.values():
+                    future.cancel()
+                for thread in threads:
+                    thread.join()
+
+    def report(self):
+        return {
+            "read_workers": self.read_workers,
+            "parse_workers": self.parse_workers,
+            "max_in_flight": self.max_in_flight,
+            "read_queue": self.read_queue.report(),
+            "parse_queue": self.parse_queue.report(),
+            "reader_window_stall_seconds": round(self.window_stall, 4),
+            "writer_result_wait_seconds": round(self.result_wait, 4),
+            "reorder_buffer_max": self.reorder_max,
+        }
+
+
+def main(read_workers=READ_WORKERS, parse_workers=PARSE_WORKERS, queue_size=QUEUE_SIZE, max_in_flight=MAX_IN_FLIGHT,
+         backend=None, output_format=dbCleaning2.OUTPUT_FORMAT, instrument=dbCleaning2.INSTRUMENT):
+    """Full rebuild of HTML_FOLDER through the staged pipeline (no incremental manifest)."""
+    if output_format not in dbCleaning2.OUTPUT_WRITERS:
+        raise ValueError(f"Unknown output format: {output_format!r} (expected one of {sorted(dbCleaning2.OUTPUT_WRITERS)})")
+
+    stats = PipelineStats() if instrument else None
+    pipeline = IngestPipeline(read_workers, parse_workers, queue_size, max_in_flight, backend, stats=stats)
+
+    start = time.perf_counter()
+    extracted = pipeline.run(dbCleaning2.iter_sources(dbCleaning2.HTML_FOLDER))
+    total, counts = dbCleaning2.OUTPUT_WRITERS[output_format](extracted, stats)
+    dbCleaning2.print_summary(total, counts, time.perf_counter() - start, pipeline.parse_workers)
+
+    report = pipeline.report()
+    for name in ("read_queue", "parse_queue"):
+        q = report[name]
+        print(f"{name}: max depth {q['max_depth']}/{q['maxsize']}, mean {q['mean_depth']}, "
+              f"put stall {q['put_stall_seconds']}s, get stall {q['get_stall_seconds']}s")
+    print(f"reader window stall {report['reader_window_stall_seconds']}s, "
+          f"writer waited on parses {report['writer_result_wait_seconds']}s")
+    if stats is not None:
+        stats.queues = report
+        dbCleaning2.finish_report(stats, total, counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import re
+import json
+
+'''
+Streaming reader for the array-of-objects category files.
+
+JsonArrayReader yields the elements of a top-level JSON array one at a time, reading the file in
+CHUNK_SIZE pieces, so memory stays at one chunk plus the element being decoded whatever the file
+size. Each element is decoded with json's C decoder (raw_decode); only the array punctuation
+between elements is handled here.
+
+Syntax faults raise JsonSyntaxError with the exact line and column. With recover=True the
+trivial array-level faults are repaired instead and recorded in reader.faults:
+
+- a trailing comma before the closing ] (hand-edited category files have had them)
+- doubled commas, or a missing comma between two elements
+- a missing closing ] at the end of the file, or extra data after it
+
+A fault inside an element (a broken string, a missing colon) cannot be repaired and raises in
+both modes.
+'''
+
+CHUNK_SIZE = 1 << 16
+MAX_ELEMENT_CHARS = 16 << 20  # an element still incomplete after this many characters is an error
+
+_WHITESPACE = " \t\n\r"
+_DELIMITER = re.compile(r"[\s,\]]")
+
+
+class JsonSyntaxError(ValueError):
+    def __init__(self, message, filename, line, column):
+        super().__init__(f"{filename}:{line}:{column}: {message}")
+        self.message = message
+        self.filename = filename
+        self.line = line
+        self.column = column
+
+
+class JsonArrayReader:
+    """Iterate over the elements of the JSON array in the text file f."""
+
+    def __init__(self, f, filename=None, recover=False, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.filename = filename or getattr(f, "name", "<stream>")
+        self.recover = recover
+        self.chunk_size = chunk_size
+        self.faults = []  # (line, column, message) of every fault repaired in recover mode
+        self.count = 0
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        # Line and column of _buffer[_mark], advanced lazily by _location()
+        self._mark = 0
+        self._mark_line = 1
+        self._mark_column = 1
+
+    def _fill(self):
+        """Append the next chunk, dropping the consumed part of the buffer; False at end of file."""
+        if self._eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        if self._pos:
+            self._location(self._pos)
+            self._buffer = self._buffer[self._pos:]
+            self._mark -= self._pos
+            self._pos = 0
+        self._buffer += chunk
+        return True
+
+    def _location(self, pos):
+        """(line, column) of _buffer[pos]; pos must not be before the last position asked for."""
+        newlines = self._buffer.count("\n", self._mark, pos)
+        if newlines:
+            self._mark_line += newlines
+            self._mark_column = pos - self._buffer.rfind("\n", self._mark, pos)
+        else:
+            self._mark_column += pos - self._mark
+        self._mark = pos
+        return self._mark_line, self._mark_column
+
+    def _fault(self, message, location):
+        if not self.recover:
+            raise JsonSyntaxError(message, self.filename, *location)
+        self.faults.append((*location, message))
+
+    def _peek(self):
+        """Skip whitespace and return the next character ("" at end of file)."""
+        while True:
+            buffer, pos = self._buffer, self._pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                return ""
+
+    def _decode(self, decode):
+        if self._buffer[self._pos] not in '{["':
+            # A number or literal cut at the chunk end ("12." of "12.5") would still decode, so
+            # read on until the token is followed by a delimiter
+            while not _DELIMITER.search(self._buffer, self._pos) and self._fill():
+                pass
+        while True:
+            try:
+                value, end = decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                # Usually the element just continues in the next chunk
+                if len(self._buffer) - self._pos < MAX_ELEMENT_CHARS and self._fill():
+                    continue
+                raise JsonSyntaxError(e.msg, self.filename, *self._location(e.pos)) from None
+            self._pos = end
+            return value
+
+    def __iter__(self):
+        decode = json.JSONDecoder().raw_decode
+        if self._peek() == "\ufeff":  # byte order mark
+            self._pos += 1
+        if self._peek() != "[":
+            raise JsonSyntaxError("Expecting '[' at the start of the file", self.filename, *self._location(self._pos))
+        self._pos += 1
+
+        need_comma = False
+        comma_location = None
+        while True:
+            char = self._peek()
+            if char == "":
+                self._fault("Missing ']' at the end of the file", self._location(self._pos))
+                return
+            if char == "]":
+                if comma_location is not None:
+                    self._fault("Trailing comma before ']'", comma_location)
+                self._pos += 1
+                break
+            if char == ",":
+                location = self._location(self._pos)
+                if not need_comma:
+                    self._fault("Extra comma", location)
+                need_comma = False
+                comma_location = location
+                self._pos += 1
+                continue
+
+            if need_comma:
+                self._fault("Missing comma between elements", self._location(self._pos))
+            value = self._decode(decode)
+            need_comma = True
+            comma_location = None
+            self.count += 1
+            yield value
+
+        if self._peek() != "":
+            self._fault("Extra data after the closing ']'", self._location(self._pos))
+
+
+def iter_json_array(filename, recover=False, faults=None):
+    """Yield the elements of a JSON array file; repaired faults are appended to faults if given."""
+    with open(filename, 'r', encoding='utf-8') as f:
+        reader = JsonArrayReader(f, filename, recover)
+        yield from reader
+        if faults is not None:
+            faults.extend(reader.faults)
+
+
+def validate_file(filename):
+    """Read the whole file in recover mode: (element count, [(line, column, message)])."""
+    with open(filename, 'r', encoding='utf-8') as f:
+        reader = JsonArrayReader(f, filename, recover=True)
+        try:
+            for _ in reader:
+                pass
+        except JsonSyntaxError as e:
+            reader.faults.append((e.line, e.column, f"{e.message} (not recoverable, reading stopped)"))
+        return reader.count, reader.faults
@@ -0,0 +1,234 @@
+import os
+import sys
+
+import numpy as np
+
+import featureStore
+import recommender
+import specNormalizer
+
+'''
+Canonical lens-mount registry, mount -> item inverted indexes and the body x lens compatibility join.
+
+The catalog spells one physical mount several ways: lenses say "Nikon F (FX)" or "Nikon F (DX)"
+where bodies say "Nikon F", Sony full-frame lenses are "Sony FE" on "Sony E" bodies, "L-Mount"
+lenses fit "Leica L" bodies, and Pentax lists each revision of the K bayonet (KAF to KAF4).
+MOUNT_VARIANTS maps every spelling to one canonical mount. Two rules refine "same canonical
+mount fits":
+
+- CROP_VARIANTS are lenses made for a smaller sensor than the largest on their mount (DX, EF-S,
+  APS-C Sony E, Alpha DT, Leica TL); on a full-frame body they fit but the camera crops, and the
+  pair is flagged crop.
+- RESTRICTED_VARIANTS only fit the listed body spellings: EF-S lenses do not go on full-frame
+  or pre-EF-S "Canon EF" bodies, only on "Canon EF/EF-S" ones.
+
+build_index() reads the lens_mount codes of the feature stores, canonicalizes each distinct mount
+string once, and writes INDEX_FILE with, per category, the rows of every mount and the mounts of
+every row (both as offset/value arrays), plus every compatible (body, lens) pair sorted by body
+and by lens. "Which lenses fit this body" is then one slice. The index is rebuilt when any of
+the stores it was built from changes.
+'''
+
+INDEX_FILE = os.path.join(featureStore.FEATURE_DIR, "mount_index.npz")
+INDEX_VERSION = 1
+CATEGORIES = ("camera_body", "lens", "teleconverter")
+
+# Canonical mount -> every spelling of it in the catalog; names not listed are their own canonical mount
+MOUNT_VARIANTS = {
+    "Canon EF": ("Canon EF", "Canon EF/EF-S", "Canon EF-S"),
+    "Nikon F": ("Nikon F", "Nikon F (FX)", "Nikon F (DX)"),
+    "Sony E": ("Sony E", "Sony FE"),
+    "Sony/Minolta Alpha": ("Sony/Minolta Alpha", "Sony/Minolta Alpha DT"),
+    "L-Mount": ("L-Mount", "Leica L", "Leica TL"),
+    "Pentax K": ("Pentax KAF", "Pentax KAF2", "Pentax KAF3", "Pentax KAF4"),
+}
+CROP_VARIANTS = frozenset({"Canon EF-S", "Nikon F (DX)", "Sony E", "Sony/Minolta Alpha DT", "Leica TL"})
+RESTRICTED_VARIANTS = {"Canon EF-S": frozenset({"Canon EF/EF-S"})}
+FULL_FRAME_CROP = 1.2  # bodies with a smaller crop factor count as full frame for the crop flag
+
+CANONICAL = {variant: mount for mount, variants in MOUNT_VARIANTS.items() for variant in variants}
+
+
+def canonical_mount(name):
+    """"Nikon F (FX)" -> "Nikon F"; unknown names are returned with their whitespace normalized."""
+    name = " ".join(name.split())
+    return CANONICAL.get(name, name)
+
+
+def split_variants(value):
+    """"Canon EF, Nikon F (FX)" -> ["Canon EF", "Nikon F (FX)"], whitespace normalized."""
+    return [" ".join(part.split()) for part in value.split(",") if part.strip()] if value else []
+
+
+def lens_fits(body_variant, lens_variants):
+    """True if a lens listing lens_variants (all of one canonical mount) fits a body_variant body."""
+    for variant in lens_variants:
+        allowed = RESTRICTED_VARIANTS.get(variant)
+        if allowed is None or body_variant in allowed:
+            return True
+    return False
+
+
+def _entries(store, mount_id):
+    """(rows, mount ids, variant tuples) with one entry per (row, canonical mount) of a store."""
+    variants_by_code = []
+    for value in store.dictionary("lens_mount"):
+        by_mount = {}
+        for variant in split_variants(value):
+            by_mount.setdefault(canonical_mount(variant), []).append(variant)
+        variants_by_code.append([(mount_id.setdefault(mount, len(mount_id)), tuple(v)) for mount, v in by_mount.items()])
+
+    rows, mounts, variants = [], [], []
+    for row, code in enumerate(np.asarray(store["lens_mount"]).tolist()):
+        for mount, row_variants in variants_by_code[code] if code >= 0 else ():
+            rows.append(row)
+            mounts.append(mount)
+            variants.append(row_variants)
+    return np.array(rows, dtype=np.int32), np.array(mounts, dtype=np.int32), variants
+
+
+def _grouped(keys, values, size):
+    """(offsets, values sorted by key): values of key k are values[offsets[k]:offsets[k + 1]]."""
+    order = np.lexsort((values, keys))
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=offsets[1:])
+    return offsets, values[order].astype(np.int32)
+
+
+def compatible_pairs(body_entries, lens_entries, crop_factor, mount_count):
+    """(body rows, lens rows, crop flags) of every compatible pair, one canonical mount at a time."""
+    body_rows, body_mounts, body_variants = body_entries
+    lens_rows, lens_mounts, lens_variants = lens_entries
+    crop_lens = np.array([all(v in CROP_VARIANTS for v in variants) for variants in lens_variants], dtype=bool)
+    bodies, lenses = [], []
+    for mount in range(mount_count):
+        on_bodies = np.flatnonzero(body_mounts == mount)
+        on_lenses = np.flatnonzero(lens_mounts == mount)
+        if not len(on_bodies) or not len(on_lenses):
+            continue
+        # Fit only depends on the spellings, so decide it once per distinct body spelling
+        for body_variant in {v for i in on_bodies.tolist() for v in body_variants[i]}:
+            with_variant = on_bodies[[body_variant in body_variants[i] for i in on_bodies.tolist()]]
+            fitting = on_lenses[[lens_fits(body_variant, lens_variants[i]) for i in on_lenses.tolist()]]
+            bodies.append(np.repeat(with_variant, len(fitting)))
+            lenses.append(np.tile(fitting, len(with_variant)))
+
+    if not bodies:
+        empty = np.empty(0, dtype=np.int32)
+        return empty, empty, np.empty(0, dtype=bool)
+    body_entry, lens_entry = np.concatenate(bodies), np.concatenate(lenses)
+    body, lens = body_rows[body_entry], lens_rows[lens_entry]
+    # A body listed under two spellings of one mount would pair with a lens twice
+    pairs, first = np.unique(np.stack([body, lens], axis=1), axis=0, return_index=True)
+    crop = crop_lens[lens_entry[first]] & (np.asarray(crop_factor)[pairs[:, 0]] < FULL_FRAME_CROP)
+    return pairs[:, 0].astype(np.int32), pairs[:, 1].astype(np.int32), crop
+
+
+def build_index(index_file=INDEX_FILE, categories=CATEGORIES, data_dir=specNormalizer.DATA_DIR, feature_dir=featureStore.FEATURE_DIR):
+    stores = {}
+    for category in categories:
+        featureStore.build_store(category, data_dir, feature_dir)
+        stores[category] = featureStore.open_store(category, feature_dir)
+
+    mount_id = {}
+    entries = {category: _entries(store, mount_id) for category, store in stores.items()}
+    arrays = {}
+    for category, (rows, mounts, _) in entries.items():
+        arrays[f"{category}_mount_offsets"], arrays[f"{category}_mount_rows"] = _grouped(mounts, rows, len(mount_id))
+        arrays[f"{category}_row_offsets"], arrays[f"{category}_row_mounts"] = _grouped(rows, mounts, len(stores[category]))
+
+    body, lens, crop = compatible_pairs(entries["camera_body"], entries["lens"], stores["camera_body"]["crop_factor"], len(mount_id))
+    # The pairs come sorted by (body, lens), so crop stays aligned with pair_lens
+    arrays["pair_body_offsets"], arrays["pair_lens"] = _grouped(body, lens, len(stores["camera_body"]))
+    arrays["pair_crop"] = crop
+    arrays["pair_lens_offsets"], arrays["pair_body"] = _grouped(lens, body, len(stores["lens"]))
+
+    tmp_file = index_file + ".tmp.npz"
+    np.savez(
+        tmp_file,
+        signature=np.array(_signature(categories, feature_dir)),
+        categories=np.array(categories),
+        mounts=np.array(list(mount_id)),
+        **arrays,
+    )
+    os.replace(tmp_file, index_file)
+
+
+def _signature(categories, feature_dir=featureStore.FEATURE_DIR):
+    return f"{INDEX_VERSION}:" + ",".join(featureStore.read_schema(category, feature_dir)["signature"] for category in categories)
+
+
+class MountIndex:
+    def __init__(self, index_file=INDEX_FILE, feature_dir=featureStore.FEATURE_DIR):
+        with np.load(index_file, allow_pickle=False) as data:
+            self.signature = str(data["signature"])
+            self.categories = tuple(data["categories"].tolist())
+            self.mounts = tuple(data["mounts"].tolist())
+            self.arrays = {name: data[name] for name in data.files if name not in ("signature", "categories", "mounts")}
+        self.mount_id = {mount: i for i, mount in enumerate(self.mounts)}
+        self.feature_dir = feature_dir
+        self._stores = {}
+
+    def store(self, category):
+        if category not in self._stores:
+            self._stores[category] = featureStore.open_store(category, self.feature_dir)
+        return self._stores[category]
+
+    def rows(self, category, mount):
+        """Rows of category made for mount (any spelling of it), sorted."""
+        i = self.mount_id.get(canonical_mount(mount))
+        if i is None:
+            return np.empty(0, dtype=np.int32)
+        offsets = self.arrays[f"{category}_mount_offsets"]
+        return self.arrays[f"{category}_mount_rows"][offsets[i]:offsets[i + 1]]
+
+    def mounts_of(self, category, row):
+        """Canonical mounts of one row."""
+        offsets = self.arrays[f"{category}_row_offsets"]
+        return [self.mounts[i] for i in self.arrays[f"{category}_row_mounts"][offsets[row]:offsets[row + 1]].tolist()]
+
+    def lenses_for_body(self, body, constraints=None, allow_crop=True):
+        """(lens rows, crop flags) of the lenses that fit body, optionally filtered by lens store ranges."""
+        offsets = self.arrays["pair_body_offsets"]
+        lenses = self.arrays["pair_lens"][offsets[body]:offsets[body + 1]]
+        crop = self.arrays["pair_crop"][offsets[body]:offsets[body + 1]]
+        keep = np.ones(len(lenses), dtype=bool) if allow_crop else ~crop
+        if constraints:
+            store = self.store("lens")
+            keep &= recommender.constraint_mask({name: store[name][lenses] for name in constraints}, constraints, len(lenses))
+        return lenses[keep], crop[keep]
+
+    def bodies_for_lens(self, lens):
+        """Body rows that lens fits."""
+        offsets = self.arrays["pair_lens_offsets"]
+        return self.arrays["pair_body"][offsets[lens]:offsets[lens + 1]]
+
+    def pair_count(self):
+        return len(self.arrays["pair_lens"])
+
+
+def load_index(index_file=INDEX_FILE, categories=CATEGORIES, data_dir=specNormalizer.DATA_DIR, feature_dir=featureStore.FEATURE_DIR):
+    """The index, rebuilt first if it is missing or older than any feature store."""
+    for category in categories:
+        featureStore.build_store(category, data_dir, feature_dir)
+    if os.path.exists(index_file):
+        index = MountIndex(index_file, feature_dir)
+        if index.signature == _signature(index.categories, feature_dir) and index.categories == tuple(categories):
+            return index
+    build_index(index_file, categories, data_dir, feature_dir)
+    return MountIndex(index_file, feature_dir)
+
+
+if __name__ == "__main__":
+    # python mountRegistry.py "BODY TITLE" [--no-crop] -- lenses that fit a camera body
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    allow_crop = "--no-crop" not in sys.argv
+    index = load_index()
+
+    bodies = index.store("camera_body")
+    body = bodies.find_row(args[0] if args else "Nikon D850")
+    lenses, crop = index.lenses_for_body(body, allow_crop=allow_crop)
+    print(f"{bodies.strings('title', [body])[0]} ({', '.join(index.mounts_of('camera_body', body))}): "
+          f"{len(lenses)} lenses of {index.pair_count()} compatible pairs")
+    for title, cropped in zip(index.store("lens").strings("title", lenses), crop.tolist()):
+        print(f"    {title}{'  (crop)' if cropped else ''}")
@@ -0,0 +1,120 @@
+import json
+import time
+import heapq
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+'''
+Per-stage timings and counters for one run of the cleaning pipeline.
+
+read/prefilter/parse/rows are measured per page inside extract_specs (so with WORKERS > 1 they add up the
+time spent in every worker process; for archives "read" is the decoding of the member bytes);
+categorize/write are measured in the main process.
+
+Rows per page are kept as a histogram ({rows: pages}), so memory depends on the number of distinct
+row counts and not on the number of pages; min, median, mean and max come out exact.
+'''
+
+STAGES = ("read", "prefilter", "parse", "rows", "categorize", "write")
+SLOWEST_FILES = 20
+
+
+class PipelineStats:
+    def __init__(self, slowest=SLOWEST_FILES):
+        self.started = time.perf_counter()
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.counters = {}
+        self.rows_histogram = {}  # rows in a page -> pages with that many rows
+        self.pages = 0
+        self.pages_per_category = {}
+        self.slowest = slowest
+        self._slowest_heap = []  # min-heap of (seconds, order, entry), keeps the slowest pages
+        self._pending_names = deque()
+        self.queues = None  # queue depths and stall times, filled in by ingestPipeline
+
+    def track(self, named_sources):
+        """Yield the sources of (name, source) pairs, remembering the names in order.
+
+        extract_all yields results in the order it consumes sources, so each page result
+        handed to add_page matches the oldest pending name.
+        """
+        for name, source in named_sources:
+            self._pending_names.append(name)
+            yield source
+
+    def add_page(self, specs, timings, name=None):
+        if name is None and self._pending_names:
+            name = self._pending_names.popleft()
+        for stage, seconds in timings.items():
+            self.seconds[stage] += seconds
+
+        rows = len(specs) - ("Title" in specs)
+        self.rows_histogram[rows] = self.rows_histogram.get(rows, 0) + 1
+        self.pages += 1
+        self.count("pages_parsed")
+
+        total = sum(timings.values())
+        entry = {
+            "name": name,
+            "seconds": round(total, 6),
+            "stage_seconds": {stage: round(seconds, 6) for stage, seconds in timings.items()},
+            "rows": rows,
+        }
+        item = (total, self.pages, entry)
+        if len(self._slowest_heap) < self.slowest:
+            heapq.heappush(self._slowest_heap, item)
+        else:
+            heapq.heappushpop(self._slowest_heap, item)
+
+    def count(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    @contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] += time.perf_counter() - start
+
+    def report(self):
+        rows = self.rows_histogram
+        report = {
+            "wall_seconds": round(time.perf_counter() - self.started, 4),
+            "stage_seconds": {stage: round(seconds, 4) for stage, seconds in self.seconds.items()},
+            "counters": self.counters,
+            "rows_per_page": {
+                "min": min(rows),
+                "median": histogram_median(rows),
+                "mean": round(sum(value * pages for value, pages in rows.items()) / self.pages, 2),
+                "max": max(rows),
+            } if rows else {},
+            "pages_per_category": self.pages_per_category,
+            "slowest_files": [entry for _, _, entry in sorted(self._slowest_heap, reverse=True)],
+        }
+        if self.queues is not None:
+            report["queues"] = self.queues
+        return report
+
+    def save(self, filename):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=4)
+
+
+def histogram_median(histogram):
+    """Median of the values a {value: occurrences} histogram counts, as statistics.median would give it."""
+    total = sum(histogram.values())
+    lower, upper = (total - 1) // 2, total // 2  # positions of the middle values in sorted order
+    seen = 0
+    low = None
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if low is None and seen > lower:
+            low = value
+        if seen > upper:
+            return low if total % 2 else (low + value) / 2
+
+
+def timer(stats, stage):
+    """stats.timed(stage), or a no-op context when instrumentation is off (stats is None)."""
+    return stats.timed(stage) if stats is not None else nullcontext()
@@ -0,0 +1,172 @@
+import os
+import sys
+
+import numpy as np
+
+import facetIndex
+import featureStore
+import specNormalizer
+
+'''
+Sorted range indexes over the numeric feature store columns.
+
+For every numeric column of a category the known (non-NaN) values are kept sorted together with
+their row ids, so "weight under 700 g" or "20-30 MP" is two searchsorted calls and a slice. A query
+with several ranges ({column: (low, high)}, None leaving a side open, like
+recommender.constraint_mask) intersects the sorted row ids of each range, smallest first; bitmap()
+returns the result as a facetIndex bitmap so it combines with facet filters. "Focal length covers
+200 mm" is {"focal_min_mm": (None, 200), "focal_max_mm": (200, None)}.
+
+The indexes live in RANGE_DIR/<category>.npz next to the feature store, with a copy of each column
+as it was indexed. When the store changes, every column is diffed against that copy: unchanged
+columns are kept, a column where at most INCREMENTAL_LIMIT of the rows changed (edits, appended
+records) has just those rows taken out and merged back in at their searchsorted positions, and only
+the rest are sorted again.
+'''
+
+RANGE_DIR = os.path.join(featureStore.FEATURE_DIR, "ranges")
+INCREMENTAL_LIMIT = 0.25
+
+
+def sort_column(values):
+    """(sorted known values, their rows) of a float column."""
+    rows = np.flatnonzero(~np.isnan(values))
+    order = np.argsort(values[rows], kind="stable")
+    return values[rows][order], rows[order].astype(np.int32)
+
+
+def changed_rows(old, new):
+    """Rows of new whose value differs from old (NaN equals NaN), rows past the end of old included."""
+    common = min(len(old), len(new))
+    a, b = old[:common], new[:common]
+    differs = ~((a == b) | (np.isnan(a) & np.isnan(b)))
+    return np.concatenate([np.flatnonzero(differs), np.arange(common, len(new))]).astype(np.int32)
+
+
+def update_column(old, sorted_values, sorted_rows, new):
+    """Patch the sorted index of old into one of new; None when too much changed to be worth it."""
+    changed = changed_rows(old, new)
+    if len(changed) > INCREMENTAL_LIMIT * max(len(new), 1):
+        return None
+    # Out go the changed rows and any rows cut off the end, in go the changed rows with known values
+    keep = ~np.isin(sorted_rows, changed) & (sorted_rows < len(new))
+    values, rows = sorted_values[keep], sorted_rows[keep]
+    added = changed[~np.isnan(new[changed])]
+    added = added[np.argsort(new[added], kind="stable")]
+    positions = np.searchsorted(values, new[added], side="right")
+    return np.insert(values, positions, new[added]), np.insert(rows, positions, added)
+
+
+def numeric_columns(store):
+    return [name for name in store.columns if name not in store.schema["strings"]]
+
+
+def build_ranges(category, data_dir=specNormalizer.DATA_DIR, feature_dir=featureStore.FEATURE_DIR, range_dir=RANGE_DIR):
+    """Bring the range index of category up to date; returns {"kept"|"patched"|"sorted": [columns]}."""
+    featureStore.build_store(category, data_dir, feature_dir)
+    store = featureStore.open_store(category, feature_dir)
+    index_file = os.path.join(range_dir, f"{category}.npz")
+    old = {}
+    if os.path.exists(index_file):
+        with np.load(index_file, allow_pickle=False) as data:
+            if str(data["signature"]) == store.schema["signature"]:
+                return {"kept": numeric_columns(store), "patched": [], "sorted": []}
+            old = {name: data[name] for name in data.files}
+
+    arrays = {"signature": np.array(store.schema["signature"])}
+    report = {"kept": [], "patched": [], "sorted": []}
+    for name in numeric_columns(store):
+        values = np.asarray(store[name], dtype=np.float64)
+        patched = None
+        if f"{name}.values" in old:
+            previous = old[f"{name}.values"]
+            if len(previous) == len(values) and np.array_equal(previous, values, equal_nan=True):
+                patched, action = (old[f"{name}.sorted"], old[f"{name}.rows"]), "kept"
+            else:
+                patched, action = update_column(previous, old[f"{name}.sorted"], old[f"{name}.rows"], values), "patched"
+        if patched is None:
+            patched, action = sort_column(values), "sorted"
+        arrays[f"{name}.values"] = values
+        arrays[f"{name}.sorted"], arrays[f"{name}.rows"] = patched
+        report[action].append(name)
+
+    os.makedirs(range_dir, exist_ok=True)
+    tmp_file = index_file + ".tmp.npz"
+    np.savez(tmp_file, **arrays)
+    os.replace(tmp_file, index_file)
+    return report
+
+
+class RangeIndex:
+    def __init__(self, category, range_dir=RANGE_DIR):
+        self.category = category
+        with np.load(os.path.join(range_dir, f"{category}.npz"), allow_pickle=False) as data:
+            self.signature = str(data["signature"])
+            self.sorted = {name[:-len(".sorted")]: data[name] for name in data.files if name.endswith(".sorted")}
+            self.rows_of = {name[:-len(".rows")]: data[name] for name in data.files if name.endswith(".rows")}
+            self.count = len(data[f"{next(iter(self.sorted))}.values"]) if self.sorted else 0
+
+    @property
+    def columns(self):
+        return list(self.sorted)
+
+    def _bounds(self, column, low, high):
+        values = self.sorted[column]
+        start = np.searchsorted(values, low, side="left") if low is not None else 0
+        end = np.searchsorted(values, high, side="right") if high is not None else len(values)
+        return start, end
+
+    def lookup(self, column, low=None, high=None):
+        """Rows with low <= value <= high, in value order."""
+        start, end = self._bounds(column, low, high)
+        return self.rows_of[column][start:end]
+
+    def range_count(self, column, low=None, high=None):
+        start, end = self._bounds(column, low, high)
+        return int(end - start)
+
+    def rows(self, constraints):
+        """Sorted rows passing every (low, high) range; rows missing a bounded value fail."""
+        constraints = {column: bounds for column, bounds in (constraints or {}).items() if bounds != (None, None)}
+        if not constraints:
+            return np.arange(self.count, dtype=np.int32)
+        # Intersect from the most selective range up, so every step works on the fewest ids
+        ranges = sorted(
+            ((self._bounds(column, low, high), column) for column, (low, high) in constraints.items()),
+            key=lambda item: item[0][1] - item[0][0],
+        )
+        result = None
+        for (start, end), column in ranges:
+            rows = np.sort(self.rows_of[column][start:end])
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if not len(result):
+                break
+        return result
+
+    def bitmap(self, constraints):
+        """rows() as a facetIndex bitmap, to AND with facet selections."""
+        return facetIndex.to_bitmap(self.rows(constraints), self.count)
+
+
+def load_ranges(category, data_dir=specNormalizer.DATA_DIR, feature_dir=featureStore.FEATURE_DIR, range_dir=RANGE_DIR):
+    """The range index of category, brought up to date first."""
+    build_ranges(category, data_dir, feature_dir, range_dir)
+    return RangeIndex(category, range_dir)
+
+
+if __name__ == "__main__":
+    # python rangeIndex.py [CATEGORY] [COLUMN=LOW:HIGH ...] -- rows in every range (an empty side is open)
+    category = sys.argv[1] if len(sys.argv) > 1 else "camera_body"
+    constraints = {}
+    for arg in sys.argv[2:]:
+        column, _, bounds = arg.partition("=")
+        low, _, high = bounds.partition(":")
+        constraints[column] = (float(low) if low else None, float(high) if high else None)
+
+    report = build_ranges(category)
+    index = RangeIndex(category)
+    rows = index.rows(constraints)
+    print(f"{category}: {len(rows)} of {index.count} rows "
+          f"(columns {', '.join(f'{len(v)} {k}' for k, v in report.items())})")
+    for title in featureStore.open_store(category).strings("title", rows)[:20]:
+        print(f"    {title}")
@@ -0,0 +1,160 @@
+import sys
+
+import numpy as np
+
+import featureStore
+import specNormalizer
+
+'''
+Camera recommendation core over the typed camera_body columns in the feature store.
+
+Every feature is rescaled once to a 0..1 score where 1 is best (DIRECTIONS says whether more or
+less is better), and a camera missing a value gets the median score of that feature. The scores
+form one (cameras x features) matrix. A user profile is a weight per feature plus hard
+constraints on the raw values, for example {"msrp_usd": (None, 1500), "sealed": (1, 1)}. A query
+is one matrix-vector product, a boolean mask from the constraints (a camera missing a
+constrained value fails the constraint), and argpartition for the top k. Over the whole body
+catalog that takes a few tens of microseconds (the recommend stage of benchmark.py). Feature,
+weight and constraint names are checked up front; an unknown one raises ValueError listing the
+valid names.
+'''
+
+FEATURES = (
+    "megapixels",
+    "sensor_area_mm2",
+    "weight_g",
+    "msrp_usd",
+    "stabilized",
+    "sealed",
+    "articulated_screen",
+    "viewfinder",
+    "fps",
+)
+# +1: more is better, -1: less is better
+DIRECTIONS = {"weight_g": -1, "msrp_usd": -1}
+
+PROFILES = {
+    "all_round": {"weights": {"megapixels": 1, "sensor_area_mm2": 1, "stabilized": 1, "viewfinder": 1, "fps": 1}},
+    "travel": {
+        "weights": {"weight_g": 3, "stabilized": 2, "articulated_screen": 1, "viewfinder": 1, "sensor_area_mm2": 1},
+        "constraints": {"weight_g": (None, 700)},
+    },
+    "landscape": {
+        "weights": {"megapixels": 3, "sensor_area_mm2": 2, "sealed": 2, "articulated_screen": 1},
+        "constraints": {"sealed": (1, 1)},
+    },
+    "sports": {
+        "weights": {"fps": 3, "sealed": 1, "viewfinder": 2, "sensor_area_mm2": 1},
+        "constraints": {"viewfinder": (1, 1), "fps": (8, None)},
+    },
+    "vlog": {
+        "weights": {"articulated_screen": 3, "stabilized": 2, "weight_g": 2},
+        "constraints": {"articulated_screen": (1, 1)},
+    },
+    "budget": {
+        "weights": {"msrp_usd": 3, "megapixels": 1, "sensor_area_mm2": 1, "viewfinder": 1},
+        "constraints": {"msrp_usd": (None, 800)},
+    },
+}
+
+
+def column_names(columns):
+    """Names of a dict of columns or of a FeatureStore."""
+    return columns.columns if isinstance(columns, featureStore.FeatureStore) else list(columns)
+
+
+def check_names(kind, names, valid):
+    """Raise ValueError listing the valid names if any of names is not one of them."""
+    unknown = [name for name in names if name not in valid]
+    if unknown:
+        raise ValueError(f"Unknown {kind}: {', '.join(map(repr, unknown))} (expected one of {sorted(valid)})")
+
+
+def score_matrix(columns, features=FEATURES):
+    """(rows x features) float64 matrix of 0..1 scores, 1 = best, missing values at the feature median."""
+    scores = np.empty((len(columns[features[0]]), len(features)))
+    for j, feature in enumerate(features):
+        values = np.asarray(columns[feature], dtype=np.float64)
+        known = ~np.isnan(values)
+        low, high = (values[known].min(), values[known].max()) if known.any() else (0.0, 0.0)
+        column = (values - low) / (high - low) if high > low else np.zeros_like(values)
+        if DIRECTIONS.get(feature, 1) < 0:
+            column = 1.0 - column
+        column[~known] = np.median(column[known]) if known.any() else 0.5
+        scores[:, j] = column
+    return scores
+
+
+def constraint_mask(columns, constraints, rows):
+    """True for rows whose raw values satisfy every (low, high) constraint; None leaves a side open."""
+    check_names("constraint", constraints or (), column_names(columns))
+    mask = np.ones(rows, dtype=bool)
+    for feature, (low, high) in (constraints or {}).items():
+        values = columns[feature]
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    return mask
+
+
+class Recommender:
+    def __init__(self, columns, features=FEATURES, titles=None):
+        """columns maps names to float arrays (a dict or a FeatureStore); constraints may use any of them."""
+        self.features = tuple(features)
+        check_names("feature", self.features, column_names(columns))
+        self.index_of = {feature: j for j, feature in enumerate(self.features)}
+        self.columns = columns
+        self.scores = score_matrix(columns, self.features)
+        self.titles = np.asarray(titles, dtype=object) if titles is not None else None
+
+    @classmethod
+    def from_store(cls, category="camera_body", features=FEATURES, data_dir=specNormalizer.DATA_DIR,
+                   feature_dir=featureStore.FEATURE_DIR):
+        """Recommender over the feature store of category (exported first if it is stale)."""
+        featureStore.build_store(category, data_dir, feature_dir)
+        store = featureStore.open_store(category, feature_dir)
+        return cls(store, features, store.strings("title"))
+
+    def __len__(self):
+        return self.scores.shape[0]
+
+    def weight_vector(self, weights):
+        check_names("weight", weights, self.index_of)
+        vector = np.zeros(len(self.features))
+        for feature, weight in weights.items():
+            vector[self.index_of[feature]] = weight
+        return vector
+
+    def constraint_mask(self, constraints):
+        return constraint_mask(self.columns, constraints, len(self))
+
+    def rank(self, weights, constraints=None, k=10):
+        """(rows, scores) of the k best rows that pass the constraints, best first."""
+        scores = self.scores @ self.weight_vector(weights)
+        mask = self.constraint_mask(constraints)
+        scores = np.where(mask, scores, -np.inf)
+
+        k = min(k, int(np.count_nonzero(mask)))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top, scores[top]
+
+    def recommend(self, profile, k=10):
+        """[(title, score)] for a profile dict with "weights" and optional "constraints"."""
+        rows, scores = self.rank(profile["weights"], profile.get("constraints"), k)
+        titles = self.titles[rows].tolist() if self.titles is not None else rows.tolist()
+        return list(zip(titles, np.round(scores, 4).tolist()))
+
+
+if __name__ == "__main__":
+    # python recommender.py [PROFILE] [K] -- top cameras for one of PROFILES
+    name = sys.argv[1] if len(sys.argv) > 1 else "all_round"
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    recommender = Recommender.from_store()
+
+    print(f"{name}: top {k} of {len(recommender)} cameras")
+    for title, score in recommender.recommend(PROFILES[name], k):
+        print(f"    {score:7.3f}  {title}")
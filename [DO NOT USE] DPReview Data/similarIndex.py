@@ -0,0 +1,184 @@
+import os
+import sys
+
+import numpy as np
+
+import featureStore
+import mountRegistry
+import recommender
+import specNormalizer
+
+'''
+"Cameras like this one": a nearest-neighbour index over the camera_body feature vectors.
+
+The recommender FEATURES are standardized (z-scores, a missing value counts as the mean), and
+for every camera the TOP_N nearest others by plain Euclidean distance are precomputed. A
+default query is then a row lookup in that table. Queries with per-feature weights, or whose
+filters (same lens mount, (low, high) ranges on any store column) leave fewer than k table
+neighbours, compute the weighted distance to every camera at once. For a few hundred bodies that
+takes tens of microseconds, so a KD-tree would only add build and load cost. "Same mount" compares
+canonical mounts (mountRegistry), so a "Pentax KAF2" body matches a "Pentax KAF" one; a camera
+without a lens mount matches none.
+
+The index lives in INDEX_FILE and is rebuilt when the feature store it was built from changes;
+loading it is one small np.load.
+'''
+
+INDEX_FILE = os.path.join(featureStore.FEATURE_DIR, "camera_body_similar.npz")
+INDEX_VERSION = 2
+TOP_N = 32
+
+
+def standardize(columns, features):
+    """(rows x features) float32 z-scores with missing values at 0 (the mean)."""
+    matrix = np.column_stack([np.asarray(columns[feature], dtype=np.float64) for feature in features])
+    mean = np.nanmean(matrix, axis=0)
+    std = np.nanstd(matrix, axis=0)
+    std[~(std > 0)] = 1.0
+    z = (matrix - mean) / std
+    z[np.isnan(z)] = 0.0
+    return z.astype(np.float32)
+
+
+def mount_matrix(store):
+    """(rows x canonical mounts) bool matrix of the lens mounts of every row, and the mount names."""
+    mounts_of_code = [
+        list(dict.fromkeys(mountRegistry.canonical_mount(v) for v in mountRegistry.split_variants(value)))
+        for value in store.dictionary("lens_mount")
+    ]
+    names = list(dict.fromkeys(mount for mounts in mounts_of_code for mount in mounts))
+    mount_id = {mount: i for i, mount in enumerate(names)}
+    # One extra all-False row, which code -1 (no lens mount) picks
+    by_code = np.zeros((len(mounts_of_code) + 1, len(names)), dtype=bool)
+    for code, mounts in enumerate(mounts_of_code):
+        by_code[code, [mount_id[mount] for mount in mounts]] = True
+    return by_code[np.asarray(store["lens_mount"])], names
+
+
+def neighbour_table(z, top_n=TOP_N):
+    """(rows x top_n) nearest other rows and their distances, nearest first."""
+    squared = (z * z).sum(axis=1)
+    distances = squared[:, None] + squared[None, :] - 2.0 * (z @ z.T)
+    np.maximum(distances, 0.0, out=distances)
+    np.fill_diagonal(distances, np.inf)
+
+    top_n = min(top_n, len(z) - 1)
+    if top_n <= 0:
+        return np.empty((len(z), 0), dtype=np.int32), np.empty((len(z), 0), dtype=np.float32)
+    nearest = np.argpartition(distances, top_n - 1, axis=1)[:, :top_n]
+    order = np.argsort(np.take_along_axis(distances, nearest, axis=1), axis=1, kind="stable")
+    nearest = np.take_along_axis(nearest, order, axis=1)
+    return nearest.astype(np.int32), np.sqrt(np.take_along_axis(distances, nearest, axis=1)).astype(np.float32)
+
+
+def build_index(category="camera_body", index_file=INDEX_FILE, features=recommender.FEATURES, top_n=TOP_N,
+                data_dir=specNormalizer.DATA_DIR, feature_dir=featureStore.FEATURE_DIR):
+    featureStore.build_store(category, data_dir, feature_dir)
+    store = featureStore.open_store(category, feature_dir)
+    z = standardize(store, features)
+    neighbours, distances = neighbour_table(z, top_n)
+    mounts, mount_names = mount_matrix(store)
+
+    tmp_file = index_file + ".tmp.npz"
+    np.savez(
+        tmp_file,
+        signature=np.array(f"{INDEX_VERSION}:{store.schema['signature']}"),
+        category=np.array(category),
+        features=np.array(features),
+        z=z,
+        mounts=mounts,
+        mount_names=np.array(mount_names, dtype=str),
+        neighbours=neighbours,
+        distances=distances,
+    )
+    os.replace(tmp_file, index_file)
+
+
+class SimilarIndex:
+    def __init__(self, index_file=INDEX_FILE, feature_dir=featureStore.FEATURE_DIR):
+        with np.load(index_file, allow_pickle=False) as data:
+            self.signature = str(data["signature"])
+            self.category = str(data["category"])
+            self.features = tuple(data["features"].tolist())
+            self.z = data["z"]
+            self.mounts = data["mounts"]
+            self.mount_names = tuple(data["mount_names"].tolist())
+            self.neighbours = data["neighbours"]
+            self.distances = data["distances"]
+        self.index_of = {feature: j for j, feature in enumerate(self.features)}
+        self.store = featureStore.open_store(self.category, feature_dir)
+        self._titles = None
+
+    @property
+    def titles(self):
+        if self._titles is None:
+            self._titles = self.store.strings("title")
+        return self._titles
+
+    def find(self, title):
+        return self.store.find_row(title)
+
+    def filter_mask(self, row, same_mount=False, constraints=None):
+        mask = recommender.constraint_mask(self.store, constraints, len(self.z))
+        if same_mount:
+            mask &= (self.mounts & self.mounts[row]).any(axis=1)
+        mask[row] = False
+        return mask
+
+    def similar(self, row, k=10, weights=None, same_mount=False, constraints=None):
+        """(rows, distances) of the k cameras closest to row, nearest first.
+
+        weights maps features to multipliers (unlisted features keep 1, 0 ignores a feature);
+        an unknown feature name is a ValueError.
+        """
+        if weights:
+            recommender.check_names("weight", weights, self.index_of)
+        if weights is None:
+            # The filtered table neighbours are still the nearest, as long as k of them are left
+            neighbours, distances = self.neighbours[row], self.distances[row]
+            if same_mount or constraints:
+                keep = self.filter_mask(row, same_mount, constraints)[neighbours]
+                neighbours, distances = neighbours[keep], distances[keep]
+            if len(neighbours) >= k:
+                return neighbours[:k], distances[:k]
+
+        vector = np.ones(len(self.features), dtype=np.float32)
+        for feature, weight in (weights or {}).items():
+            vector[self.index_of[feature]] = weight
+        difference = self.z - self.z[row]
+        distances = np.sqrt((difference * difference) @ vector)
+        mask = self.filter_mask(row, same_mount, constraints)
+        distances = np.where(mask, distances, np.inf)
+
+        k = min(k, int(np.count_nonzero(mask)))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return top, distances[top]
+
+
+def load_index(index_file=INDEX_FILE, category="camera_body", data_dir=specNormalizer.DATA_DIR, feature_dir=featureStore.FEATURE_DIR):
+    """The index, rebuilt first if it is missing or older than the feature store."""
+    featureStore.build_store(category, data_dir, feature_dir)
+    schema = featureStore.read_schema(category, feature_dir)
+    if os.path.exists(index_file):
+        index = SimilarIndex(index_file, feature_dir)
+        if index.signature == f"{INDEX_VERSION}:{schema['signature']}":
+            return index
+    build_index(category, index_file, data_dir=data_dir, feature_dir=feature_dir)
+    return SimilarIndex(index_file, feature_dir)
+
+
+if __name__ == "__main__":
+    # python similarIndex.py "CAMERA TITLE" [K] [--same-mount] -- cameras like the named one
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    same_mount = "--same-mount" in sys.argv
+    index = load_index()
+
+    row = index.find(args[0] if args else "Sony a7 III")
+    k = int(args[1]) if len(args) > 1 else 10
+    print(f"Like {index.titles[row]}:")
+    rows, distances = index.similar(row, k, same_mount=same_mount)
+    for other, distance in zip(rows.tolist(), distances.tolist()):
+        print(f"    {distance:6.3f}  {index.titles[other]}")
@@ -0,0 +1,103 @@
+import sys
+
+import numpy as np
+
+import featureStore
+import specNormalizer
+
+'''
+Pareto skyline ("nothing strictly better for the money") over the feature store columns.
+
+A row is on the skyline when no other row is at least as good on every chosen dimension and
+strictly better on one. Dimensions are {column: "min" | "max"}; any subset of the numeric columns
+works. Rows missing a value on a chosen dimension cannot be compared and are left out.
+
+The algorithm is sort-filter-skyline: the rows are sorted by the sum of their min-max scaled
+values (ties broken by the values themselves), an order in which a row can only be dominated by
+rows before it. They are then taken in blocks of BLOCK rows; each block is first checked against
+the skyline found so far, then the survivors against each other, each check one broadcast
+comparison. Dominance is transitive, so a row dominated by anything is dominated by a skyline row
+that is already in the window. The work is O(n x skyline size) in NumPy instead of n^2 Python
+dominance checks: the whole body catalog takes well under a millisecond and the lens catalog one
+to two (the skyline stage of benchmark.py), so it can run after every filter change (pass the
+filtered rows).
+'''
+
+BLOCK = 128
+DEFAULT_DIMENSIONS = {
+    "camera_body": {"msrp_usd": "min", "weight_g": "min", "megapixels": "max", "sensor_area_mm2": "max"},
+    "lens": {"weight_g": "min", "aperture_tele": "min", "focal_max_mm": "max"},
+}
+
+
+def _dominated(candidates, others):
+    """For each candidate, whether some row of others dominates it (all dimensions minimized)."""
+    if not len(others) or not len(candidates):
+        return np.zeros(len(candidates), dtype=bool)
+    # One 2-D comparison per dimension; reducing a short last axis of a 3-D array is much slower
+    no_worse = np.ones((len(candidates), len(others)), dtype=bool)
+    better = np.zeros((len(candidates), len(others)), dtype=bool)
+    for j in range(candidates.shape[1]):
+        c, o = candidates[:, j, None], others[None, :, j]
+        no_worse &= o <= c
+        better |= o < c
+    return (no_worse & better).any(axis=1)
+
+
+def skyline(columns, dimensions, rows=None):
+    """Sorted rows on the Pareto skyline of dimensions ({column: "min"/"max"}), among rows if given."""
+    if not dimensions:
+        raise ValueError("skyline needs at least one dimension")
+    for column, direction in dimensions.items():
+        if direction not in ("min", "max"):
+            raise ValueError(f"{column}: direction must be 'min' or 'max', not {direction!r}")
+    if rows is None:
+        rows = np.arange(len(columns[next(iter(dimensions))]))
+    rows = np.asarray(rows)
+
+    # Everything minimized: max dimensions are negated
+    points = np.column_stack([
+        np.asarray(columns[column], dtype=np.float64)[rows] * (1.0 if direction == "min" else -1.0)
+        for column, direction in dimensions.items()
+    ])
+    known = ~np.isnan(points).any(axis=1)
+    rows, points = rows[known], points[known]
+    if not len(rows):
+        return rows
+
+    low, high = points.min(axis=0), points.max(axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    score = ((points - low) / span).sum(axis=1)
+    order = np.lexsort(tuple(points.T[::-1]) + (score,))
+    rows, points = rows[order], points[order]
+
+    window = np.empty((0, points.shape[1]))
+    window_rows = []
+    for start in range(0, len(points), BLOCK):
+        # Most of a block falls to the window; only the rest is compared within the block
+        block, block_rows = points[start:start + BLOCK], rows[start:start + BLOCK]
+        keep = ~_dominated(block, window)
+        block, block_rows = block[keep], block_rows[keep]
+        keep = ~_dominated(block, block)
+        window = np.concatenate([window, block[keep]])
+        window_rows.append(block_rows[keep])
+    return np.sort(np.concatenate(window_rows))
+
+
+def store_skyline(category, dimensions=None, rows=None, data_dir=specNormalizer.DATA_DIR, feature_dir=featureStore.FEATURE_DIR):
+    """Skyline of a feature store category; dimensions default to DEFAULT_DIMENSIONS[category]."""
+    featureStore.build_store(category, data_dir, feature_dir)
+    store = featureStore.open_store(category, feature_dir)
+    return store, skyline(store, dimensions or DEFAULT_DIMENSIONS[category], rows)
+
+
+if __name__ == "__main__":
+    # python skyline.py [CATEGORY] [COLUMN:min|max ...] -- rows nothing else beats on every dimension
+    category = sys.argv[1] if len(sys.argv) > 1 else "camera_body"
+    dimensions = dict(arg.split(":", 1) for arg in sys.argv[2:]) or DEFAULT_DIMENSIONS[category]
+    store, rows = store_skyline(category, dimensions)
+    print(f"{category}: {len(rows)} of {len(store)} rows on the skyline of "
+          f"{', '.join(f'{column} ({direction})' for column, direction in dimensions.items())}")
+    values = np.column_stack([np.asarray(store[column])[rows] for column in dimensions])
+    for title, row_values in zip(store.strings("title", rows), values.tolist()):
+        print(f"    {title}: " + ", ".join(f"{value:g}" for value in row_values))
@@ -0,0 +1,287 @@
+import os
+import re
+import sys
+
+import numpy as np
+
+import catalogCache
+
+'''
+Typed spec columns: turns the raw DPReview strings of a category file ("280g(0.62lb)",
+"APS-C (23.5 x 15.6 mm)", "1/4000sec", "16–35mm", "F2.8–4", ...) into float64 NumPy columns.
+
+Every field has a parser built once from a precompiled regex. A category is normalized column by
+column: a Python loop runs the parser once per distinct string, and the results are spread back
+over the records with one fancy-indexing step. Only that scatter and the derived columns are
+NumPy operations; parsing itself is not vectorized, but its cost depends on the number of distinct
+values rather than records. Values that are missing or do not parse become NaN.
+
+load_normalized() caches the columns of each category as normalized/<category>.npz next to the
+category file (like catalogCache's snapshots), together with a hash of the source file and
+NORMALIZER_VERSION, and only parses again when either changes; bump the version after changing a
+parser. The builders go through it: featureStore exports these columns to the memory-mapped store
+the query code (recommender, indexes) reads, and catalogDb writes them as the REAL columns, so
+neither re-parses a file that has not changed.
+'''
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+NORMALIZED_DIR_NAME = "normalized"
+NORMALIZED_DIR = os.path.join(DATA_DIR, NORMALIZED_DIR_NAME)
+NORMALIZER_VERSION = 3
+FULL_FRAME_DIAGONAL_MM = 43.27  # 36 x 24 mm; crop factor = this / sensor diagonal
+
+_NUMBER = r"(\d+(?:[.,]\d+)*)"
+_DASH = r"\s*[–—-]\s*"
+
+
+def _to_float(text):
+    return float(text.replace(",", ""))
+
+
+def number_parser(pattern):
+    """Parser for the first number captured by pattern (a regex with one _NUMBER group)."""
+    regex = re.compile(pattern, re.IGNORECASE)
+
+    def parse(value):
+        match = regex.search(value)
+        return (_to_float(match.group(1)),) if match else None
+    return parse
+
+
+def range_parser(pattern):
+    """Parser for "lo–hi" or a single value (hi = lo), pattern capturing lo and optionally hi."""
+    regex = re.compile(pattern, re.IGNORECASE)
+
+    def parse(value):
+        match = regex.search(value)
+        if not match:
+            return None
+        low = _to_float(match.group(1))
+        return low, _to_float(match.group(2)) if match.group(2) else low
+    return parse
+
+
+def lookup_parser(table):
+    """Parser for values from a fixed vocabulary (compared case-insensitively)."""
+    table = {key.lower(): value for key, value in table.items()}
+
+    def parse(value):
+        found = table.get(value.strip().lower())
+        return (found,) if found is not None else None
+    return parse
+
+
+def flag_parser(pattern, unknown=("unknown",)):
+    """Parser for yes/no fields: 1.0 when pattern matches, 0.0 when it does not, NaN for unknown values."""
+    regex = re.compile(pattern, re.IGNORECASE)
+
+    def parse(value):
+        if value.strip().lower() in unknown:
+            return None
+        return (1.0 if regex.search(value) else 0.0,)
+    return parse
+
+
+_SENSOR = re.compile(rf"\(\s*{_NUMBER}\s*x\s*{_NUMBER}\s*mm\s*\)", re.IGNORECASE)
+# "1.4x" / "2X"; Nikon and Olympus model numbers ("TC-17E", "EC-20"); Kenko's bare "AF 2.0"
+_CONVERTER_FACTOR = re.compile(r"(\d(?:\.\d)?)\s*[x×](?![a-z])|\b[TE]C-(\d)(\d)|\bAF (\d\.\d)\b", re.IGNORECASE)
+_SECONDS = re.compile(rf"{_NUMBER}(?:\s*/\s*{_NUMBER})?\s*sec", re.IGNORECASE)
+
+
+def parse_sensor(value):
+    """"APS-C (23.5 x 15.6 mm)" -> (23.5, 15.6)"""
+    match = _SENSOR.search(value)
+    return (_to_float(match.group(1)), _to_float(match.group(2))) if match else None
+
+
+def parse_converter_factor(value):
+    """Teleconverter magnification from its title: "Extender EF 1.4x III" -> 1.4, "TC-20E II" -> 2.0"""
+    match = _CONVERTER_FACTOR.search(value)
+    if not match:
+        return None
+    if match.group(2):
+        return (float(f"{match.group(2)}.{match.group(3)}"),)
+    return (_to_float(match.group(1) or match.group(4)),)
+
+
+def parse_seconds(value):
+    """"1/4000sec" -> 0.00025, "30sec" -> 30.0"""
+    match = _SECONDS.search(value)
+    if not match:
+        return None
+    seconds = _to_float(match.group(1))
+    if match.group(2):
+        seconds /= _to_float(match.group(2))
+    return (seconds,)
+
+
+GRAMS = number_parser(rf"{_NUMBER}\s*g\b")
+MEGAPIXELS = number_parser(rf"{_NUMBER}\s*megapixels")
+USD = number_parser(rf"\$\s*{_NUMBER}")
+INCHES = number_parser(rf"{_NUMBER}\s*[″\"]")
+MULTIPLIER = number_parser(rf"{_NUMBER}\s*[×x]")
+METERS = number_parser(rf"{_NUMBER}\s*m\b")
+MILLIMETERS = number_parser(rf"{_NUMBER}\s*mm\b")
+FPS = number_parser(rf"{_NUMBER}\s*fps")
+INTEGER = number_parser(rf"^\s*{_NUMBER}\s*$")
+FOCAL_RANGE = range_parser(rf"{_NUMBER}(?:{_DASH}{_NUMBER})?\s*mm")
+F_RANGE = range_parser(rf"F\s*{_NUMBER}(?:{_DASH}{_NUMBER})?")
+FORMAT_CROP = lookup_parser({
+    "35mm FF": 1.0,
+    "APS-C / DX": 1.5,
+    "FourThirds": 2.0,
+    "1″": 2.7,
+    "1/1.7″": 4.55,
+    "Medium Format (645)": 0.62,
+    "Medium Format (44x33mm)": 0.79,
+})
+STABILIZED = flag_parser(r"^(sensor-shift|optical)")
+YES = flag_parser(r"^yes")
+ARTICULATED = flag_parser(r"^(tilting|fully articulated)")
+BUILT_IN_VIEWFINDER = flag_parser(r"^(electronic|optical)(?!.*optional)")
+# Yes/no columns keep only part of their source string ("Sensor-shift" -> 1.0)
+FLAG_PARSERS = (STABILIZED, YES, ARTICULATED, BUILT_IN_VIEWFINDER)
+
+# (source key, parser, output columns); a parser returns one float per output column
+_BODY_FIELDS = (
+    ("Weight (inc. batteries)", GRAMS, ("weight_g",)),
+    ("Effective pixels", MEGAPIXELS, ("megapixels",)),
+    ("Sensor size", parse_sensor, ("sensor_width_mm", "sensor_height_mm")),
+    ("Focal length multiplier", MULTIPLIER, ("focal_length_multiplier",)),
+    ("Maximum shutter speed", parse_seconds, ("shutter_fastest_s",)),
+    ("Maximum shutter speed (electronic)", parse_seconds, ("shutter_fastest_electronic_s",)),
+    ("Minimum shutter speed", parse_seconds, ("shutter_slowest_s",)),
+    ("MSRP", USD, ("msrp_usd",)),
+    ("Screen size", INCHES, ("screen_in",)),
+    ("Continuous drive", FPS, ("fps",)),
+    ("Battery Life (CIPA)", INTEGER, ("battery_shots",)),
+    ("Image stabilization", STABILIZED, ("stabilized",)),
+    ("Environmentally sealed", YES, ("sealed",)),
+    ("Articulated LCD", ARTICULATED, ("articulated_screen",)),
+    ("Viewfinder type", BUILT_IN_VIEWFINDER, ("viewfinder",)),
+)
+_LENS_FIELDS = (
+    ("Focal length", FOCAL_RANGE, ("focal_min_mm", "focal_max_mm")),
+    ("Maximum aperture", F_RANGE, ("aperture_wide", "aperture_tele")),
+    ("Minimum aperture", F_RANGE, ("min_aperture_wide", "min_aperture_tele")),
+)
+FIELDS = {
+    "camera_body": _BODY_FIELDS,
+    "fixed_lens": _BODY_FIELDS + _LENS_FIELDS,
+    "lens": _LENS_FIELDS + (
+        ("Weight", GRAMS, ("weight_g",)),
+        ("Max Format size", FORMAT_CROP, ("format_crop",)),
+        ("Minimum focus", METERS, ("min_focus_m",)),
+        ("Maximum magnification", MULTIPLIER, ("magnification",)),
+        ("Filter thread", MILLIMETERS, ("filter_mm",)),
+        ("Length", MILLIMETERS, ("length_mm",)),
+        ("Diameter", MILLIMETERS, ("diameter_mm",)),
+        ("Elements", INTEGER, ("elements",)),
+        ("Number of diaphragm blades", INTEGER, ("blades",)),
+    ),
+    "teleconverter": (
+        ("Title", parse_converter_factor, ("converter_factor",)),
+        ("Weight", GRAMS, ("weight_g",)),
+        ("Max Format size", FORMAT_CROP, ("format_crop",)),
+        ("Length", MILLIMETERS, ("length_mm",)),
+    ),
+}
+
+
+def parse_column(values, parser, width):
+    """Parse a list of raw strings (None for missing) into a (len(values), width) float array."""
+    index_of = {}
+    rows = np.fromiter((index_of.setdefault(value, len(index_of)) for value in values), dtype=np.intp, count=len(values))
+
+    # One parse per distinct value; missing (None) and unparseable values keep their NaN row
+    table = np.full((len(index_of), width), np.nan)
+    for value, row in index_of.items():
+        parsed = parser(value) if value is not None else None
+        if parsed is not None:
+            table[row] = parsed
+    return table[rows]
+
+
+def add_derived_columns(columns):
+    """Sensor area and crop factor from the sensor dimensions (falling back to the stated multiplier),
+    a single maximum aperture for primes, and the light loss of teleconverters."""
+    if "sensor_width_mm" in columns:
+        width, height = columns["sensor_width_mm"], columns["sensor_height_mm"]
+        columns["sensor_area_mm2"] = width * height
+        crop = FULL_FRAME_DIAGONAL_MM / np.hypot(width, height)
+        if "focal_length_multiplier" in columns:
+            crop = np.where(np.isnan(crop), columns["focal_length_multiplier"], crop)
+        columns["crop_factor"] = crop
+    if "aperture_tele" in columns:
+        # Some primes list their whole aperture range ("F2.8–32") as the maximum aperture
+        prime = columns["focal_min_mm"] == columns["focal_max_mm"]
+        columns["aperture_tele"] = np.where(prime, columns["aperture_wide"], columns["aperture_tele"])
+    if "converter_factor" in columns:
+        # Light loss in stops: the f-number grows by the factor, two stops per doubling
+        columns["stops_lost"] = 2.0 * np.log2(columns["converter_factor"])
+    return columns
+
+
+def normalize_records(records, category):
+    """Return {column: float64 array} for records of category, plus "title" (a str array)."""
+    columns = {"title": np.array([record.get("Title", "") for record in records], dtype=str)}
+    for key, parser, names in FIELDS.get(category, ()):
+        parsed = parse_column([record.get(key) for record in records], parser, len(names))
+        for i, name in enumerate(names):
+            columns[name] = parsed[:, i]
+    return add_derived_columns(columns)
+
+
+def cache_filename(category, cache_dir=NORMALIZED_DIR):
+    return os.path.join(cache_dir, f"{category}.npz")
+
+
+def source_signature(filepath):
+    return f"{NORMALIZER_VERSION}:{catalogCache.file_hash(filepath)}"
+
+
+def load_cached(category, signature, cache_dir=NORMALIZED_DIR):
+    """The cached columns of category, or None if there are none for this signature."""
+    filename = cache_filename(category, cache_dir)
+    if not os.path.exists(filename):
+        return None
+    with np.load(filename, allow_pickle=False) as cached:
+        if str(cached["_signature"]) != signature:
+            return None
+        return {name: cached[name] for name in cached.files if name != "_signature"}
+
+
+def save_cached(category, columns, signature, cache_dir=NORMALIZED_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    filename = cache_filename(category, cache_dir)
+    tmp_filename = filename + ".tmp.npz"  # np.savez would append .npz to any other name
+    np.savez(tmp_filename, _signature=np.array(signature), **columns)
+    os.replace(tmp_filename, filename)
+
+
+def load_normalized(category, data_dir=DATA_DIR, cache_dir=None):
+    """Typed columns of a category file, from the cache (default: data_dir/normalized) when the file has not changed."""
+    cache_dir = cache_dir or os.path.join(data_dir, NORMALIZED_DIR_NAME)
+    filepath = os.path.join(data_dir, catalogCache.CATEGORY_FILES[category])
+    signature = source_signature(filepath)
+    columns = load_cached(category, signature, cache_dir)
+    if columns is None:
+        columns = normalize_records(catalogCache.load_records(filepath, recover=True), category)
+        save_cached(category, columns, signature, cache_dir)
+    return columns
+
+
+if __name__ == "__main__":
+    # python specNormalizer.py [CATEGORY ...] -- rebuild stale caches and show how many values parsed
+    for category in sys.argv[1:] or FIELDS:
+        if not os.path.exists(os.path.join(DATA_DIR, catalogCache.CATEGORY_FILES[category])):
+            continue
+        try:
+            columns = load_normalized(category)
+        except ValueError as e:
+            print(f"Skipping {category}: {e}", file=sys.stderr)
+            continue
+        print(f"{category}: {len(columns['title'])} records")
+        for name, column in columns.items():
+            if name != "title":
+                print(f"    {name:<32} {int(np.count_nonzero(~np.isnan(column))):>6} parsed")
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import random
+from html import escape
+
+import catalogCache
+
+'''
+Generates DPReview-style spec pages for benchmarking without the real dump.
+
+Field distributions are seeded from the category files next to this script: each page picks a
+category in proportion to its record count, copies the key layout of a random real record of that
+category and fills every key with a value drawn from everything observed for that key.
+'''
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+PADDING_KB = 24  # navigation/script/ad boilerplate per page, outside the spec table
+ROWS_PER_SECTION = 8  # DPReview splits the specs into several tables with a group header row
+
+
+def load_category_records(data_dir=DATA_DIR):
+    """Return {category: records} for every category file that exists and parses."""
+    records = {}
+    for cat, filename in catalogCache.CATEGORY_FILES.items():
+        filepath = os.path.join(data_dir, filename)
+        if not os.path.exists(filepath):
+            continue
+        try:
+            records[cat] = catalogCache.load_records(filepath, recover=True)
+        except ValueError as e:
+            print(f"Skipping {filename}: {e}", file=sys.stderr)
+    return {cat: items for cat, items in records.items() if items}
+
+
+def build_model(records):
+    """Summarize records into {category: (weight, key layouts, {key: observed values})}."""
+    model = {}
+    for cat, items in records.items():
+        values = {}
+        for item in items:
+            for key, value in item.items():
+                values.setdefault(key, []).append(value)
+        layouts = [list(item) for item in items]
+        model[cat] = (len(items), layouts, values)
+    return model
+
+
+def generate_specs(rng, model):
+    """Draw one synthetic spec dict."""
+    categories = sorted(model)
+    weights = [model[cat][0] for cat in categories]
+    cat = rng.choices(categories, weights)[0]
+    _, layouts, values = model[cat]
+    return {key: rng.choice(values[key]) for key in rng.choice(layouts)}
+
+
+def _padding(rng, size_kb):
+    chunks = []
+    size = 0
+    while size < size_kb * 1024:
+        n = rng.randrange(1000)
+        chunk = (
+            f'<div class="ad" id="ad{n}"><script>window.dpr=window.dpr||[];dpr.push({{slot:"{n}",sizes:[[300,250]]}});</script></div>'
+            f'<li class="navItem"><a href="/products/{n}" title="Product {n}">Product {n}</a></li>\n'
+        )
+        chunks.append(chunk)
+        size += len(chunk)
+    return "".join(chunks)
+
+
+def render_page(rng, specs, padding_kb=PADDING_KB):
+    """Render specs as a DPReview spec page that extract_specs turns back into the same labels."""
+    title = specs.get("Title", "")
+    rows = [(key, value) for key, value in specs.items() if key != "Title"]
+
+    tables = []
+    for start in range(0, len(rows), ROWS_PER_SECTION):
+        body = [f'<tr><th class="groupLabel" colspan="2">Section {start // ROWS_PER_SECTION + 1}</th></tr>']
+        for key, value in rows[start:start + ROWS_PER_SECTION]:
+            body.append(f'<tr><th class="label">{escape(key)}</th><td class="value">{escape(value)}</td></tr>')
+        tables.append('<table class="specsTable"><tbody>\n' + "\n".join(body) + '\n</tbody></table>')
+
+    half = padding_kb // 2
+    return (
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+        f'<title>{escape(title)} Specs: Digital Photography Review</title>\n'
+        f'<script>{_padding(rng, 1)}</script>\n</head>\n<body>\n'
+        f'<div id="mainNav"><ul>{_padding(rng, half)}</ul></div>\n'
+        f'<div class="specificationsPage"><h1>{escape(title)} specifications</h1>\n'
+        + "\n".join(tables) +
+        f'\n</div>\n<div id="footer">{_padding(rng, padding_kb - half)}</div>\n</body>\n</html>\n'
+    )
+
+
+def generate_corpus(out_dir, count, seed=0, padding_kb=PADDING_KB, data_dir=DATA_DIR):
+    """Write count synthetic pages to out_dir and return their filepaths."""
+    rng = random.Random(seed)
+    model = build_model(load_category_records(data_dir))
+    if not model:
+        raise ValueError(f"No readable category files in {data_dir}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    filepaths = []
+    for i in range(count):
+        filepath = os.path.join(out_dir, f"synthetic_{i:06d}.html")
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(render_page(rng, generate_specs(rng, model), padding_kb))
+        filepaths.append(filepath)
+    return filepaths
+
+
+if __name__ == "__main__":
+    # python syntheticCorpus.py OUT_DIR COUNT [SEED]
+    out_dir, count = sys.argv[1], int(sys.argv[2])
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    generate_corpus(out_dir, count, seed)
+    print(json.dumps({"out_dir": out_dir, "pages": count, "seed": seed}))
@@ -0,0 +1,185 @@
+import os
+import sys
+
+import numpy as np
+
+import featureStore
+import mountRegistry
+import recommender
+import specNormalizer
+
+'''
+Teleconverter x lens compatibility table with the effective focal length and aperture of every
+combination.
+
+A converter is eligible for a lens when both are made for the same canonical mount (see
+mountRegistry), the lens reaches at least MIN_FOCAL_MM (converters are built for telephotos;
+their front element hits the rear element of shorter lenses), and, for the camera makers' own
+converters (CAPTIVE_BRANDS), the lens is of the same brand. The pairs are built one mount at a time
+from the mount index, and then the effective columns come from the lens feature columns in one
+vectorized step:
+
+    focal_min_mm, focal_max_mm    lens focal lengths x converter factor
+    aperture_wide, aperture_tele  lens maximum apertures x converter factor
+    autofocus                     the effective maximum aperture is still AF_APERTURE_LIMIT or brighter
+
+The table is written to INDEX_FILE sorted by converter, with offsets by converter and by lens. A
+wildlife query like "600mm or longer at f/8 or brighter" is one constraint mask over the pair
+columns, with no loop over lenses and converters. The table is rebuilt when the mount index changes.
+
+The pairs are mount-compatible, not verified: the catalog has no per-converter list of supported
+lenses, and the makers' own converters only fit the telephotos on the maker's compatibility list.
+COMPATIBILITY is saved with the table and printed with every result.
+'''
+
+INDEX_FILE = os.path.join(featureStore.FEATURE_DIR, "teleconverter_pairs.npz")
+INDEX_VERSION = 2
+COMPATIBILITY = "mount-compatible, not verified"
+MIN_FOCAL_MM = 135
+AF_APERTURE_LIMIT = 8.0  # slowest effective aperture current phase-detect AF still works at
+# Converters of these brands only couple to their own lenses; third-party ones (Kenko, Sigma, Tamron) fit any
+CAPTIVE_BRANDS = ("Canon", "Nikon", "Sony", "Olympus")
+LENS_COLUMNS = ("focal_min_mm", "focal_max_mm", "aperture_wide", "aperture_tele")
+
+
+def brand(title):
+    return title.split(None, 1)[0] if title else ""
+
+
+def eligible_pairs(mounts, lens_store, converter_store):
+    """(converter rows, lens rows) of every eligible combination, sorted by converter then lens."""
+    long_enough = np.asarray(lens_store["focal_max_mm"]) >= MIN_FOCAL_MM
+    lens_brands = np.array([brand(title) for title in lens_store.strings("title")])
+    converter_brands = [brand(title) for title in converter_store.strings("title")]
+
+    converters, lenses = [], []
+    for mount in mounts.mounts:
+        on_converters = mounts.rows("teleconverter", mount)
+        on_lenses = mounts.rows("lens", mount)
+        on_lenses = on_lenses[long_enough[on_lenses]]
+        if not len(on_converters) or not len(on_lenses):
+            continue
+        for converter in on_converters.tolist():
+            fitting = on_lenses
+            if converter_brands[converter] in CAPTIVE_BRANDS:
+                fitting = fitting[lens_brands[fitting] == converter_brands[converter]]
+            converters.append(np.full(len(fitting), converter, dtype=np.int32))
+            lenses.append(fitting)
+
+    if not converters:
+        empty = np.empty(0, dtype=np.int32)
+        return empty, empty
+    # A converter and a lens both sold for several mounts meet once per shared mount
+    pairs = np.unique(np.stack([np.concatenate(converters), np.concatenate(lenses)], axis=1), axis=0)
+    return pairs[:, 0].astype(np.int32), pairs[:, 1].astype(np.int32)
+
+
+def effective_columns(converters, lenses, lens_store, converter_store):
+    """{column: array over the pairs} of the combined focal lengths and apertures."""
+    factor = np.asarray(converter_store["converter_factor"])[converters]
+    columns = {name: np.asarray(lens_store[name])[lenses] * factor for name in LENS_COLUMNS}
+    columns["converter_factor"] = factor
+    columns["autofocus"] = (columns["aperture_tele"] <= AF_APERTURE_LIMIT).astype(np.float64)
+    return columns
+
+
+def build_index(index_file=INDEX_FILE, mount_index_file=mountRegistry.INDEX_FILE, data_dir=specNormalizer.DATA_DIR,
+                feature_dir=featureStore.FEATURE_DIR):
+    mounts = mountRegistry.load_index(mount_index_file, data_dir=data_dir, feature_dir=feature_dir)
+    lens_store, converter_store = mounts.store("lens"), mounts.store("teleconverter")
+    converters, lenses = eligible_pairs(mounts, lens_store, converter_store)
+    columns = effective_columns(converters, lenses, lens_store, converter_store)
+    by_lens = np.lexsort((converters, lenses))
+
+    tmp_file = index_file + ".tmp.npz"
+    np.savez(
+        tmp_file,
+        signature=np.array(f"{INDEX_VERSION}:{mounts.signature}"),
+        compatibility=np.array(COMPATIBILITY),
+        converter=converters,
+        lens=lenses,
+        converter_offsets=np.searchsorted(converters, np.arange(len(converter_store) + 1)),
+        lens_offsets=np.searchsorted(lenses[by_lens], np.arange(len(lens_store) + 1)),
+        by_lens=by_lens.astype(np.int32),
+        **columns,
+    )
+    os.replace(tmp_file, index_file)
+
+
+class TeleconverterIndex:
+    def __init__(self, index_file=INDEX_FILE, feature_dir=featureStore.FEATURE_DIR):
+        with np.load(index_file, allow_pickle=False) as data:
+            self.signature = str(data["signature"])
+            self.compatibility = str(data["compatibility"])
+            self.converter = data["converter"]
+            self.lens = data["lens"]
+            self.converter_offsets = data["converter_offsets"]
+            self.lens_offsets = data["lens_offsets"]
+            self.by_lens = data["by_lens"]
+            self.columns = {name: data[name] for name in LENS_COLUMNS + ("converter_factor", "autofocus")}
+        self.feature_dir = feature_dir
+        self._stores = {}
+
+    def __len__(self):
+        return len(self.converter)
+
+    def store(self, category):
+        if category not in self._stores:
+            self._stores[category] = featureStore.open_store(category, self.feature_dir)
+        return self._stores[category]
+
+    def pairs_for_converter(self, converter):
+        """Pair indexes of one converter (its eligible lenses are self.lens[pairs])."""
+        return np.arange(self.converter_offsets[converter], self.converter_offsets[converter + 1])
+
+    def pairs_for_lens(self, lens):
+        """Pair indexes of one lens (its eligible converters are self.converter[pairs])."""
+        return self.by_lens[self.lens_offsets[lens]:self.lens_offsets[lens + 1]]
+
+    def search(self, constraints=None, pairs=None):
+        """Pair indexes (of all pairs, or of the given ones) whose effective columns pass constraints."""
+        if pairs is None:
+            return np.flatnonzero(recommender.constraint_mask(self.columns, constraints, len(self)))
+        subset = {name: self.columns[name][pairs] for name in constraints or ()}
+        return pairs[recommender.constraint_mask(subset, constraints, len(pairs))]
+
+    def pairs_for_body(self, body, mounts, constraints=None):
+        """Pair indexes whose lens fits camera body (a mountRegistry.MountIndex decides) and whose converter shares its mount."""
+        lenses = mounts.lenses_for_body(body)[0]
+        converters = np.concatenate(
+            [mounts.rows("teleconverter", mount) for mount in mounts.mounts_of("camera_body", body)]
+            or [np.empty(0, dtype=np.int32)]
+        )
+        pairs = np.flatnonzero(np.isin(self.lens, lenses) & np.isin(self.converter, converters))
+        return self.search(constraints, pairs)
+
+    def describe(self, pairs):
+        """[(converter title, lens title, {effective column: value})] for pair indexes; see self.compatibility."""
+        converters = self.store("teleconverter").strings("title", self.converter[pairs])
+        lenses = self.store("lens").strings("title", self.lens[pairs])
+        values = [dict(zip(self.columns, row)) for row in np.column_stack([self.columns[name][pairs] for name in self.columns]).tolist()]
+        return list(zip(converters, lenses, values))
+
+
+def load_index(index_file=INDEX_FILE, mount_index_file=mountRegistry.INDEX_FILE, data_dir=specNormalizer.DATA_DIR,
+               feature_dir=featureStore.FEATURE_DIR):
+    """The table, rebuilt first if it is missing or older than the mount index."""
+    mounts = mountRegistry.load_index(mount_index_file, data_dir=data_dir, feature_dir=feature_dir)
+    if os.path.exists(index_file):
+        index = TeleconverterIndex(index_file, feature_dir)
+        if index.signature == f"{INDEX_VERSION}:{mounts.signature}":
+            return index
+    build_index(index_file, mount_index_file, data_dir, feature_dir)
+    return TeleconverterIndex(index_file, feature_dir)
+
+
+if __name__ == "__main__":
+    # python teleconverterIndex.py [MIN_FOCAL_MM] [MAX_APERTURE] -- lens + converter combinations reaching a focal length
+    min_focal = float(sys.argv[1]) if len(sys.argv) > 1 else 600
+    max_aperture = float(sys.argv[2]) if len(sys.argv) > 2 else AF_APERTURE_LIMIT
+    index = load_index()
+
+    pairs = index.search({"focal_max_mm": (min_focal, None), "aperture_tele": (None, max_aperture)})
+    print(f"{len(pairs)} of {len(index)} combinations ({index.compatibility}) reach {min_focal:g}mm at f/{max_aperture:g} or brighter")
+    for converter, lens, values in index.describe(pairs):
+        print(f"    {values['focal_max_mm']:6.0f}mm f/{values['aperture_tele']:<4.3g}  {lens} + {converter}")
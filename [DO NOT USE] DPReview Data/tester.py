@@ -1,12 +1,37 @@
-import dbCleaning2
+import catalogCache
 import os
-import json
 
 
-def count_items_in_json_files():
-        for filename in os.listdir(dbCleaning2.HTML_FOLDER):
-            if filename.endswith('.json'):
-                filepath = os.path.join(dbCleaning2.HTML_FOLDER, filename)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    print(f"{filename}: {len(data)} items")
+# Output files of the cleaning pipeline, JSON arrays or JSONL under either extension (other JSON files are skipped)
+OUTPUT_NAMES = {os.path.splitext(filename)[0] for filename in catalogCache.CATEGORY_FILES.values()} | {"all_specs"}
+
+
+def count_items_in_json_files(folder=catalogCache.DATA_DIR):
+        """Print the record count of every output file in folder, streaming each file once."""
+        for filename in sorted(os.listdir(folder)):
+            name, extension = os.path.splitext(filename)
+            if extension in ('.json', '.jsonl') and name in OUTPUT_NAMES:
+                filepath = os.path.join(folder, filename)
+                count = sum(1 for _ in catalogCache.iter_json_records(filepath, recover=True))
+                print(f"{filename}: {count} items")
+
+
+def compare_extractor_backends(folder=None):
+        """Check that every backend, with and without the prefilter, returns the same dict as plain BeautifulSoup."""
+        import dbCleaning2  # only this check needs the extractors (and BeautifulSoup/lxml)
+
+        folder = folder or dbCleaning2.HTML_FOLDER
+        variants = [("lxml", False), ("bs4", True), ("lxml", True)]
+        mismatches = 0
+        filenames = sorted(os.listdir(folder))
+        for filename in filenames:
+            data = dbCleaning2.read_html_bytes(os.path.join(folder, filename))
+            expected = dbCleaning2.extract_specs(data, backend="bs4", prefilter=False)
+            for backend, prefilter in variants:
+                actual = dbCleaning2.extract_specs(data, backend=backend, prefilter=prefilter)
+                # Compare item lists so a different key order also counts as a mismatch
+                if list(expected.items()) != list(actual.items()):
+                    mismatches += 1
+                    print(f"{filename}: {backend} (prefilter={prefilter}) differs")
+        print(f"{len(filenames) * len(variants) - mismatches}/{len(filenames) * len(variants)} page checks match")
+        return mismatches == 0
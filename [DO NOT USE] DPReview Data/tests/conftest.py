@@ -0,0 +1,42 @@
+import os
+import sys
+import shutil
+import tarfile
+import zipfile
+
+import pytest
+
+# The modules live one level up and import each other by their bare names
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DATA_DIR)
+
+import syntheticCorpus  # noqa: E402
+
+CORPUS_PAGES = 40
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory):
+    """Filepaths of a small synthetic corpus drawn from the committed category files."""
+    return syntheticCorpus.generate_corpus(str(tmp_path_factory.mktemp("corpus")), CORPUS_PAGES, seed=1, padding_kb=2)
+
+
+@pytest.fixture
+def page_folder(corpus, tmp_path):
+    """A folder with the first 12 corpus pages, free to edit."""
+    folder = tmp_path / "pages"
+    folder.mkdir()
+    for filepath in corpus[:12]:
+        shutil.copy(filepath, folder)
+    return folder
+
+
+@pytest.fixture
+def archives(page_folder, tmp_path):
+    """{kind: path} of the page folder and the same pages as a .zip and a .tar.gz."""
+    zip_path, tar_path = tmp_path / "pages.zip", tmp_path / "pages.tar.gz"
+    with zipfile.ZipFile(zip_path, 'w') as archive, tarfile.open(tar_path, 'w:gz') as tar:
+        for filename in sorted(os.listdir(page_folder)):
+            archive.write(page_folder / filename, filename)
+            tar.add(page_folder / filename, filename)
+    return {"folder": str(page_folder), "zip": str(zip_path), "tar": str(tar_path)}
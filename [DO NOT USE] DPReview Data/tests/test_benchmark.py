@@ -0,0 +1,37 @@
+import json
+
+import benchmark
+
+
+def test_committed_baseline_covers_every_stage():
+    baseline = benchmark.load_baseline()
+    assert set(baseline["1000"]["stages"]) == set(benchmark.STAGES)
+    assert all(stats["items_per_sec"] > 0 for stats in baseline["1000"]["stages"].values())
+
+
+def test_find_regressions_uses_the_tolerance():
+    baseline = {"1000": {"stages": {"fast": {"items_per_sec": 100.0}, "slow": {"items_per_sec": 100.0}}}}
+    result = {"size": 1000, "stages": {"fast": {"items_per_sec": 85.0}, "slow": {"items_per_sec": 75.0}}}
+    assert benchmark.find_regressions(result, baseline, tolerance=0.2) == ["slow at 1000 pages: 75% of baseline throughput"]
+    assert benchmark.find_regressions(result, baseline, tolerance=0.3) == []
+    assert benchmark.find_regressions(dict(result, size=10), baseline) == []
+
+
+def test_main_compares_against_the_baseline(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, "MIN_SECONDS", 0)
+    baseline_file = tmp_path / "baseline.json"
+    assert benchmark.main(["--sizes", "20", "--stages", "categorize_item", "--no-memory", "--baseline", str(baseline_file),
+                           "--save-baseline"]) == 0
+    baseline = benchmark.load_baseline(str(baseline_file))
+    assert set(baseline["20"]) == {"size", "seed", "generate_seconds", "stages"}
+    baseline["20"]["stages"]["categorize_item"]["items_per_sec"] *= 1000
+    baseline_file.write_text(json.dumps(baseline))
+    assert benchmark.main(["--sizes", "20", "--stages", "categorize_item", "--no-memory", "--baseline", str(baseline_file)]) == 1
+
+
+def test_catalog_stages_run_in_the_run_dir(monkeypatch):
+    monkeypatch.setattr(benchmark, "MIN_SECONDS", 0)
+    stages = [name for name in benchmark.STAGES if not name.startswith("extract_specs")]
+    result = benchmark.run_benchmark(100, stages=stages, measure_memory=False)
+    assert list(result["stages"]) == stages
+    assert all(stats["runs"] == 1 and stats["seconds"] > 0 for stats in result["stages"].values())
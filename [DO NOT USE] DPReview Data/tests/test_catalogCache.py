@@ -0,0 +1,73 @@
+import os
+import json
+import shutil
+
+import pytest
+
+import catalogCache
+import jsonStream
+import tester
+
+
+@pytest.fixture
+def lens_file(tmp_path):
+    filepath = str(tmp_path / "lens.json")
+    shutil.copy(catalogCache.category_path("lens"), filepath)
+    return filepath
+
+
+def test_snapshot_round_trip(lens_file):
+    records = catalogCache.load_records(lens_file)
+    assert os.path.exists(catalogCache.snapshot_filename(lens_file))
+    assert catalogCache.read_snapshot(lens_file) == records == catalogCache.load_json(lens_file)
+
+
+def test_touched_file_keeps_its_snapshot(lens_file):
+    catalogCache.load_records(lens_file)
+    stat = os.stat(lens_file)
+    os.utime(lens_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert catalogCache.read_snapshot(lens_file) is not None
+    # Re-stamped with the new mtime, so the next read skips the hash
+    with open(catalogCache.snapshot_filename(lens_file), 'rb') as f:
+        assert json.loads(f.readline())["mtime_ns"] == stat.st_mtime_ns + 10**9
+
+
+def test_changed_file_rebuilds_its_snapshot(lens_file):
+    records = catalogCache.load_records(lens_file)
+    catalogCache.load_records(lens_file)
+    with open(lens_file, 'w', encoding='utf-8') as f:
+        json.dump(records[:3], f, indent=4)
+    assert catalogCache.read_snapshot(lens_file) is None
+    assert catalogCache.load_records(lens_file) == records[:3]
+
+
+def test_repaired_snapshot_is_only_used_when_recovering(tmp_path):
+    filepath = str(tmp_path / "misc.json")
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write('[\n    {"Title": "A"},\n    {"Title": "B"},\n]\n')
+    assert catalogCache.load_records(filepath, recover=True) == [{"Title": "A"}, {"Title": "B"}]
+    assert catalogCache.read_snapshot(filepath, recover=True) is not None
+    with pytest.raises(jsonStream.JsonSyntaxError):
+        catalogCache.load_records(filepath)
+
+
+def test_jsonl_files_load_like_arrays(tmp_path, lens_file):
+    records = catalogCache.load_json(lens_file)
+    filepath = str(tmp_path / "lens.jsonl")
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+    assert catalogCache.load_records(filepath) == records
+
+
+def test_count_items_streams_output_files(tmp_path, capsys):
+    with open(tmp_path / "camera_body.json", 'w', encoding='utf-8') as f:
+        f.write('[{"Title": "A"}, {"Title": "B"},]')
+    with open(tmp_path / "misc.jsonl", 'w', encoding='utf-8') as f:
+        f.write('{"Title": "C"}\n\n{"Title": "D"}\n{"Title": "E"}\n')
+    with open(tmp_path / "benchmark_baseline.json", 'w', encoding='utf-8') as f:
+        f.write('{"1000": {}}')
+
+    tester.count_items_in_json_files(str(tmp_path))
+    assert capsys.readouterr().out.splitlines() == ["camera_body.json: 2 items", "misc.jsonl: 3 items"]
+    # Counting reads the files once and leaves no snapshots behind
+    assert sorted(os.listdir(tmp_path)) == ["benchmark_baseline.json", "camera_body.json", "misc.jsonl"]
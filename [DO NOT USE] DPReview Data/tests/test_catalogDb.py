@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import catalogCache
+import catalogDb
+import specNormalizer
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    db_file = str(tmp_path_factory.mktemp("catalog") / "catalog.db")
+    catalogDb.build_catalog(db_file)
+    conn = catalogDb.connect(db_file)
+    yield conn
+    conn.close()
+
+
+def test_every_category_file_is_loaded(conn):
+    for category in catalogCache.CATEGORY_FILES:
+        if os.path.exists(catalogCache.category_path(category)):
+            count = conn.execute(f'SELECT COUNT(*) FROM "{category}"').fetchone()[0]
+            assert count == len(catalogCache.load_category(category))
+
+
+def test_record_round_trip(conn):
+    """Text columns plus the specs side table give back every raw field of a record."""
+    records = catalogCache.load_category("camera_body")
+    for item_id in (1, len(records) // 2, len(records)):
+        record = records[item_id - 1]
+        row = catalogDb.find_items(conn, "camera_body", order_by="id")[item_id - 1]
+        rebuilt = dict(catalogDb.get_specs(conn, "camera_body", item_id))
+        rebuilt.update({key: row[column] for column, keys in catalogDb.TEXT_COLUMNS.items() for key in keys[:1]
+                        if row[column] is not None})
+        # Fields parsed into a typed column only survive as that column
+        column_only = {key for key, parser, _ in specNormalizer.FIELDS["camera_body"]
+                       if parser not in specNormalizer.FLAG_PARSERS} - {"Title", "Sensor size"}
+        assert {key: value for key, value in record.items() if key not in column_only} == rebuilt
+
+
+def test_flag_fields_keep_their_raw_text(conn):
+    records = catalogCache.load_category("camera_body")
+    item_id = next(i for i, record in enumerate(records, 1) if record.get("Image stabilization", "").startswith("Sensor"))
+    specs = catalogDb.get_specs(conn, "camera_body", item_id)
+    assert specs["Image stabilization"] == records[item_id - 1]["Image stabilization"]
+    for key in ("Articulated LCD", "Viewfinder type", "Environmentally sealed"):
+        assert specs.get(key) == records[item_id - 1].get(key)
+    # Parsed numeric fields are columns only
+    assert "MSRP" not in specs and "Effective pixels" not in specs
+
+
+def test_lens_query_filters(conn):
+    lenses = catalogDb.lens_query(conn, mount="Sony E", max_weight_g=500, order_by="weight_g")
+    assert lenses
+    assert all(lens["weight_g"] <= 500 and "Sony E" in lens["lens_mount"] for lens in lenses)
+    assert [lens["weight_g"] for lens in lenses] == sorted(lens["weight_g"] for lens in lenses)
+
+
+@pytest.mark.parametrize("order_by", ["weight_g; DROP TABLE lens", 'id" DESC --', "no_such_column"])
+def test_order_by_must_be_a_column(conn, order_by):
+    with pytest.raises(ValueError, match="Cannot order lens"):
+        catalogDb.find_items(conn, "lens", order_by=order_by)
+    assert conn.execute('SELECT COUNT(*) FROM "lens"').fetchone()[0] > 0
+
+
+def test_unknown_category(conn):
+    with pytest.raises(ValueError, match="Unknown category"):
+        catalogDb.find_items(conn, 'lens" --')
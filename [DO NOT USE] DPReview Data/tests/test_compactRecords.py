@@ -0,0 +1,43 @@
+import pickle
+
+import pytest
+
+import catalogCache
+import compactRecords
+
+
+@pytest.mark.parametrize("category", sorted(compactRecords.RECORD_TYPES))
+def test_records_round_trip(category):
+    records = catalogCache.load_category(category)
+    compact = compactRecords.compact_records(records, category)
+    for record, item in zip(records, compact):
+        assert item.to_dict() == record
+        assert len(item) == len(record)
+        for key, value in record.items():
+            assert item[key] == value and key in item
+
+
+def test_dict_and_attribute_access():
+    record_type = compactRecords.RECORD_TYPES["lens"]
+    item = record_type.from_dict({"Title": "Lens A", "Lens mount": "Canon EF", "Odd key": "x"})
+    assert item.lens_mount == item["Lens mount"] == "Canon EF"
+    assert item.get("Weight") is None and item.weight is None
+    assert item.get("Odd key") == "x" and "Odd key" in item
+    with pytest.raises(KeyError):
+        item["Weight"]
+    with pytest.raises(AttributeError):
+        item.no_such_attribute
+    assert pickle.loads(pickle.dumps(item)).to_dict() == item.to_dict()
+
+
+def test_values_are_interned():
+    records = [{"Title": "A", "Lens mount": "".join(["Canon", " EF"])}, {"Title": "B", "Lens mount": "Canon" + " EF"}]
+    first, second = compactRecords.compact_records(records, "lens")
+    assert first.lens_mount is second.lens_mount
+
+
+def test_attribute_names():
+    assert compactRecords.attribute_name("Weight (inc. batteries)") == "weight_inc_batteries"
+    assert compactRecords.attribute_name("35mm equiv. focal length") == "_35mm_equiv_focal_length"
+    with pytest.raises(ValueError):
+        compactRecords.make_record_type("Clash", ("Lens mount", "Lens-mount"))
@@ -0,0 +1,286 @@
+import os
+import json
+import tracemalloc
+
+import pytest
+
+import catalogCache
+import dbCleaning2
+import tester
+from pipelineStats import PipelineStats
+
+
+def counted(items, pulled):
+    """Yield items, counting in pulled[0] how many have been read."""
+    for item in items:
+        pulled[0] += 1
+        yield item
+
+
+def read_ahead(results, pulled):
+    """Largest number of sources read but not yet returned while consuming results."""
+    lead = 0
+    for returned, _ in enumerate(results, 1):
+        lead = max(lead, pulled[0] - returned)
+    return lead
+
+
+def test_extract_all_parallel_matches_serial(corpus):
+    serial = list(dbCleaning2.extract_all(corpus, workers=1, backend="lxml"))
+    parallel = list(dbCleaning2.extract_all(corpus, workers=2, chunksize=3, backend="lxml"))
+    assert parallel == serial
+    assert all(specs.get("Title") for specs in serial)
+
+
+def test_extract_all_reads_at_most_the_window_ahead(corpus):
+    pulled = [0]
+    results = dbCleaning2.extract_all(counted(corpus, pulled), workers=2, chunksize=2, backend="lxml")
+    assert read_ahead(results, pulled) <= 2 * dbCleaning2.MAX_PENDING * 2
+    assert pulled[0] == len(corpus)
+
+
+XML_DECLARATION_PAGE = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<html><head><title>Café 50mm F1.8 Specs: Digital Photography Review</title></head><body>\n'
+    '<table class="specsTable"><tr><th class="label">Lens mount</th><td class="value">Nikon F (FX)</td></tr>\n'
+    '<tr><th class="label">Weight</th><td class="value">185 g (0.41 lb)</td></tr></table>\n'
+    '</body></html>\n'
+).encode('utf-8')
+
+BACKEND_VARIANTS = [("lxml", False), ("bs4", True), ("lxml", True)]
+
+
+@pytest.mark.parametrize("backend, prefilter", BACKEND_VARIANTS)
+def test_backends_match_plain_bs4(corpus, backend, prefilter):
+    for filepath in corpus:
+        expected = dbCleaning2.extract_specs(filepath, "bs4", prefilter=False)
+        actual = dbCleaning2.extract_specs(filepath, backend, prefilter=prefilter)
+        assert list(actual.items()) == list(expected.items()), filepath
+
+
+@pytest.mark.parametrize("backend, prefilter", BACKEND_VARIANTS)
+def test_backends_match_on_xml_declaration_page(backend, prefilter):
+    expected = dbCleaning2.extract_specs(XML_DECLARATION_PAGE, "bs4", prefilter=False)
+    assert expected == {"Title": "Café 50mm F1.8", "Lens mount": "Nikon F (FX)", "Weight": "185 g (0.41 lb)"}
+    assert dbCleaning2.extract_specs(XML_DECLARATION_PAGE, backend, prefilter=prefilter) == expected
+
+
+@pytest.mark.parametrize("page", [b"", b"  \n", b"<!DOCTYPE html>", b"<!-- nothing here -->"])
+def test_backends_match_on_pages_without_elements(page):
+    for backend, prefilter in BACKEND_VARIANTS:
+        assert dbCleaning2.extract_specs(page, backend, prefilter=prefilter) == {}
+
+
+def test_compare_extractor_backends(corpus):
+    assert tester.compare_extractor_backends(os.path.dirname(corpus[0]))
+
+
+def incremental_run(folder, manifest_file, **kwargs):
+    """(specs, pages parsed, pages cached) of one extract_incremental run over folder."""
+    stats = PipelineStats()
+    specs = list(dbCleaning2.extract_incremental(dbCleaning2.iter_sources(str(folder)), str(manifest_file), stats=stats,
+                                                 **kwargs))
+    return specs, stats.counters.get("pages_parsed", 0), stats.counters.get("pages_cached", 0)
+
+
+def test_incremental_is_opt_in():
+    assert dbCleaning2.INCREMENTAL is False
+
+
+def test_incremental_reuses_unchanged_pages(page_folder, tmp_path):
+    manifest_file = tmp_path / "manifest.json"
+    expected = [dbCleaning2.extract_specs(source) for _, _, _, source in dbCleaning2.iter_sources(str(page_folder))]
+
+    specs, parsed, cached = incremental_run(page_folder, manifest_file)
+    assert (specs, parsed, cached) == (expected, 12, 0)
+    specs, parsed, cached = incremental_run(page_folder, manifest_file)
+    assert (specs, parsed, cached) == (expected, 0, 12)
+
+    # Only hashes and record offsets are kept in the manifest, keyed by the extraction settings
+    with open(manifest_file, encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert manifest["settings"] == dbCleaning2.extraction_settings()
+    assert all(set(entry) == {"size", "mtime_ns", "sha1", "offset", "length"} for entry in manifest["pages"].values())
+
+
+def test_incremental_parses_changed_pages_and_drops_removed_ones(page_folder, tmp_path):
+    manifest_file = tmp_path / "manifest.json"
+    incremental_run(page_folder, manifest_file)
+    changed, removed = sorted(os.listdir(page_folder))[:2]
+    with open(page_folder / changed, 'ab') as f:
+        f.write(b"<!-- edited -->\n")
+    os.remove(page_folder / removed)
+
+    specs, parsed, cached = incremental_run(page_folder, manifest_file)
+    assert (parsed, cached) == (1, 10)
+    assert specs == [dbCleaning2.extract_specs(source) for _, _, _, source in dbCleaning2.iter_sources(str(page_folder))]
+    assert removed not in dbCleaning2.load_manifest(str(manifest_file))
+
+
+def test_incremental_parses_everything_when_the_settings_change(page_folder, tmp_path):
+    manifest_file = tmp_path / "manifest.json"
+    incremental_run(page_folder, manifest_file, backend="bs4", prefilter=True)
+    assert incremental_run(page_folder, manifest_file, backend="lxml", prefilter=True)[1:] == (12, 0)
+    assert incremental_run(page_folder, manifest_file, backend="lxml", prefilter=False)[1:] == (12, 0)
+    assert incremental_run(page_folder, manifest_file, backend="lxml", prefilter=False)[1:] == (0, 12)
+
+
+def test_incremental_streams_parsed_pages(page_folder, tmp_path):
+    manifest_file = str(tmp_path / "manifest.json")
+    for workers, chunksize, window in ((1, 1, 1), (2, 2, 2 * dbCleaning2.MAX_PENDING * 2)):
+        if os.path.exists(manifest_file):
+            os.remove(manifest_file)
+        pulled = [0]
+        sources = counted(dbCleaning2.iter_sources(str(page_folder)), pulled)
+        results = dbCleaning2.extract_incremental(sources, manifest_file, workers, chunksize, backend="lxml")
+        assert read_ahead(results, pulled) <= window
+
+
+def test_incremental_jsonl_run_matches_full_run(page_folder, tmp_path, monkeypatch):
+    monkeypatch.setattr(dbCleaning2, "HTML_FOLDER", str(page_folder))
+    outputs = {}
+    for incremental in (False, True, True):
+        monkeypatch.chdir(tmp_path)
+        dbCleaning2.main(incremental=incremental, output_format="jsonl")
+        with open(dbCleaning2.ALL_SPECS_FILE, encoding='utf-8') as f:
+            outputs.setdefault(incremental, []).append(f.read())
+    assert outputs[True] == [outputs[False][0]] * 2
+    assert os.path.exists(tmp_path / dbCleaning2.MANIFEST_FILE)
+
+
+def test_jsonl_rebuild_is_what_the_catalog_loads(page_folder, tmp_path, monkeypatch):
+    monkeypatch.setattr(dbCleaning2, "HTML_FOLDER", str(page_folder))
+    catalogs = {}
+    for output_format in ("json", "jsonl"):
+        out_dir = tmp_path / output_format
+        out_dir.mkdir()
+        monkeypatch.chdir(out_dir)
+        dbCleaning2.main(output_format=output_format)
+        assert sorted(os.listdir(out_dir)) == sorted([dbCleaning2.ALL_SPECS_FILE, *catalogCache.CATEGORY_FILES.values()])
+        catalogs[output_format] = catalogCache.load_catalog(str(out_dir))
+    assert catalogs["jsonl"] == catalogs["json"]
+    assert sum(len(records) for records in catalogs["jsonl"].values()) == 12
+
+
+def test_archives_match_folder(archives):
+    results = {}
+    for kind, location in archives.items():
+        names = [name for name, _, _, _ in dbCleaning2.iter_sources(location)]
+        sources = (source for _, _, _, source in dbCleaning2.iter_sources(location))
+        specs = dbCleaning2.extract_all(sources, workers=2, chunksize=2, backend="lxml")
+        results[kind] = sorted(zip(names, specs), key=lambda item: item[0])
+    assert results["zip"] == results["folder"]
+    assert results["tar"] == results["folder"]
+
+
+@pytest.mark.parametrize("kind", ["zip", "tar"])
+def test_archive_members_are_read_within_the_window(archives, kind):
+    pulled = [0]
+    sources = counted((source for _, _, _, source in dbCleaning2.iter_sources(archives[kind])), pulled)
+    results = dbCleaning2.extract_all(sources, workers=2, chunksize=2, backend="lxml")
+    assert read_ahead(results, pulled) <= 2 * dbCleaning2.MAX_PENDING * 2
+    assert pulled[0] == 12
+
+
+def write_kaggle_file(filepath, lines, padding=8192):
+    """A dpreview.jsonl of already extracted records, each with padding bytes of unused text."""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        for n in range(lines):
+            specs = {"Lens mount": "Sony FE", "Focal length": f"{n % 600 + 10} mm", "Weight": f"{n % 900 + 100} g"}
+            f.write(json.dumps({"title": f"Lens {n} Specs", "specs": specs, "description": "x" * padding}) + "\n")
+
+
+def test_main_kaggle_parallel_matches_serial(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_kaggle_file("dpreview.jsonl", 50, padding=10)
+    outputs = []
+    for workers in (1, 2):
+        dbCleaning2.main_kaggle("dpreview.jsonl", workers=workers, chunksize=3)
+        with open("lens.json", encoding='utf-8') as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1]
+    assert outputs[0].count("\n") == 50
+
+
+def test_main_kaggle_output_loads_through_the_catalog(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_kaggle_file("dpreview.jsonl", 20, padding=10)
+    dbCleaning2.main_kaggle("dpreview.jsonl")
+    lenses = catalogCache.load_category("lens", str(tmp_path))
+    assert [record["Title"] for record in lenses] == [f"Lens {n}" for n in range(20)]
+    assert catalogCache.load_category("camera_body", str(tmp_path)) == []
+
+
+def test_main_kaggle_memory_stays_bounded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_kaggle_file("dpreview.jsonl", 2000)
+    file_size = os.path.getsize("dpreview.jsonl")
+
+    tracemalloc.start()
+    try:
+        dbCleaning2.main_kaggle("dpreview.jsonl", workers=2, chunksize=4, output_format="jsonl")
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # The window holds 2 * MAX_PENDING chunks of 4 lines; an eager map would hold all 16 MB
+    assert peak < file_size / 8
+
+
+def test_prefilter_slices_title_and_spec_tables(corpus):
+    data = dbCleaning2.read_html_bytes(corpus[0])
+    fragment = dbCleaning2.prefilter_html(data)
+    assert fragment.startswith(b"<title>") and fragment.endswith(b"</table>")
+    assert len(fragment) < len(data)
+    assert dbCleaning2.parse_specs(fragment.decode("utf-8")) == dbCleaning2.extract_specs(data, prefilter=False)
+
+
+@pytest.mark.parametrize("page", [
+    # No spec rows at all
+    b"<html><head><title>x</title></head><body><p>nothing</p></body></html>",
+    # The first label is inside a script, so a slice could start inside it
+    b"<script>var s = '<table><tr><th class=\"label\">A</th>';</script>"
+    b"<table><tr><th class=\"label\">B</th><td class=\"value\">1</td></tr></table>",
+    # The table starts inside an open comment
+    b"<!-- <table><tr><th class=\"label\">A</th><td class=\"value\">1</td></tr></table>",
+    # The title is never closed before the table
+    b"<title>x<table><tr><th class=\"label\">A</th><td class=\"value\">1</td></tr></table>",
+])
+def test_prefilter_falls_back_on_ambiguous_pages(page):
+    assert dbCleaning2.prefilter_html(page) is None
+    for backend in ("bs4", "lxml"):
+        assert dbCleaning2.extract_specs(page, backend, prefilter=True) == dbCleaning2.extract_specs(page, "bs4", prefilter=False)
+
+
+def test_committed_category_files_match_the_rule_table():
+    for category in catalogCache.CATEGORY_FILES:
+        if not os.path.exists(catalogCache.category_path(category)):
+            continue
+        for record in catalogCache.iter_json_records(catalogCache.category_path(category)):
+            assert dbCleaning2.classify_item(record)[0] == category, (record.get("Title"), dbCleaning2.classify_item(record))
+
+
+def test_lenses_without_a_focal_length_row_stay_lenses():
+    lenses = catalogCache.load_category("lens")
+    titles = {record["Title"]: dbCleaning2.classify_item(record) for record in lenses}
+    assert titles["Fujifilm GF 120mm F4 R LM OIS WR M"] == ("lens", "lens_mount_type")
+    assert titles["Zeiss Batis 135mm F2.8"] == ("lens", "lens_mount_type")
+    assert len(lenses) == 1190
+
+
+@pytest.mark.parametrize("item, expected", [
+    ({"Printer type": "Inkjet", "OS": "none"}, ("printer", "printer_type")),
+    ({"Focal length": "28 mm", "Body type": "Compact"}, ("fixed_lens", "fixed_lens")),
+    ({"Focal length": "28 mm", "Body type": "SLR", "Lens mount": "Canon EF"}, ("misc", "fallback")),
+    ({"Timelapse recording": "Yes", "GPS": "None"}, ("camera_body", "timelapse_gps")),
+    ({"Lens type": " Teleconverter ", "Focal length": "n/a"}, ("teleconverter", "teleconverter")),
+    ({"Focal length": "70-200 mm"}, ("lens", "focal_length")),
+    ({"Lens mount": "Sony FE", "Lens type": "Prime lens"}, ("lens", "lens_mount_type")),
+    ({"Lens mount": "Leica M", "Lens type": "Prime lens", "Body type": "Rangefinder"}, ("misc", "fallback")),
+    ({"Lens mount": "Canon EF", "Lens type": "Teleconverter"}, ("teleconverter", "teleconverter")),
+    ({"Exposure compensation": "±5"}, ("camera_body", "exposure_compensation")),
+    ({"Title": "Unknown"}, ("misc", "fallback")),
+])
+def test_rule_table(item, expected):
+    assert dbCleaning2.classify_item(item) == expected
+    categories, rules, counts = dbCleaning2.classify_batch([item, item])
+    assert (categories, rules, counts) == ([expected[0]] * 2, [expected[1]] * 2, {expected[1]: 2})
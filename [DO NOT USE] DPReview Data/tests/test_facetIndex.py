@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+import catalogCache
+import facetIndex
+
+
+@pytest.fixture(scope="module")
+def records():
+    return catalogCache.load_category("camera_body", recover=True)
+
+
+@pytest.fixture(scope="module")
+def index(records):
+    return facetIndex.FacetIndex(records, facetIndex.FACETS["camera_body"])
+
+
+def values_of(record, facet):
+    key, values = facetIndex.FACETS["camera_body"][facet]
+    return values(record[key]) if record.get(key) is not None else []
+
+
+def matches(record, filters):
+    return all(set(values_of(record, facet)) & set([wanted] if isinstance(wanted, str) else wanted)
+               for facet, wanted in filters.items())
+
+
+def test_value_cleaning():
+    assert facetIndex.head("Yes(Water and dust resistant)") == ["Yes"]
+    assert facetIndex.head("yes") == ["Yes"]
+    assert facetIndex.head("NO (optional)") == ["No"]
+    assert facetIndex.head("APS-C (23.5 x 15.6 mm)") == ["APS-C"]
+    assert facetIndex.exact(" Tilting ") == ["Tilting"]
+    assert facetIndex.mounts("Canon EF, Canon EF-S, Nikon F (FX)") == ["Canon EF", "Nikon F"]
+
+
+def test_bitmap_round_trip():
+    rows = np.array([0, 3, 8, 9, 63, 64, 99])
+    bitmap = facetIndex.to_bitmap(rows, 100)
+    assert bitmap.bit_count() == len(rows)
+    np.testing.assert_array_equal(facetIndex.bitmap_rows(bitmap, 100), rows)
+    assert len(facetIndex.bitmap_rows(0, 100)) == 0
+
+
+def test_value_bitmaps_match_the_records(index, records):
+    assert len(index) == len(records)
+    for facet, bitmaps in index.bitmaps.items():
+        for value, bitmap in bitmaps.items():
+            expected = [row for row, record in enumerate(records) if value in values_of(record, facet)]
+            assert index.rows(bitmap).tolist() == expected, (facet, value)
+        # Most common values first
+        counts = [bitmap.bit_count() for bitmap in bitmaps.values()]
+        assert counts == sorted(counts, reverse=True)
+
+
+@pytest.mark.parametrize("filters, exclude", [
+    ({}, None),
+    ({"sealed": "Yes"}, None),
+    ({"lens_mount": ["Sony E", "Nikon Z"], "sensor_size": "Full frame"}, None),
+    ({"image_stabilization": ["Sensor-shift", "Optical"], "touch_screen": "Yes"}, {"body_type": "SLR-style mirrorless"}),
+    ({"lens_mount": "No such mount"}, None),
+])
+def test_select_and_facet_counts_match_brute_force(index, records, filters, exclude):
+    selection = index.select(filters, exclude)
+    expected = [row for row, record in enumerate(records)
+                if matches(record, filters) and not (exclude and any(matches(record, {f: v}) for f, v in exclude.items()))]
+    assert index.rows(selection).tolist() == expected
+
+    # Every facet is counted against the filters of the other facets only
+    counts = index.facet_counts(filters, exclude)
+    assert set(counts) == set(index.bitmaps)
+    for facet, facet_counts in counts.items():
+        others = {f: v for f, v in filters.items() if f != facet}
+        base = [record for record in records
+                if matches(record, others) and not (exclude and any(matches(record, {f: v}) for f, v in exclude.items()))]
+        expected = {}
+        for record in base:
+            for value in values_of(record, facet):
+                expected[value] = expected.get(value, 0) + 1
+        assert facet_counts == expected, facet
+
+    # A facet without a filter of its own is counted over the whole selection
+    for facet in set(index.bitmaps) - set(filters):
+        assert index.counts(selection, [facet])[facet] == counts[facet]
+
+
+def test_missing_values_are_in_no_bitmap():
+    index = facetIndex.FacetIndex(
+        [{"GPS": "Yes"}, {}, {"GPS": "No"}, {"GPS": None}],
+        {"gps": ("GPS", facetIndex.exact)},
+    )
+    assert index.values("gps") == ["Yes", "No"]
+    assert index.rows(index.select({"gps": ["Yes", "No"]})).tolist() == [0, 2]
+    assert index.rows(index.select(exclude={"gps": "Yes"})).tolist() == [1, 2, 3]
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import catalogCache
+import catalogDb
+import featureStore
+import specNormalizer
+
+
+@pytest.fixture
+def feature_dir(tmp_path):
+    return str(tmp_path / "features")
+
+
+@pytest.mark.parametrize("category", ["camera_body", "lens", "teleconverter"])
+def test_store_matches_normalized_columns(category, feature_dir):
+    assert featureStore.build_store(category, feature_dir=feature_dir)
+    store = featureStore.open_store(category, feature_dir)
+    records = catalogCache.load_category(category)
+    columns = specNormalizer.normalize_records(records, category)
+
+    assert len(store) == len(records)
+    for name, column in columns.items():
+        if name != "title":
+            assert isinstance(store[name], np.memmap)
+            np.testing.assert_array_equal(store[name], column)
+    for name, keys in catalogDb.TEXT_COLUMNS.items():
+        assert store.strings(name) == [catalogDb.first_present(record, keys) for record in records]
+
+
+def test_store_is_only_rebuilt_when_stale(feature_dir):
+    assert featureStore.build_store("teleconverter", feature_dir=feature_dir)
+    assert not featureStore.build_store("teleconverter", feature_dir=feature_dir)
+    assert featureStore.build_store("teleconverter", feature_dir=feature_dir, force=True)
+
+
+def test_columns_are_read_only(feature_dir):
+    featureStore.build_store("teleconverter", feature_dir=feature_dir)
+    store = featureStore.open_store("teleconverter", feature_dir)
+    with pytest.raises(ValueError):
+        store["weight_g"][0] = 1.0
+    with pytest.raises(KeyError):
+        store["no_such_column"]
+
+
+def test_text_lookups(feature_dir):
+    featureStore.build_store("camera_body", feature_dir=feature_dir)
+    store = featureStore.open_store("camera_body", feature_dir)
+    title = store.strings("title", [5])[0]
+    assert store.find_row(title.upper()) == 5
+    assert store.code_of("lens_mount", "No such mount") == -1
+    with pytest.raises(KeyError):
+        store.find_row("No such camera at all")
+
+
+def test_missing_store(feature_dir):
+    with pytest.raises(FileNotFoundError):
+        featureStore.open_store("lens", feature_dir)
@@ -0,0 +1,22 @@
+import pytest
+
+import dbCleaning2
+import ingestPipeline
+
+
+@pytest.mark.parametrize("kind", ["folder", "zip", "tar"])
+def test_pipeline_matches_extract_all(archives, kind):
+    expected = list(dbCleaning2.extract_all(
+        (source for _, _, _, source in dbCleaning2.iter_sources(archives[kind])), backend="lxml"))
+    pipeline = ingestPipeline.IngestPipeline(read_workers=3, parse_workers=2, queue_size=2, max_in_flight=4,
+                                             backend="lxml")
+    assert list(pipeline.run(dbCleaning2.iter_sources(archives[kind]))) == expected
+    assert pipeline.report()["reorder_buffer_max"] <= 4
+
+
+def test_pipeline_raises_source_errors(tmp_path):
+    not_an_archive = tmp_path / "pages.txt"
+    not_an_archive.write_text("not a folder or an archive")
+    pipeline = ingestPipeline.IngestPipeline(read_workers=2, parse_workers=1)
+    with pytest.raises(ValueError, match="Not a folder"):
+        list(pipeline.run(dbCleaning2.iter_sources(str(not_an_archive))))
@@ -0,0 +1,80 @@
+import io
+import json
+
+import pytest
+
+import catalogCache
+import jsonStream
+
+RECORDS = [{"Title": "A", "Weight": 1.5}, {"Title": "B", "Mount": "Nikon F"}, [1, 2], "text", 12.5, None]
+
+
+def read(text, recover=False, chunk_size=jsonStream.CHUNK_SIZE):
+    reader = jsonStream.JsonArrayReader(io.StringIO(text), "test.json", recover, chunk_size)
+    return list(reader), reader.faults
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1 << 16])
+def test_elements_split_across_chunks(chunk_size):
+    text = json.dumps(RECORDS, indent=4)
+    assert read(text, chunk_size=chunk_size) == (RECORDS, [])
+    # A number cut at a chunk end is read on, not decoded as its prefix
+    assert read("[12.5, 1e10, -3]", chunk_size=chunk_size)[0] == [12.5, 1e10, -3]
+
+
+@pytest.mark.parametrize("category", ["camera_body", "lens", "misc", "teleconverter"])
+def test_category_files_match_json_load(category):
+    filepath = catalogCache.category_path(category)
+    with open(filepath, 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+    assert list(jsonStream.iter_json_array(filepath)) == expected
+    assert jsonStream.validate_file(filepath) == (len(expected), [])
+
+
+@pytest.mark.parametrize("text, message, location", [
+    ('[\n  {"a": 1},\n  {"b": 2},\n]', "Trailing comma before ']'", (3, 11)),
+    ('[{"a": 1},, {"b": 2}]', "Extra comma", (1, 11)),
+    ('[{"a": 1}\n {"b": 2}]', "Missing comma between elements", (2, 2)),
+    ('[{"a": 1}, {"b": 2}\n', "Missing ']' at the end of the file", (2, 1)),
+    ('[{"a": 1}, {"b": 2}] x', "Extra data after the closing ']'", (1, 22)),
+])
+def test_array_faults(text, message, location):
+    with pytest.raises(jsonStream.JsonSyntaxError) as e:
+        read(text)
+    assert (e.value.message, e.value.line, e.value.column) == (message, *location)
+    assert str(e.value) == f"test.json:{location[0]}:{location[1]}: {message}"
+
+    # The same faults are repaired in recover mode, for any chunk size
+    for chunk_size in (1, 4, 1 << 16):
+        assert read(text, recover=True, chunk_size=chunk_size) == ([{"a": 1}, {"b": 2}], [(*location, message)])
+
+
+def test_element_faults_raise_in_both_modes():
+    text = '[\n    {"a": 1},\n    {"b" 2}\n]'
+    for recover in (False, True):
+        with pytest.raises(jsonStream.JsonSyntaxError) as e:
+            read(text, recover=recover)
+        assert (e.value.line, e.value.column) == (3, 10)
+    with pytest.raises(jsonStream.JsonSyntaxError, match="Expecting '\\['"):
+        read('{"a": 1}')
+
+
+def test_byte_order_mark_and_empty_array():
+    assert read('\ufeff[{"a": 1}]') == ([{"a": 1}], [])
+    assert read(" [ ] ") == ([], [])
+
+
+def test_validate_file_reports_every_fault(tmp_path):
+    filepath = str(tmp_path / "lens.json")
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write('[{"a": 1},, {"b": 2},\n{"c" 3}]')
+    count, faults = jsonStream.validate_file(filepath)
+    assert count == 2
+    assert faults[0] == (1, 11, "Extra comma")
+    assert faults[1][:2] == (2, 6) and faults[1][2].endswith("(not recoverable, reading stopped)")
+
+    faults = []
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write('[{"a": 1}, {"b": 2},]')
+    assert list(jsonStream.iter_json_array(filepath, recover=True, faults=faults)) == [{"a": 1}, {"b": 2}]
+    assert faults == [(1, 20, "Trailing comma before ']'")]
@@ -0,0 +1,85 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import catalogCache
+import dbCleaning2
+import keyMatrix
+
+
+@pytest.fixture(scope="module")
+def records():
+    catalog = catalogCache.load_catalog(recover=True)
+    return [record for records in catalog.values() for record in records]
+
+
+@pytest.fixture(scope="module")
+def km(records):
+    return keyMatrix.build_key_matrix(records)
+
+
+def test_matrix_marks_every_key(records, km):
+    assert km.matrix.shape == (len(records), len(km.keys))
+    for row in range(0, len(records), 50):
+        expected = set(records[row])
+        if dbCleaning2.rule_mask(records[row]) & dbCleaning2._TELECONVERTER_BIT:
+            expected.add(dbCleaning2.TELECONVERTER_KEY)
+        assert {km.keys[i] for i in np.flatnonzero(km.matrix[row])} == expected
+    assert not km.column("No such key").any()
+
+    fixed = keyMatrix.build_key_matrix(records[:20], keys=["Title", "Lens mount"])
+    assert fixed.keys == ["Title", "Lens mount"]
+    np.testing.assert_array_equal(fixed.matrix, km.matrix[:20][:, [km.column_of["Title"], km.column_of["Lens mount"]]])
+
+
+def test_rules_match_classify_batch(records, km):
+    categories, rules, _ = dbCleaning2.classify_batch(records)
+    matrix_categories, matrix_rules = keyMatrix.categorize_matrix(km)
+    assert matrix_categories.tolist() == categories
+    assert matrix_rules.tolist() == rules
+
+    # Every combination of the rule keys, teleconverter pseudo-key included
+    rule_keys = sorted({key for _, _, required, forbidden in dbCleaning2.CATEGORY_RULES for key in required + forbidden})
+    items = []
+    for present in itertools.product((False, True), repeat=len(rule_keys)):
+        item = {key: "x" for key, on in zip(rule_keys, present) if on and key != dbCleaning2.TELECONVERTER_KEY}
+        if present[rule_keys.index(dbCleaning2.TELECONVERTER_KEY)]:
+            item["Lens type"] = "Teleconverter"
+        items.append(item)
+    categories, rules, _ = dbCleaning2.classify_batch(items)
+    matrix_categories, matrix_rules = keyMatrix.categorize_matrix(keyMatrix.build_key_matrix(items))
+    assert (matrix_categories.tolist(), matrix_rules.tolist()) == (categories, rules)
+
+
+def test_reclassify_misc_matches_the_dict_version():
+    items = [{"Title": "a"}, {"Exposure compensation": "±5"}, {"Exposure compensation": "±3", "OS": "iOS"}]
+    km = keyMatrix.build_key_matrix(items)
+    categories = np.array(["misc", "misc", "mobile_device"], dtype=object)
+    assert keyMatrix.reclassify_misc_matrix(km, categories) == 1
+
+    by_dict = {"misc": [items[0], items[1]], "camera_body": [], "mobile_device": [items[2]]}
+    dbCleaning2.reclassify_misc(by_dict)
+    assert categories.tolist() == ["misc", "camera_body", "mobile_device"]
+    assert by_dict["camera_body"] == [items[1]] and by_dict["misc"] == [items[0]]
+
+
+def test_coverage_and_cooccurrence_match_counting(records, km):
+    lenses = np.array([dbCleaning2.categorize_item(record) == "lens" for record in records])
+    coverage = keyMatrix.key_coverage(km, lenses)
+    lens_records = [record for record, is_lens in zip(records, lenses) if is_lens]
+    assert coverage["Lens mount"] == round(sum("Lens mount" in r for r in lens_records) / len(lens_records), 4)
+    assert list(coverage.values()) == sorted(coverage.values(), reverse=True)
+    assert "Printer type" not in coverage
+    categories, _ = keyMatrix.categorize_matrix(km)
+    assert set(keyMatrix.coverage_by_category(km, categories)) == set(categories.tolist())
+
+    table = keyMatrix.key_cooccurrence(km)
+    for a, b in [("Lens mount", "Body type"), ("Weight", "Lens type"), ("Title", "Title"), ("OS", "Printer type")]:
+        i, j = km.column_of[a], km.column_of[b]
+        assert table[i, j] == table[j, i] == sum(a in record and b in record for record in records)
+
+    top = keyMatrix.top_cooccurring(km, "Printer type", limit=5)
+    assert len(top) == 5 and "Printer type" not in dict(top)
+    assert [count for _, count in top] == sorted((count for _, count in top), reverse=True)
+    assert top[0][1] == table[km.column_of["Printer type"], km.column_of[top[0][0]]]
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+import mountRegistry
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    feature_dir = tmp_path_factory.mktemp("features")
+    return mountRegistry.load_index(str(feature_dir / "mount_index.npz"), feature_dir=str(feature_dir))
+
+
+def entries(rows, variants):
+    """_entries-style (rows, mount ids, variant tuples) of one spelling per row."""
+    mount_id = {"Canon EF": 0, "Nikon F": 1, "L-Mount": 2}
+    mounts = [mount_id[mountRegistry.canonical_mount(v)] for v in variants]
+    return np.array(rows, dtype=np.int32), np.array(mounts, dtype=np.int32), [(v,) for v in variants]
+
+
+def test_canonical_mounts():
+    assert mountRegistry.canonical_mount("Nikon  F (FX)") == "Nikon F"
+    assert mountRegistry.canonical_mount("Sony FE") == "Sony E"
+    assert mountRegistry.canonical_mount("Leica L") == mountRegistry.canonical_mount("Leica TL") == "L-Mount"
+    assert mountRegistry.canonical_mount("Pentax KAF3") == "Pentax K"
+    assert mountRegistry.canonical_mount("Fujifilm X") == "Fujifilm X"
+    assert mountRegistry.split_variants("Canon EF,  Nikon F (FX), ") == ["Canon EF", "Nikon F (FX)"]
+    assert mountRegistry.split_variants(None) == []
+
+
+def test_ef_s_lenses_only_fit_ef_s_bodies():
+    assert mountRegistry.lens_fits("Canon EF/EF-S", ("Canon EF-S",))
+    assert not mountRegistry.lens_fits("Canon EF", ("Canon EF-S",))
+    assert mountRegistry.lens_fits("Canon EF", ("Canon EF",))
+    # A lens also listed under an unrestricted spelling fits
+    assert mountRegistry.lens_fits("Canon EF", ("Canon EF-S", "Canon EF"))
+
+
+def test_compatible_pairs_and_crop_flags():
+    bodies = entries([0, 1, 2, 3], ["Canon EF", "Canon EF/EF-S", "Nikon F", "Leica L"])
+    lenses = entries([0, 1, 2, 3, 4], ["Canon EF", "Canon EF-S", "Nikon F (DX)", "Nikon F (FX)", "Leica TL"])
+    crop_factor = np.array([1.0, 1.6, 1.0, 1.0])
+    body, lens, crop = mountRegistry.compatible_pairs(bodies, lenses, crop_factor, 3)
+    assert list(zip(body.tolist(), lens.tolist(), crop.tolist())) == [
+        (0, 0, False),
+        (1, 0, False), (1, 1, False),  # EF-S on an APS-C body is not a crop
+        (2, 2, True), (2, 3, False),
+        (3, 4, True),
+    ]
+
+
+def test_index_matches_the_store_spellings(index):
+    bodies, lenses = index.store("camera_body"), index.store("lens")
+    body_mounts = bodies.strings("lens_mount")
+    lens_mounts = lenses.strings("lens_mount")
+    for mount in index.mounts:
+        expected = [row for row, value in enumerate(lens_mounts)
+                    if mount in map(mountRegistry.canonical_mount, mountRegistry.split_variants(value))]
+        assert index.rows("lens", mount).tolist() == expected
+    assert len(index.rows("lens", "No such mount")) == 0
+
+    crop_factor = np.asarray(bodies["crop_factor"])
+    for body in range(0, len(bodies), 11):
+        fitting, crop = index.lenses_for_body(body)
+        variant = body_mounts[body]
+        expected = [
+            lens for lens, value in enumerate(lens_mounts)
+            if value and [v for v in mountRegistry.split_variants(value)
+                          if mountRegistry.canonical_mount(v) == mountRegistry.canonical_mount(variant)
+                          and mountRegistry.lens_fits(variant, (v,))]
+        ]
+        assert fitting.tolist() == expected, body_mounts[body]
+        assert index.mounts_of("camera_body", body) == [mountRegistry.canonical_mount(variant)]
+        for lens, cropped in zip(fitting.tolist(), crop.tolist()):
+            assert body in index.bodies_for_lens(lens).tolist()
+            variants = [v for v in mountRegistry.split_variants(lens_mounts[lens])
+                        if mountRegistry.canonical_mount(v) == mountRegistry.canonical_mount(variant)]
+            assert cropped == (all(v in mountRegistry.CROP_VARIANTS for v in variants) and crop_factor[body] < mountRegistry.FULL_FRAME_CROP)
+
+
+def test_body_queries(index):
+    bodies = index.store("camera_body")
+    full_frame = bodies.find_row("Canon EOS 5D Mark IV")
+    aps_c = bodies.find_row("Canon EOS 1000D")
+    lens_titles = index.store("lens").strings("title")
+    ef_s = {lens_titles[lens] for lens in index.lenses_for_body(aps_c)[0].tolist() if "EF-S" in lens_titles[lens]}
+    assert ef_s
+    assert not ef_s & {lens_titles[lens] for lens in index.lenses_for_body(full_frame)[0].tolist()}
+
+    nikon = bodies.find_row("Nikon D850")
+    lenses, crop = index.lenses_for_body(nikon)
+    assert crop.any() and not crop.all()
+    assert index.lenses_for_body(nikon, allow_crop=False)[0].tolist() == lenses[~crop].tolist()
+    light, _ = index.lenses_for_body(nikon, {"weight_g": (None, 400)})
+    assert 0 < len(light) < len(lenses)
+    assert (np.asarray(index.store("lens")["weight_g"])[light] <= 400).all()
@@ -0,0 +1,36 @@
+import random
+import statistics
+
+import pytest
+
+from pipelineStats import PipelineStats, histogram_median
+
+
+@pytest.mark.parametrize("values", [[3], [1, 2], [5, 1, 4, 4], [2, 2, 2, 9, 9], list(range(10))])
+def test_histogram_median_matches_statistics(values):
+    histogram = {}
+    for value in values:
+        histogram[value] = histogram.get(value, 0) + 1
+    assert histogram_median(histogram) == statistics.median(values)
+
+
+def test_rows_per_page_report_uses_a_bounded_histogram():
+    rng = random.Random(0)
+    rows = [rng.randrange(40, 60) for _ in range(5000)]
+    stats = PipelineStats()
+    for count in rows:
+        stats.add_page({"Title": "x", **{f"key {i}": "" for i in range(count)}}, {"parse": 0.001})
+
+    assert len(stats.rows_histogram) <= 20
+    assert stats.report()["rows_per_page"] == {
+        "min": min(rows),
+        "median": statistics.median(rows),
+        "mean": round(statistics.fmean(rows), 2),
+        "max": max(rows),
+    }
+    assert stats.counters["pages_parsed"] == 5000
+    assert len(stats.report()["slowest_files"]) == stats.slowest
+
+
+def test_empty_report():
+    assert PipelineStats().report()["rows_per_page"] == {}
@@ -0,0 +1,97 @@
+import json
+import shutil
+
+import numpy as np
+import pytest
+
+import catalogCache
+import facetIndex
+import featureStore
+import rangeIndex
+import recommender
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    """(data_dir, feature_dir, range_dir) with a copy of the camera_body file."""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    shutil.copy(catalogCache.category_path("camera_body"), data_dir)
+    return str(data_dir), str(tmp_path / "features"), str(tmp_path / "ranges")
+
+
+def assert_sorted_index(values, sorted_values, sorted_rows):
+    """sorted_values/sorted_rows index every known value of values, in value order."""
+    assert (np.diff(sorted_values) >= 0).all()
+    np.testing.assert_array_equal(values[sorted_rows], sorted_values)
+    np.testing.assert_array_equal(np.sort(sorted_rows), np.flatnonzero(~np.isnan(values)))
+
+
+def test_incremental_update_matches_a_full_sort():
+    rng = np.random.default_rng(11)
+    old = rng.integers(0, 50, 400).astype(np.float64)
+    old[rng.choice(400, 40, replace=False)] = np.nan
+    sorted_values, sorted_rows = rangeIndex.sort_column(old)
+    assert_sorted_index(old, sorted_values, sorted_rows)
+
+    new = np.concatenate([old, [7.0, np.nan, 49.0]])
+    new[rng.choice(400, 30, replace=False)] = rng.integers(0, 50, 30)
+    new[[3, 5]] = np.nan
+    assert set(rangeIndex.changed_rows(old, new).tolist()) >= {400, 401, 402}
+    patched = rangeIndex.update_column(old, sorted_values, sorted_rows, new)
+    assert_sorted_index(new, *patched)
+    np.testing.assert_array_equal(patched[0], rangeIndex.sort_column(new)[0])
+
+    # Rows cut off the end leave the index too
+    patched = rangeIndex.update_column(old, sorted_values, sorted_rows, old[:380])
+    assert_sorted_index(old[:380], *patched)
+    assert rangeIndex.update_column(old, sorted_values, sorted_rows, rng.normal(size=400)) is None
+
+
+def test_rows_match_constraint_mask(dirs):
+    index = rangeIndex.load_ranges("camera_body", *dirs)
+    store = featureStore.open_store("camera_body", dirs[1])
+    assert index.count == len(store)
+    assert set(index.columns) == set(rangeIndex.numeric_columns(store))
+    for constraints in [
+        {"weight_g": (None, 700)},
+        {"megapixels": (20, 30), "msrp_usd": (None, 2000)},
+        {"megapixels": (24, 24), "sealed": (1, 1), "weight_g": (300, None)},
+        {"fps": (1000, None)},
+    ]:
+        rows = index.rows(constraints)
+        expected = np.flatnonzero(recommender.constraint_mask(store, constraints, len(store)))
+        np.testing.assert_array_equal(rows, expected)
+        assert index.bitmap(constraints) == facetIndex.to_bitmap(expected, len(store))
+
+    # (None, None) ranges are skipped, so they do not drop rows missing that value
+    assert np.isnan(np.asarray(store["fps"])).any()
+    np.testing.assert_array_equal(index.rows({"fps": (None, None)}), np.arange(len(store)))
+    np.testing.assert_array_equal(index.rows({"fps": (None, None), "weight_g": (None, 700)}), index.rows({"weight_g": (None, 700)}))
+
+    weights = np.asarray(store["weight_g"])
+    rows = index.lookup("weight_g", 400, 500)
+    assert (np.diff(weights[rows]) >= 0).all()
+    assert index.range_count("weight_g", 400, 500) == len(rows) == int(((weights >= 400) & (weights <= 500)).sum())
+
+
+def test_changed_store_is_patched(dirs):
+    data_dir, feature_dir, range_dir = dirs
+    report = rangeIndex.build_ranges("camera_body", data_dir, feature_dir, range_dir)
+    assert not report["kept"] and not report["patched"] and report["sorted"]
+    assert rangeIndex.build_ranges("camera_body", data_dir, feature_dir, range_dir)["kept"] == report["sorted"]
+
+    filepath = catalogCache.category_path("camera_body", data_dir)
+    with open(filepath, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(records + records[:5], f, indent=4)
+    report = rangeIndex.build_ranges("camera_body", data_dir, feature_dir, range_dir)
+    assert "weight_g" in report["patched"] and not report["sorted"]
+
+    index = rangeIndex.RangeIndex("camera_body", range_dir)
+    store = featureStore.open_store("camera_body", feature_dir)
+    assert index.count == len(records) + 5
+    for column in index.columns:
+        values = np.asarray(store[column], dtype=np.float64)
+        assert_sorted_index(values, index.sorted[column], index.rows_of[column])
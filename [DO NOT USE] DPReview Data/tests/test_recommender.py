@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import featureStore
+import recommender
+
+COLUMNS = {
+    "megapixels": np.array([24.0, 45.0, np.nan, 12.0]),
+    "weight_g": np.array([500.0, 900.0, 700.0, np.nan]),
+    "sealed": np.array([0.0, 1.0, 1.0, 0.0]),
+}
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    feature_dir = str(tmp_path_factory.mktemp("features"))
+    featureStore.build_store("camera_body", feature_dir=feature_dir)
+    return featureStore.open_store("camera_body", feature_dir)
+
+
+def test_scores_and_missing_values():
+    scores = recommender.score_matrix(COLUMNS, ("megapixels", "weight_g", "sealed"))
+    np.testing.assert_allclose(scores[:, 0], [12 / 33, 1.0, 12 / 33, 0.0])
+    # Lighter is better, and the missing weight gets the median score
+    np.testing.assert_allclose(scores[:, 1], [1.0, 0.0, 0.5, 0.5])
+    np.testing.assert_array_equal(scores[:, 2], COLUMNS["sealed"])
+
+
+def test_constraints_fail_missing_values():
+    mask = recommender.constraint_mask(COLUMNS, {"weight_g": (None, 800), "megapixels": (20, None)}, 4)
+    assert mask.tolist() == [True, False, False, False]
+    assert recommender.constraint_mask(COLUMNS, None, 4).all()
+
+
+def test_rank_matches_a_full_sort(store):
+    model = recommender.Recommender(store, titles=store.strings("title"))
+    rng = np.random.default_rng(3)
+    for name, profile in recommender.PROFILES.items():
+        weights = {feature: float(rng.uniform(0.5, 3)) for feature in profile["weights"]}
+        rows, scores = model.rank(weights, profile.get("constraints"), k=15)
+
+        expected = model.scores @ model.weight_vector(weights)
+        passing = np.flatnonzero(model.constraint_mask(profile.get("constraints")))
+        assert len(rows) == min(15, len(passing)), name
+        assert set(rows.tolist()) <= set(passing.tolist())
+        np.testing.assert_allclose(scores, expected[rows])
+        np.testing.assert_allclose(scores, np.sort(expected[passing])[::-1][:len(rows)])
+        assert [title for title, _ in model.recommend({**profile, "weights": weights}, 3)] == store.strings("title", rows[:3])
+
+
+def test_nothing_passes():
+    model = recommender.Recommender(COLUMNS, ("megapixels", "weight_g"))
+    rows, scores = model.rank({"megapixels": 1}, {"weight_g": (0, 1)})
+    assert len(rows) == len(scores) == 0
+
+
+def test_unknown_names_list_the_valid_ones(store):
+    with pytest.raises(ValueError, match=r"Unknown feature: 'iso' \(expected one of \['megapixels', 'sealed', 'weight_g'\]\)"):
+        recommender.Recommender(COLUMNS, ("megapixels", "weight_g", "iso"))
+    model = recommender.Recommender(COLUMNS, ("megapixels", "weight_g"))
+    with pytest.raises(ValueError, match=r"Unknown weight: 'sealed' \(expected one of \['megapixels', 'weight_g'\]\)"):
+        model.rank({"megapixels": 1, "sealed": 1})
+    # Constraints may use any column, not only the scored features
+    assert model.rank({"megapixels": 1}, {"sealed": (1, 1)})[0].tolist() == [1, 2]
+    with pytest.raises(ValueError, match="Unknown constraint: 'price'.*'megapixels', 'sealed', 'weight_g'"):
+        model.rank({"megapixels": 1}, {"price": (None, 500)})
+
+    model = recommender.Recommender(store)
+    with pytest.raises(ValueError, match="Unknown constraint: 'msrp'.*'msrp_usd'"):
+        model.rank({"megapixels": 1}, {"msrp": (None, 500)})
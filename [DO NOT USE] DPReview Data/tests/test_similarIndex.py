@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pytest
+
+import featureStore
+import similarIndex
+
+
+class MountColumn:
+    """Just the lens_mount column and dictionary of a store."""
+
+    def __init__(self, dictionary, codes):
+        self._dictionary = dictionary
+        self.codes = np.array(codes)
+
+    def dictionary(self, name):
+        return self._dictionary
+
+    def __getitem__(self, name):
+        return self.codes
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    feature_dir = tmp_path_factory.mktemp("features")
+    return similarIndex.load_index(str(feature_dir / "camera_body_similar.npz"), feature_dir=str(feature_dir))
+
+
+def test_neighbour_table_matches_brute_force():
+    z = np.random.default_rng(5).normal(size=(60, 4)).astype(np.float32)
+    neighbours, distances = similarIndex.neighbour_table(z, 8)
+    for row in range(len(z)):
+        expected = np.sqrt(((z - z[row]) ** 2).sum(axis=1))
+        expected[row] = np.inf
+        np.testing.assert_array_equal(neighbours[row], np.argsort(expected, kind="stable")[:8])
+        np.testing.assert_allclose(distances[row], np.sort(expected)[:8], rtol=1e-4, atol=1e-4)
+
+
+def test_mount_matrix_uses_canonical_mounts():
+    store = MountColumn(["Pentax KAF", "Pentax KAF2", "Canon EF/EF-S", "Canon EF", "Leica L", "Nikon Z"], [0, 1, 2, 3, 4, 5, -1, -1])
+    mounts, names = similarIndex.mount_matrix(store)
+    assert names == ["Pentax K", "Canon EF", "L-Mount", "Nikon Z"]
+    assert mounts.argmax(axis=1)[:6].tolist() == [0, 0, 1, 1, 2, 3]
+    # Rows without a lens mount have none, so they match nothing, not each other
+    assert not mounts[6:].any()
+    assert not (mounts & mounts[6]).any(axis=1).any()
+
+
+def test_default_query_matches_a_full_scan(index):
+    for row in range(0, len(index.z), 37):
+        rows, distances = index.similar(row, 10)
+        full = np.sqrt(((index.z - index.z[row]) ** 2).sum(axis=1))
+        full[row] = np.inf
+        np.testing.assert_allclose(distances, np.sort(full)[:10], rtol=1e-4, atol=1e-4)
+        assert row not in rows.tolist()
+
+
+def test_same_mount_and_constraints(index):
+    row = index.find("Pentax K-1")
+    rows, _ = index.similar(row, 50, same_mount=True)
+    assert len(rows) > 5
+    assert {mount for other in rows.tolist() for mount in index.store.strings("lens_mount", [other])} > {"Pentax KAF2"}
+    assert all(index.mount_names[index.mounts[other].argmax()] == "Pentax K" for other in rows.tolist())
+
+    # Weighted queries scan every camera, with the same filters
+    constraints = {"megapixels": (30, None)}
+    rows, distances = index.similar(row, 5, weights={"msrp_usd": 0}, same_mount=True, constraints=constraints)
+    assert (np.asarray(index.store["megapixels"])[rows] >= 30).all()
+    assert (np.diff(distances) >= 0).all()
+    assert index.filter_mask(row, True, constraints)[rows].all()
+
+
+def test_store_and_index_stay_in_the_feature_dir(tmp_path):
+    index_file = str(tmp_path / "camera_body_similar.npz")
+    index = similarIndex.load_index(index_file, feature_dir=str(tmp_path))
+    assert os.path.exists(index_file)
+    assert index.store.path == os.path.join(str(tmp_path), "camera_body")
+    assert index.signature.endswith(featureStore.read_schema("camera_body", str(tmp_path))["signature"])
+
+
+def test_unknown_weights_are_rejected(index):
+    row = index.find("Pentax K-1")
+    with pytest.raises(ValueError, match=r"Unknown weight: 'price' \(expected one of \['articulated_screen'"):
+        index.similar(row, 5, weights={"price": 0})
+    with pytest.raises(ValueError, match="Unknown weight: 'title'"):
+        index.similar(row, 5, weights={"msrp_usd": 0, "title": 1})
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import featureStore
+import skyline
+
+
+def brute_force(columns, dimensions, rows=None):
+    """Rows no other row dominates, by pairwise comparison."""
+    rows = np.arange(len(columns[next(iter(dimensions))])) if rows is None else np.asarray(rows)
+    points = np.column_stack([np.asarray(columns[c], dtype=np.float64)[rows] * (1 if d == "min" else -1)
+                              for c, d in dimensions.items()])
+    result = []
+    for i, point in enumerate(points):
+        if np.isnan(point).any():
+            continue
+        known = points[~np.isnan(points).any(axis=1)]
+        if not ((known <= point).all(axis=1) & (known < point).any(axis=1)).any():
+            result.append(rows[i])
+    return sorted(result)
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    feature_dir = str(tmp_path_factory.mktemp("features"))
+    featureStore.build_store("camera_body", feature_dir=feature_dir)
+    return featureStore.open_store("camera_body", feature_dir)
+
+
+@pytest.mark.parametrize("seed, count, dimensions", [
+    (0, 500, 2), (1, 1000, 3), (2, 300, 5), (3, 50, 1),
+])
+def test_random_points_match_brute_force(seed, count, dimensions):
+    rng = np.random.default_rng(seed)
+    # Rounded values give plenty of ties and duplicate points
+    columns = {f"c{j}": np.round(rng.normal(size=count), 1) for j in range(dimensions)}
+    columns["c0"][rng.choice(count, count // 20, replace=False)] = np.nan
+    directions = {name: ("min", "max")[j % 2] for j, name in enumerate(columns)}
+    assert skyline.skyline(columns, directions).tolist() == brute_force(columns, directions)
+
+    rows = np.sort(rng.choice(count, count // 3, replace=False))
+    assert skyline.skyline(columns, directions, rows).tolist() == brute_force(columns, directions, rows)
+
+
+@pytest.mark.parametrize("category_dimensions", [
+    skyline.DEFAULT_DIMENSIONS["camera_body"],
+    {"megapixels": "max", "weight_g": "min"},
+    {"fps": "max", "msrp_usd": "min", "sealed": "max"},
+])
+def test_store_matches_brute_force(store, category_dimensions):
+    rows = skyline.skyline(store, category_dimensions)
+    assert len(rows)
+    assert rows.tolist() == brute_force(store, category_dimensions)
+
+
+def test_rows_missing_a_value_are_left_out():
+    columns = {"price": np.array([100.0, np.nan, 50.0, 80.0]), "mp": np.array([24.0, 60.0, 20.0, np.nan])}
+    assert skyline.skyline(columns, {"price": "min", "mp": "max"}).tolist() == [0, 2]
+    columns["price"][:] = np.nan
+    assert len(skyline.skyline(columns, {"price": "min", "mp": "max"})) == 0
+
+
+def test_dimensions_are_validated():
+    columns = {"price": np.array([1.0, 2.0])}
+    with pytest.raises(ValueError, match="at least one dimension"):
+        skyline.skyline(columns, {})
+    with pytest.raises(ValueError, match="price: direction must be 'min' or 'max', not 'low'"):
+        skyline.skyline(columns, {"price": "low"})
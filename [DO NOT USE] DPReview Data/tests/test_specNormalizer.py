@@ -0,0 +1,107 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import catalogCache
+import catalogDb
+import featureStore
+import specNormalizer
+
+
+@pytest.mark.parametrize("parser, value, expected", [
+    (specNormalizer.GRAMS, "280g(0.62lb / 9.88oz)", (280.0,)),
+    (specNormalizer.GRAMS, "1,050 g", (1050.0,)),
+    (specNormalizer.USD, "$1,999", (1999.0,)),
+    (specNormalizer.FOCAL_RANGE, "16–35 mm", (16.0, 35.0)),
+    (specNormalizer.FOCAL_RANGE, "50mm", (50.0, 50.0)),
+    (specNormalizer.F_RANGE, "F2.8 - 4", (2.8, 4.0)),
+    (specNormalizer.parse_sensor, "APS-C (23.5 x 15.6 mm)", (23.5, 15.6)),
+    (specNormalizer.parse_seconds, "1/4000sec", (0.00025,)),
+    (specNormalizer.parse_seconds, "30 sec", (30.0,)),
+    (specNormalizer.parse_converter_factor, "Canon Extender EF 1.4x III", (1.4,)),
+    (specNormalizer.parse_converter_factor, "Nikon AF-S Teleconverter TC-20E III", (2.0,)),
+    (specNormalizer.parse_converter_factor, "Kenko Teleplus PRO 300 AF 2.0 DGX", (2.0,)),
+    (specNormalizer.FORMAT_CROP, "apS-c / dx", (1.5,)),
+    (specNormalizer.STABILIZED, "Sensor-shift", (1.0,)),
+    (specNormalizer.STABILIZED, "No", (0.0,)),
+    (specNormalizer.STABILIZED, "Unknown", None),
+    (specNormalizer.BUILT_IN_VIEWFINDER, "Electronic (optional)", (0.0,)),
+    (specNormalizer.GRAMS, "n/a", None),
+])
+def test_parsers(parser, value, expected):
+    if expected is None:
+        assert parser(value) is None
+    else:
+        assert parser(value) == pytest.approx(expected)
+
+
+def test_parse_column_parses_each_distinct_value_once():
+    calls = []
+
+    def parser(value):
+        calls.append(value)
+        return specNormalizer.GRAMS(value)
+
+    column = specNormalizer.parse_column(["100 g", None, "100 g", "junk", "200 g", "100 g"], parser, 1)
+    np.testing.assert_array_equal(column[:, 0], [100, np.nan, 100, np.nan, 200, 100])
+    assert sorted(calls) == ["100 g", "200 g", "junk"]
+
+
+@pytest.mark.parametrize("category", ["camera_body", "lens", "teleconverter"])
+def test_columns_match_per_record_parsing(category):
+    records = catalogCache.load_category(category)
+    columns = specNormalizer.normalize_records(records, category)
+    for key, parser, names in specNormalizer.FIELDS[category]:
+        for row, record in enumerate(records):
+            parsed = parser(record[key]) if key in record else None
+            for i, name in enumerate(names):
+                if name == "aperture_tele":
+                    continue  # replaced for primes by add_derived_columns
+                expected = parsed[i] if parsed is not None else np.nan
+                np.testing.assert_equal(columns[name][row], expected)
+
+
+def test_cache_round_trip(tmp_path):
+    data_dir, cache_dir = tmp_path / "data", tmp_path / "normalized"
+    data_dir.mkdir()
+    shutil.copy(catalogCache.category_path("teleconverter"), data_dir)
+
+    built = specNormalizer.load_normalized("teleconverter", str(data_dir), str(cache_dir))
+    cached = specNormalizer.load_normalized("teleconverter", str(data_dir), str(cache_dir))
+    assert built.keys() == cached.keys()
+    for name in built:
+        np.testing.assert_array_equal(built[name], cached[name])
+    np.testing.assert_allclose(cached["stops_lost"], 2 * np.log2(cached["converter_factor"]))
+
+    # A changed source file is normalized again
+    filepath = os.path.join(data_dir, catalogCache.CATEGORY_FILES["teleconverter"])
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write('[{"Title": "Sigma 2x Teleconverter"}]')
+    rebuilt = specNormalizer.load_normalized("teleconverter", str(data_dir), str(cache_dir))
+    assert rebuilt["converter_factor"].tolist() == [2.0]
+
+
+def test_builders_read_the_cache(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    shutil.copy(catalogCache.category_path("teleconverter"), data_dir)
+    filepath = os.path.join(data_dir, catalogCache.CATEGORY_FILES["teleconverter"])
+
+    # A marked cache entry under the current signature is what both builders pick up
+    columns = specNormalizer.load_normalized("teleconverter", str(data_dir))
+    assert os.path.exists(specNormalizer.cache_filename("teleconverter", str(data_dir / specNormalizer.NORMALIZED_DIR_NAME)))
+    columns["weight_g"] = np.full(len(columns["weight_g"]), 12345.0)
+    specNormalizer.save_cached("teleconverter", columns, specNormalizer.source_signature(filepath),
+                               str(data_dir / specNormalizer.NORMALIZED_DIR_NAME))
+
+    feature_dir = str(tmp_path / "features")
+    featureStore.build_store("teleconverter", str(data_dir), feature_dir)
+    assert (np.asarray(featureStore.open_store("teleconverter", feature_dir)["weight_g"]) == 12345.0).all()
+
+    db_file = str(tmp_path / "catalog.db")
+    catalogDb.build_catalog(db_file, str(data_dir))
+    conn = catalogDb.connect(db_file)
+    assert [tuple(row) for row in conn.execute('SELECT DISTINCT weight_g FROM "teleconverter"')] == [(12345.0,)]
+    conn.close()
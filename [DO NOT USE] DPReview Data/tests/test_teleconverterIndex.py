@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pytest
+
+import mountRegistry
+import teleconverterIndex
+
+
+@pytest.fixture(scope="module")
+def feature_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("features")
+
+
+@pytest.fixture(scope="module")
+def mounts(feature_dir):
+    return mountRegistry.load_index(str(feature_dir / "mount_index.npz"), feature_dir=str(feature_dir))
+
+
+@pytest.fixture(scope="module")
+def index(feature_dir, mounts):
+    return teleconverterIndex.load_index(str(feature_dir / "teleconverter_pairs.npz"), str(feature_dir / "mount_index.npz"),
+                                         feature_dir=str(feature_dir))
+
+
+def test_pairs_match_the_eligibility_rules(index, mounts):
+    lenses, converters = mounts.store("lens"), mounts.store("teleconverter")
+    focal_max = np.asarray(lenses["focal_max_mm"])
+    lens_titles, converter_titles = lenses.strings("title"), converters.strings("title")
+    expected = set()
+    for converter in range(len(converters)):
+        converter_brand = teleconverterIndex.brand(converter_titles[converter])
+        for lens in range(len(lenses)):
+            if not set(mounts.mounts_of("teleconverter", converter)) & set(mounts.mounts_of("lens", lens)):
+                continue
+            if not focal_max[lens] >= teleconverterIndex.MIN_FOCAL_MM:
+                continue
+            if converter_brand in teleconverterIndex.CAPTIVE_BRANDS and teleconverterIndex.brand(lens_titles[lens]) != converter_brand:
+                continue
+            expected.add((converter, lens))
+    assert set(zip(index.converter.tolist(), index.lens.tolist())) == expected
+    assert len(index) == len(expected)
+
+
+def test_effective_columns_and_lookups(index, mounts):
+    lenses, converters = mounts.store("lens"), mounts.store("teleconverter")
+    factor = np.asarray(converters["converter_factor"])[index.converter]
+    for name in teleconverterIndex.LENS_COLUMNS:
+        np.testing.assert_array_equal(index.columns[name], np.asarray(lenses[name])[index.lens] * factor)
+    assert index.columns["autofocus"].tolist() == (index.columns["aperture_tele"] <= teleconverterIndex.AF_APERTURE_LIMIT).tolist()
+
+    for converter in range(len(converters)):
+        np.testing.assert_array_equal(index.pairs_for_converter(converter), np.flatnonzero(index.converter == converter))
+    for lens in range(0, len(lenses), 7):
+        np.testing.assert_array_equal(np.sort(index.pairs_for_lens(lens)), np.flatnonzero(index.lens == lens))
+
+
+def test_search(index):
+    constraints = {"focal_max_mm": (600, None), "aperture_tele": (None, 8)}
+    pairs = index.search(constraints)
+    expected = (index.columns["focal_max_mm"] >= 600) & (index.columns["aperture_tele"] <= 8)
+    np.testing.assert_array_equal(pairs, np.flatnonzero(expected))
+    subset = np.arange(0, len(index), 3)
+    np.testing.assert_array_equal(index.search(constraints, subset), subset[expected[subset]])
+    described = index.describe(pairs[:3])
+    assert [values["focal_max_mm"] for _, _, values in described] == index.columns["focal_max_mm"][pairs[:3]].tolist()
+
+
+def test_pairs_for_body(index, mounts):
+    bodies = mounts.store("camera_body")
+    nikon = bodies.find_row("Nikon D850")
+    pairs = index.pairs_for_body(nikon, mounts)
+    assert len(pairs)
+    assert set(index.lens[pairs].tolist()) <= set(mounts.lenses_for_body(nikon)[0].tolist())
+    assert {mounts.store("teleconverter").strings("title", [c])[0].split()[0] for c in index.converter[pairs].tolist()} >= {"Nikon"}
+
+    # A mount no converter is made for gives an empty integer result
+    fuji = bodies.find_row("Fujifilm X-T4")
+    assert len(mounts.rows("teleconverter", mounts.mounts_of("camera_body", fuji)[0])) == 0
+    pairs = index.pairs_for_body(fuji, mounts)
+    assert len(pairs) == 0 and pairs.dtype.kind == "i"
+
+
+def test_pairs_are_marked_unverified(index, mounts):
+    assert index.compatibility == teleconverterIndex.COMPATIBILITY == "mount-compatible, not verified"
+    assert index.signature == f"{teleconverterIndex.INDEX_VERSION}:{mounts.signature}"
+
+
+def test_everything_is_read_from_the_feature_dir(index, mounts, feature_dir):
+    assert {os.path.dirname(store.path) for store in (index.store("lens"), mounts.store("camera_body"))} == {str(feature_dir)}
+    assert {"mount_index.npz", "teleconverter_pairs.npz"} <= set(os.listdir(feature_dir))